@@ -4,39 +4,100 @@ from flask_login import LoginManager
 from flask_jwt_extended import JWTManager
 from celery import Celery
 from flask_mail import Mail
-from flask_migrate import Migrate
 
 db = SQLAlchemy()
 login_manager = LoginManager()
 jwt = JWTManager()
 celery = Celery(__name__)
 mail = Mail()
-migrate = Migrate()
 
 
-def create_app(config_class='config.DevelopmentConfig'):
-    app = Flask(__name__)
+def _serialization_options(config):
+    """
+    Task serializer and compression for the broker. Workers keep accepting
+    JSON so messages already queued survive a switch to msgpack.
+    """
+    from kombu.serialization import registry
+    serializer = config['CELERY_TASK_SERIALIZER']
+    if serializer not in registry.name_to_type:
+        raise RuntimeError(f'Serializer de tasks indisponível: {serializer}')
+    accept = ['json'] if serializer == 'json' else ['json', serializer]
+    return {
+        'task_serializer': serializer,
+        'task_compression': config['CELERY_TASK_COMPRESSION'],
+        'accept_content': accept,
+        'result_accept_content': accept,
+    }
+
+
+def _init_core(app, config_class, worker=False):
+    """
+    Config, database, mail and Celery: what both the web app and workers need.
+    """
     app.config.from_object(config_class)
+    if worker:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = app.config['WORKER_SQLALCHEMY_ENGINE_OPTIONS']
     mail.init_app(app)
     db.init_app(app)
+
+    # celery beat: arquivamento periódico dos logs antigos, leitura dos bounces
+    # e o escalonador justo de campanhas
+    beat_schedule = {
+        'archive-logs': {'task': 'app.tasks.archive_logs_task', 'schedule': app.config['LOG_ARCHIVE_INTERVAL']},
+    }
+    if app.config['BOUNCE_MAILBOX']:
+        beat_schedule['process-bounces'] = {'task': 'app.tasks.process_bounces_task',
+                                            'schedule': app.config['BOUNCE_POLL_INTERVAL']}
+    if app.config['CAMPAIGN_SCHEDULER'] == 'fair':
+        beat_schedule['dispatch-campaigns'] = {'task': 'app.tasks.dispatch_campaigns_task',
+                                               'schedule': app.config['CAMPAIGN_DISPATCH_INTERVAL']}
+    celery.conf.update(
+        broker_url=app.config['CELERY_BROKER_URL'],
+        result_backend=app.config['CELERY_RESULT_BACKEND'],
+        beat_schedule=beat_schedule,
+        **_serialization_options(app.config)
+    )
+    from app.queues import configure_queues
+    configure_queues(celery, app.config)
+
+
+def create_app(config_class='config.DevelopmentConfig'):
+    app = Flask(__name__)
+    _init_core(app, config_class)
     login_manager.init_app(app)
     jwt.init_app(app)
-    migrate.init_app(app, db)
+    # flask_migrate (e alembic) só é carregado pelo app web/CLI
+    from flask_migrate import Migrate
+    Migrate(app, db)
 
     # Configurações do JWT
     app.config["JWT_TOKEN_LOCATION"] = ["headers"]
     app.config["JWT_SECRET_KEY"] = app.config['SECRET_KEY']  # Usa a mesma chave secreta da aplicação
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = 3600  # 1 hora
 
-    celery.conf.update(
-        broker_url=app.config['CELERY_BROKER_URL'],
-        result_backend=app.config['CELERY_RESULT_BACKEND']
-    )
-
     from app.routes import main as main_blueprint
     from app.auth import auth as auth_blueprint
     
     app.register_blueprint(main_blueprint)
     app.register_blueprint(auth_blueprint, url_prefix='/auth')
+    # Profiling opt-in (PROFILE_ENABLED)
+    from app.profiling import init_request_profiling
+    init_request_profiling(app)
+
+    return app
 
+
+def create_worker_app(config_class='config.DevelopmentConfig'):
+    """
+    Slim app for Celery workers: no blueprints, login, JWT or migrations.
+    """
+    app = Flask(__name__)
+    _init_core(app, config_class, worker=True)
+    # Registrar as tasks no Celery
+    from app import tasks  # noqa: F401
+    # Sessão e contexto de aplicação por task
+    from app.worker import init_worker_signals
+    init_worker_signals(app)
+    from app.profiling import init_task_profiling
+    init_task_profiling(app.config)
     return app
@@ -0,0 +1,162 @@
+import csv
+import gzip
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import func
+from .models import LogRollup, RobotLog, SendLog, db
+
+# Tabela -> (model, colunas arquivadas, coluna de escopo, coluna agregada nos rollups)
+ARCHIVED_TABLES = {
+    'send_log': (SendLog, ['id', 'contact_id', 'template_id', 'status', 'timestamp'], 'template_id', 'status'),
+    'robot_log': (RobotLog, ['id', 'robot_id', 'action', 'details', 'timestamp'], 'robot_id', 'action'),
+}
+
+
+def _partition_dir(folder, table, day):
+    return os.path.join(folder, table, day.isoformat())
+
+
+def _cell(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class LogArchiver:
+    """
+    Move old RobotLog/SendLog rows into gzip CSV files partitioned by day,
+    ``<folder>/<table>/<YYYY-MM-DD>/<first_id>-<last_id>.csv.gz``, and delete
+    them from the hot table in batches of ``batch_size``.
+
+    Each batch writes its files first (temp file + rename), then deletes the
+    rows and bumps the LogRollup counters in one transaction. A crash between
+    the two leaves the rows in place; the retry rewrites the same part files,
+    so history is not lost or counted twice.
+    """
+
+    def __init__(self, folder, batch_size):
+        self.folder = folder
+        self.batch_size = batch_size
+
+    def _write_part(self, table, day, columns, rows):
+        directory = _partition_dir(self.folder, table, day)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{rows[0][0]}-{rows[-1][0]}.csv.gz')
+        tmp = f'{path}.tmp'
+        with gzip.open(tmp, 'wt', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows([_cell(value) for value in row] for row in rows)
+        os.replace(tmp, path)
+        return path
+
+    def archive_batch(self, table, cutoff):
+        """
+        Archive up to ``batch_size`` rows older than ``cutoff``; returns how
+        many were moved (0 when nothing is left).
+        """
+        model, columns, scope, key = ARCHIVED_TABLES[table]
+        query = db.session.query(*[getattr(model, column) for column in columns]).filter(model.timestamp < cutoff)
+        if model is SendLog:
+            # Envios ainda pendentes continuam na tabela quente
+            query = query.filter(SendLog.status != 'pending')
+        rows = query.order_by(model.id).limit(self.batch_size).all()
+        if not rows:
+            return 0
+
+        timestamp_at = columns.index('timestamp')
+        scope_at, key_at = columns.index(scope), columns.index(key)
+        by_day = defaultdict(list)
+        rollups = defaultdict(int)
+        for row in rows:
+            day = row[timestamp_at].date()
+            by_day[day].append(row)
+            rollups[(day, row[scope_at], row[key_at])] += 1
+        for day, day_rows in by_day.items():
+            self._write_part(table, day, columns, day_rows)
+
+        model.query.filter(model.id.in_([row[0] for row in rows])).delete(synchronize_session=False)
+        for (day, scope_id, value), count in rollups.items():
+            rollup = LogRollup.query.filter_by(day=day, source=table, scope_id=scope_id, key=value).first()
+            if rollup is None:
+                rollup = LogRollup(day=day, source=table, scope_id=scope_id, key=value, count=0)
+                db.session.add(rollup)
+            rollup.count += count
+        db.session.commit()
+        return len(rows)
+
+
+def archive_old_logs(config, max_batches=None, now=None):
+    """
+    Archive rows older than LOG_RETENTION_DAYS from every archived table, at
+    most ``max_batches`` batches per table. Returns ``(moved, more_left)``.
+    """
+    archiver = LogArchiver(config['ARCHIVE_FOLDER'], config['ARCHIVE_BATCH_SIZE'])
+    cutoff = (now or datetime.utcnow()) - timedelta(days=config['LOG_RETENTION_DAYS'])
+    max_batches = max_batches or config['ARCHIVE_MAX_BATCHES']
+    moved = {}
+    more_left = False
+    for table in ARCHIVED_TABLES:
+        moved[table] = 0
+        for _ in range(max_batches):
+            count = archiver.archive_batch(table, cutoff)
+            moved[table] += count
+            if count < archiver.batch_size:
+                break
+        else:
+            more_left = True
+    return moved, more_left
+
+
+def partition_days(folder, table, start, end):
+    """
+    Days in [start, end] that have a partition directory, in order.
+    """
+    root = os.path.join(folder, table)
+    days = []
+    for name in os.listdir(root) if os.path.isdir(root) else []:
+        try:
+            day = date.fromisoformat(name)
+        except ValueError:
+            continue
+        if start <= day <= end and os.path.isdir(os.path.join(root, name)):
+            days.append(day)
+    return sorted(days)
+
+
+def iter_archive(folder, table, start, end, scope_ids=None, key=None):
+    """
+    Stream archived rows (dicts of strings) of ``table`` for days in
+    [start, end], optionally limited to ``scope_ids`` (template ids for
+    send_log, robot ids for robot_log) and one status/action ``key``.
+    Only the existing partitions in the date range are opened.
+    """
+    _, _, scope, key_column = ARCHIVED_TABLES[table]
+    scope_ids = {str(scope_id) for scope_id in scope_ids} if scope_ids is not None else None
+    for day in partition_days(folder, table, start, end):
+        directory = _partition_dir(folder, table, day)
+        parts = sorted((name for name in os.listdir(directory) if name.endswith('.csv.gz')),
+                       key=lambda name: int(name.split('-')[0]))
+        for name in parts:
+            with gzip.open(os.path.join(directory, name), 'rt', newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    if scope_ids is not None and row[scope] not in scope_ids:
+                        continue
+                    if key is not None and row[key_column] != key:
+                        continue
+                    yield row
+
+
+def rollup_totals(source, scope_ids=None, key=None):
+    """
+    Archived row counts per key for ``source`` ({'sent': n, ...}).
+    """
+    query = db.session.query(LogRollup.key, func.sum(LogRollup.count)).filter(LogRollup.source == source)
+    if scope_ids is not None:
+        query = query.filter(LogRollup.scope_id.in_(scope_ids))
+    if key is not None:
+        query = query.filter(LogRollup.key == key)
+    return {value: int(total) for value, total in query.group_by(LogRollup.key)}
+
+
+def parse_day(value, default):
+    return date.fromisoformat(value) if value else default
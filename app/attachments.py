@@ -0,0 +1,174 @@
+import base64
+import hashlib
+import mimetypes
+import mmap
+import os
+import smtplib
+import threading
+import uuid
+from email import policy
+from email.message import EmailMessage
+from werkzeug.utils import secure_filename
+from .models import TemplateAttachment, db
+from .rendering import message_head
+
+# 57 bytes viram exatamente uma linha base64 de 76 colunas
+LINE_BYTES = 57
+READ_LINES = 1024
+SEND_CHUNK = 64 * 1024
+
+
+def save_attachment(template, file, folder):
+    """
+    Store an uploaded file for ``template`` on disk (streamed, hashed on the
+    way) and encode its MIME part right away so the first send finds it ready.
+    """
+    os.makedirs(folder, exist_ok=True)
+    filename = file.filename or 'anexo'
+    content_type = file.mimetype or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    path = os.path.join(folder, f'{template.id}_{uuid.uuid4().hex}_{secure_filename(filename) or "anexo"}')
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'wb') as out:
+        for chunk in iter(lambda: file.stream.read(1024 * 1024), b''):
+            digest.update(chunk)
+            size += len(chunk)
+            out.write(chunk)
+    attachment = TemplateAttachment(template_id=template.id, filename=filename, content_type=content_type,
+                                    path=path, size=size, sha256=digest.hexdigest())
+    db.session.add(attachment)
+    encoded_part_path(attachment, folder)
+    return attachment
+
+
+def delete_attachment(attachment):
+    try:
+        os.remove(attachment.path)
+    except OSError:
+        pass
+    db.session.delete(attachment)
+
+
+def _part_key(attachment):
+    # O nome e o tipo vão nos cabeçalhos da parte, então fazem parte da chave
+    raw = f'{attachment.sha256}\0{attachment.filename}\0{attachment.content_type}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _header_block(message):
+    return b''.join(policy.SMTP.fold_binary(name, value) for name, value in message.items()) + b'\r\n'
+
+
+def _part_headers(attachment):
+    part = EmailMessage(policy=policy.SMTP)
+    maintype, _, subtype = attachment.content_type.partition('/')
+    part['Content-Type'] = f'{maintype or "application"}/{subtype or "octet-stream"}'
+    part.set_param('name', attachment.filename)
+    part['Content-Transfer-Encoding'] = 'base64'
+    part.add_header('Content-Disposition', 'attachment', filename=attachment.filename)
+    return _header_block(part)
+
+
+def encoded_part_path(attachment, folder):
+    """
+    Path of the attachment's encoded MIME part (headers + base64 body, CRLF
+    line endings), encoding it on first use.
+
+    The part is written to a temporary file and renamed into place, so
+    concurrent workers never read a half-written part; every send after that
+    reuses the same bytes instead of encoding the file again. Workers on other
+    hosts need ``ATTACHMENT_FOLDER`` on shared storage to share the cache.
+    """
+    parts = os.path.join(folder, 'parts')
+    path = os.path.join(parts, f'{_part_key(attachment)}.mime')
+    if os.path.exists(path):
+        return path
+    os.makedirs(parts, exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(attachment.path, 'rb') as src, open(tmp, 'wb') as out:
+        out.write(_part_headers(attachment))
+        for chunk in iter(lambda: src.read(LINE_BYTES * READ_LINES), b''):
+            out.writelines(base64.b64encode(chunk[i:i + LINE_BYTES]) + b'\r\n'
+                           for i in range(0, len(chunk), LINE_BYTES))
+    os.replace(tmp, path)
+    return path
+
+
+class PartCache:
+    """
+    Per-process cache of memory-mapped encoded parts.
+
+    The OS page cache holds the bytes once for every worker process on the
+    host; each send only walks the mapping, so its memory does not grow with
+    the attachment size.
+    """
+
+    def __init__(self):
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        with self._lock:
+            mapped = self._maps.get(path)
+            if mapped is None:
+                with open(path, 'rb') as f:
+                    mapped = self._maps[path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return mapped
+
+    def clear(self):
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+
+
+_part_cache = PartCache()
+
+
+def send_with_attachments(server, from_addr, to_address, subject, entity, attachments, folder):
+    """
+    Send a multipart/mixed message on a logged-in ``server``: ``entity`` (see
+    ``rendering.mime_entity``) first, then the cached attachment parts
+    streamed straight into the DATA phase.
+
+    Raises the same smtplib exceptions as ``SMTP.sendmail`` so callers can
+    classify failures the same way.
+    """
+    paths = [encoded_part_path(attachment, folder) for attachment in attachments]
+    boundary = f'=_{uuid.uuid4().hex}'
+    delimiter = f'\r\n--{boundary}\r\n'.encode('ascii')
+    # Tudo que não vem do cache é montado antes do DATA
+    prologue = (message_head(subject, from_addr, to_address) +
+                f'Content-Type: multipart/mixed; boundary="{boundary}"\r\n\r\n'.encode('ascii') +
+                delimiter[2:] + entity)
+
+    server.ehlo_or_helo_if_needed()
+    code, resp = server.mail(from_addr)
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+    code, resp = server.rcpt(to_address)
+    if code not in (250, 251):
+        server.rset()
+        raise smtplib.SMTPRecipientsRefused({to_address: (code, resp)})
+    code, resp = server.docmd('data')
+    if code != 354:
+        server.rset()
+        raise smtplib.SMTPDataError(code, resp)
+
+    try:
+        server.send(prologue)
+        for path in paths:
+            server.send(delimiter)
+            with memoryview(_part_cache.get(path)) as mapped:
+                for offset in range(0, len(mapped), SEND_CHUNK):
+                    server.send(mapped[offset:offset + SEND_CHUNK])
+        server.send(f'\r\n--{boundary}--\r\n.\r\n'.encode('ascii'))
+        code, resp = server.getreply()
+    except Exception:
+        # Conexão no meio do DATA não aceita mais comandos (nem QUIT)
+        server.close()
+        raise
+    if code != 250:
+        raise smtplib.SMTPDataError(code, resp)
+    return code, resp
@@ -0,0 +1,315 @@
+import email
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+from email import policy
+from email.parser import HeaderParser
+from email.utils import getaddresses
+from .models import Suppression, db
+from .state import get_counter_store
+from .validation import EmailAddressValidator
+
+HARD_BOUNCE = 'hard_bounce'
+COMPLAINT = 'complaint'
+MANUAL = 'manual'
+
+# Status DSN (RFC 3463) que indicam endereço inexistente ou desativado; recusas
+# de política (5.7.x) e falhas temporárias (4.x.x) não suprimem o endereço
+HARD_STATUS = ('5.1.', '5.2.1', '5.4.4')
+
+# Incrementado quando uma supressão é removida: os processos recarregam tudo
+GENERATION_KEY = 'suppression:generation'
+
+Bounce = namedtuple('Bounce', 'email reason status detail')
+
+# Só sintaxe e IDNA: mesma forma normalizada que enqueue_emails usa
+_normalizer = EmailAddressValidator()
+
+
+def normalize(address):
+    """
+    Normalized form of an address (as stored in Suppression), or None.
+    """
+    _, address = getaddresses([address or ''])[0]
+    normalized, _ = _normalizer.validate(address)
+    return normalized
+
+
+def _fields(part):
+    """
+    Header blocks of a message/delivery-status or message/feedback-report
+    part (the parser gives either sub-messages or the raw text).
+    """
+    payload = part.get_payload()
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, bytes):
+        payload = payload.decode('utf-8', 'replace')
+    return [HeaderParser(policy=policy.compat32).parsestr(block.strip() + '\n')
+            for block in payload.split('\n\n') if block.strip()]
+
+
+def _field_value(fields, name):
+    value = fields.get(name)
+    if not value:
+        return None
+    # 'rfc822; user@example.com' / 'smtp; 550 5.1.1 ...'
+    return ' '.join(str(value).split(';', 1)[-1].split())
+
+
+def _delivery_failures(part):
+    bounces = []
+    for fields in _fields(part)[1:]:
+        action = (_field_value(fields, 'Action') or '').lower()
+        status = _field_value(fields, 'Status') or ''
+        if action != 'failed' or not status.startswith(HARD_STATUS):
+            continue
+        address = normalize(_field_value(fields, 'Final-Recipient') or _field_value(fields, 'Original-Recipient'))
+        if address:
+            detail = _field_value(fields, 'Diagnostic-Code')
+            bounces.append(Bounce(address, HARD_BOUNCE, status, detail[:255] if detail else None))
+    return bounces
+
+
+def _complaint(message, part):
+    blocks = _fields(part)
+    fields = blocks[0] if blocks else {}
+    recipient = _field_value(fields, 'Original-Rcpt-To')
+    if not recipient:
+        # Sem Original-Rcpt-To: destinatário da mensagem original anexada
+        for original in message.walk():
+            if original.get_content_type() in ('message/rfc822', 'text/rfc822-headers'):
+                headers = _fields(original)
+                recipient = headers[0].get('To') if headers else None
+                break
+    address = normalize(recipient)
+    if not address:
+        return []
+    feedback = (_field_value(fields, 'Feedback-Type') or 'abuse').lower()
+    return [Bounce(address, COMPLAINT, None, feedback[:255])]
+
+
+def parse_bounce(message):
+    """
+    Hard bounces and complaints reported by one message: a DSN
+    (multipart/report; report-type=delivery-status, RFC 3464) or an ARF
+    complaint (report-type=feedback-report, RFC 5965). Anything else,
+    including delayed or temporary failures, yields an empty list.
+    """
+    if message.get_content_type() != 'multipart/report':
+        return []
+    report_type = (message.get_param('report-type') or '').lower()
+    for part in message.walk():
+        content_type = part.get_content_type()
+        if report_type == 'delivery-status' and content_type == 'message/delivery-status':
+            return _delivery_failures(part)
+        if report_type == 'feedback-report' and content_type == 'message/feedback-report':
+            return _complaint(message, part)
+    return []
+
+
+def read_maildir(path):
+    """
+    Yield ``(message, done)`` for every unread message in a Maildir's new/
+    folder; calling ``done()`` moves the file to cur/ with the Seen flag,
+    so each run only reads what arrived since the previous one.
+    """
+    new = os.path.join(path, 'new')
+    for name in sorted(os.listdir(new)):
+        source = os.path.join(new, name)
+        with open(source, 'rb') as f:
+            message = email.message_from_binary_file(f, policy=policy.compat32)
+        target = os.path.join(path, 'cur', name.split(':', 1)[0] + ':2,S')
+        yield message, (lambda source=source, target=target: os.replace(source, target))
+
+
+def read_mbox(path, store=None):
+    """
+    Yield ``(message, done)`` for the messages of an mbox file appended
+    since the last run. The file is not modified: ``done()`` records the
+    byte offset after the message (and the file's inode) in ``store``, and
+    the next run seeks there. A new inode or a shorter file (rotation,
+    truncation) starts over from the top. The last message is only read
+    once its terminating blank line is there, so a delivery still being
+    appended is picked up complete on the next run. Without ``store`` the
+    whole file is read each time.
+    """
+    key = f'bounces:mbox:{os.path.abspath(path)}'
+    stat = os.stat(path)
+    offset, inode = store.get_many([f'{key}:offset', f'{key}:inode']) if store is not None else (0, 0)
+    if inode != stat.st_ino or offset > stat.st_size:
+        offset = 0
+
+    def done(position):
+        if store is not None:
+            store.set(f'{key}:offset', position)
+            store.set(f'{key}:inode', stat.st_ino)
+
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        lines, position = [], offset
+        for line in f:
+            if line.startswith(b'From ') and lines:
+                yield _mbox_message(lines), (lambda end=position: done(end))
+                lines = []
+            lines.append(line)
+            position += len(line)
+        if lines and b''.join(lines[-2:]).endswith(b'\n\n'):
+            yield _mbox_message(lines), (lambda end=position: done(end))
+
+
+def _mbox_message(lines):
+    # Primeira linha é o separador "From remetente data" do mbox
+    return email.message_from_bytes(b''.join(lines[1:]), policy=policy.compat32)
+
+
+def suppress(bounces, user_id=None):
+    """
+    Insert the addresses in ``bounces`` that are not suppressed yet; returns
+    how many were added. Without ``user_id`` the suppressions are global
+    (bounces, complaints); with it they are that user's manual blocks. The
+    caller commits.
+    """
+    latest = {}
+    for bounce in bounces:
+        latest[bounce.email] = bounce
+    if not latest:
+        return 0
+    owner = Suppression.user_id.is_(None) if user_id is None else Suppression.user_id == user_id
+    existing = {row.email for row in db.session.query(Suppression.email)
+                .filter(Suppression.email.in_(list(latest)), owner)}
+    added = [Suppression(email=bounce.email, user_id=user_id, reason=bounce.reason, status=bounce.status,
+                         detail=bounce.detail)
+             for address, bounce in latest.items() if address not in existing]
+    db.session.add_all(added)
+    return len(added)
+
+
+def process_mailbox(path, batch_size=500, store=None):
+    """
+    Read bounce/complaint reports from ``path`` (a Maildir directory or an
+    mbox file) and record the hard bounces and complaints as suppressions.
+    Messages are committed and marked read in batches of ``batch_size``;
+    for an mbox the read position is kept in ``store`` (see read_mbox).
+    Returns ``{'messages', 'bounces', 'complaints', 'suppressed'}``.
+    """
+    messages = read_maildir(path) if os.path.isdir(path) else read_mbox(path, store)
+    stats = {'messages': 0, 'bounces': 0, 'complaints': 0, 'suppressed': 0}
+    bounces, done = [], []
+
+    def flush():
+        stats['suppressed'] += suppress(bounces)
+        db.session.commit()
+        # Só marca como lidas depois que as supressões foram gravadas
+        for mark in done:
+            mark()
+        bounces.clear()
+        done.clear()
+
+    for message, mark in messages:
+        found = parse_bounce(message)
+        stats['messages'] += 1
+        stats['bounces'] += sum(1 for bounce in found if bounce.reason == HARD_BOUNCE)
+        stats['complaints'] += sum(1 for bounce in found if bounce.reason == COMPLAINT)
+        bounces.extend(found)
+        done.append(mark)
+        if len(done) >= batch_size:
+            flush()
+    flush()
+    return stats
+
+
+def address_hash(address):
+    return int.from_bytes(hashlib.blake2b(address.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class SuppressionSet:
+    """
+    In-memory view of the Suppression table for O(1) checks per recipient:
+    ``address in suppressions`` checks the global (bounce/complaint) rows,
+    ``suppressions.blocks(address, user_id)`` adds that user's manual blocks.
+
+    Only a 64-bit hash of each address is kept (no strings, a few dozen
+    bytes per entry). ``refresh()`` is cheap to call before every batch:
+    at most every ``refresh_interval`` seconds it loads the rows with an id
+    above the last one seen; removals bump a shared generation counter, and
+    a changed generation (or ``reload_interval``) triggers a full reload.
+    """
+
+    def __init__(self, store=None, refresh_interval=60, reload_interval=3600):
+        self.store = store
+        self.refresh_interval = refresh_interval
+        self.reload_interval = reload_interval
+        self._hashes = set()
+        self._users = {}  # user_id -> hashes dos bloqueios manuais
+        self._last_id = 0
+        self._generation = None
+        self._checked_at = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, address):
+        return address_hash(address) in self._hashes
+
+    def blocks(self, address, user_id=None):
+        digest = address_hash(address)
+        return digest in self._hashes or digest in self._users.get(user_id, ())
+
+    def __len__(self):
+        return len(self._hashes) + sum(len(hashes) for hashes in self._users.values())
+
+    def _load(self, since_id, page_size=10000):
+        hashes, users, last_id = set(), {}, since_id
+        while True:
+            rows = (db.session.query(Suppression.id, Suppression.email, Suppression.user_id)
+                    .filter(Suppression.id > last_id).order_by(Suppression.id).limit(page_size).all())
+            for _, address, user_id in rows:
+                (hashes if user_id is None else users.setdefault(user_id, set())).add(address_hash(address))
+            if rows:
+                last_id = rows[-1][0]
+            if len(rows) < page_size:
+                return hashes, users, last_id
+
+    def refresh(self, force=False, now=None):
+        now = now if now is not None else time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.refresh_interval:
+            return
+        with self._lock:
+            generation = self.store.get_many([GENERATION_KEY])[0] if self.store is not None else 0
+            if (self._loaded_at is None or generation != self._generation
+                    or now - self._loaded_at >= self.reload_interval):
+                # Recarga completa: troca o conjunto inteiro de uma vez
+                self._hashes, self._users, self._last_id = self._load(0)
+                self._loaded_at = now
+            else:
+                hashes, users, self._last_id = self._load(self._last_id)
+                self._hashes |= hashes
+                for user_id, user_hashes in users.items():
+                    self._users.setdefault(user_id, set()).update(user_hashes)
+            self._generation = generation
+            self._checked_at = now
+
+    def invalidate(self):
+        """
+        Make every process reload on its next refresh (after a removal).
+        """
+        if self.store is not None:
+            self.store.incr(GENERATION_KEY)
+        self._checked_at = None
+
+
+_suppression_set = None
+
+
+def get_suppression_set(config):
+    """
+    Process-wide SuppressionSet, refreshed incrementally.
+    """
+    global _suppression_set
+    if _suppression_set is None:
+        _suppression_set = SuppressionSet(get_counter_store(config), config['SUPPRESSION_REFRESH_INTERVAL'],
+                                          config['SUPPRESSION_RELOAD_INTERVAL'])
+    _suppression_set.refresh()
+    return _suppression_set
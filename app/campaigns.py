@@ -0,0 +1,302 @@
+import json
+import math
+from collections import defaultdict
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func
+from .models import Campaign, CampaignShard, Contact, ContactList, Robot, RobotLog, db
+from .filters import apply_filters
+from .email_service import enqueue_emails
+from .fairness import DeficitRoundRobin
+from .queues import CAMPAIGN, MAINTENANCE, queue_options
+from .state import get_counter_store
+
+FAIR = 'fair'
+DISPATCH_LOCK = 'campaign-dispatch:lock'
+COMPOSE_FLOW = 0  # fluxo das campanhas sem robô (/compose) de cada usuário
+
+
+def recipient_query(robot):
+    """
+    Contacts targeted by a robot: its ``contact_title`` plus ``filter_rules``.
+    """
+    query = Contact.query.filter(Contact.titulo == robot.contact_title)
+    return apply_filters(query, Contact, robot.filter_rules or {})
+
+
+def compose_query(user_id, filters):
+    """
+    Contacts targeted by a /compose send: the user's lists plus ``filters``.
+    """
+    query = Contact.query.join(ContactList, Contact.list_id == ContactList.id).filter(ContactList.user_id == user_id)
+    return apply_filters(query, Contact, filters or {})
+
+
+def campaign_recipients(campaign):
+    if campaign.robot_id is None:
+        return compose_query(campaign.template.user_id, campaign.filter_rules)
+    return recipient_query(campaign.robot)
+
+
+def create_campaign(robot, shard_count=None, strategy='range'):
+    """
+    Create a Campaign for ``robot`` split into ``shard_count`` shards.
+
+    ``range`` splits [min(id), max(id)] of the audience into contiguous id
+    ranges; ``hash`` assigns contacts by ``id % shard_count``. Either way each
+    shard later walks its contacts by primary key from its checkpoint.
+    """
+    campaign = Campaign(robot_id=robot.id, template_id=robot.template_id, status='running', strategy=strategy)
+    return _add_shards(campaign, shard_count)
+
+
+def create_compose_campaign(template, filters, rate_limit=None, shard_count=None):
+    """
+    Create a robot-less Campaign for a large /compose send, so it is fed by
+    the same (fair) dispatcher as robot campaigns instead of flooding the
+    campaign queue at once.
+    """
+    campaign = Campaign(robot_id=None, template_id=template.id, filter_rules=filters or {},
+                        rate_limit=rate_limit or None, status='running', strategy='range')
+    campaign.template = template
+    return _add_shards(campaign, shard_count)
+
+
+def _add_shards(campaign, shard_count):
+    shard_count = shard_count or current_app.config['CAMPAIGN_SHARDS']
+    strategy = campaign.strategy
+    campaign.shard_count = shard_count
+    db.session.add(campaign)
+    db.session.flush()
+
+    min_id, max_id = campaign_recipients(campaign).with_entities(func.min(Contact.id), func.max(Contact.id)).one()
+    if min_id is None:
+        campaign.status = 'done'
+        campaign.finished_at = datetime.utcnow()
+        return campaign
+
+    span = max_id - min_id + 1
+    for index in range(shard_count):
+        shard = CampaignShard(campaign_id=campaign.id, shard_index=index, last_contact_id=0, queued=0)
+        if strategy == 'range':
+            shard.min_id = min_id + span * index // shard_count
+            shard.max_id = min_id + span * (index + 1) // shard_count - 1
+            shard.last_contact_id = shard.min_id - 1
+            if shard.max_id < shard.min_id:
+                shard.status = 'done'
+        db.session.add(shard)
+    return campaign
+
+
+def dispatch_shards(campaign):
+    """
+    Start (or resume) every unfinished shard.
+
+    With CAMPAIGN_SCHEDULER='fair' the shards are only marked running and
+    the fair dispatcher (dispatch_fair) feeds them; otherwise each shard
+    runs in parallel on the campaign queue as fast as it can enqueue.
+    Bumping ``generation`` makes any task still running from a previous
+    dispatch stop at its next batch, so a shard never has two runners.
+    """
+    from .tasks import dispatch_campaigns_task, run_campaign_shard_task
+    pending = [shard for shard in campaign.shards if shard.status != 'done']
+    for shard in pending:
+        shard.generation = (shard.generation or 0) + 1
+        shard.status = 'running'
+    db.session.commit()
+    if current_app.config['CAMPAIGN_SCHEDULER'] == FAIR:
+        # Não espera o próximo tick do beat para começar
+        dispatch_campaigns_task.apply_async(**queue_options(MAINTENANCE, current_app.config))
+        return len(pending)
+    options = queue_options(CAMPAIGN, current_app.config)
+    for shard in pending:
+        run_campaign_shard_task.apply_async(args=[shard.id, shard.generation], **options)
+    return len(pending)
+
+
+def _shard_batch(campaign, shard, batch_size):
+    query = campaign_recipients(campaign).filter(Contact.id > shard.last_contact_id)
+    if campaign.strategy == 'range':
+        query = query.filter(Contact.id <= shard.max_id)
+    else:
+        query = query.filter(Contact.id % campaign.shard_count == shard.shard_index)
+    return query.order_by(Contact.id).limit(batch_size).all()
+
+
+def _finish_campaign(campaign):
+    if all(shard.status == 'done' for shard in campaign.shards):
+        campaign.status = 'done'
+        campaign.finished_at = datetime.utcnow()
+
+
+def run_shard_batch(shard_id, generation, batch_size=None):
+    """
+    Enqueue the next batch of one shard and advance its checkpoint.
+
+    Returns the delay in seconds before the shard's next batch, or None when
+    the shard should stop (done, paused or superseded). When the owner's quota
+    runs out the checkpoint stops just before the first contact left out and
+    the shard retries after LIMITS_RETRY_DELAY.
+    If a crash happens between enqueueing and the checkpoint commit, the batch
+    is enqueued again on resume; the (campaign, contact) idempotency key stops
+    those repeats from being sent twice.
+    """
+    batch_size = batch_size or current_app.config['CAMPAIGN_BATCH_SIZE']
+    shard = CampaignShard.query.get(shard_id)
+    if not shard or shard.generation != generation or shard.status == 'done':
+        return None
+    campaign = shard.campaign
+    # Campanha sem robô: envio grande do /compose
+    robot = Robot.query.get(campaign.robot_id) if campaign.robot_id is not None else None
+    if campaign.status != 'running' or (campaign.robot_id is not None and (not robot or not robot.active)):
+        # Pausado: o checkpoint fica onde está até a próxima retomada
+        shard.status = 'pending'
+        db.session.commit()
+        return None
+
+    contacts = _shard_batch(campaign, shard, batch_size)
+    if not contacts:
+        shard.status = 'done'
+        _finish_campaign(campaign)
+        db.session.commit()
+        return None
+
+    if robot is None:
+        result = enqueue_emails(campaign.template, contacts, rate_limit=campaign.rate_limit,
+                                campaign_id=campaign.id)
+    else:
+        result = enqueue_emails(robot.template, contacts, rate_limit=str(robot.emails_per_hour),
+                                robot_id=robot.id, campaign_id=campaign.id)
+    if robot is not None and result['rejected']['total']:
+        db.session.add(RobotLog(robot_id=robot.id, action='reject', details=json.dumps(result['rejected'])))
+    shard.queued = (shard.queued or 0) + result['queued']
+    if result['limited']:
+        # Cota esgotada: retomar a partir do primeiro contato que ficou de fora
+        shard.last_contact_id = result['deferred_from'] - 1
+        db.session.commit()
+        return current_app.config['LIMITS_RETRY_DELAY']
+    shard.last_contact_id = contacts[-1].id
+    db.session.commit()
+    return 0
+
+
+def pause_campaign(campaign):
+    campaign.status = 'paused'
+    db.session.commit()
+
+
+def resume_campaign(campaign):
+    campaign.status = 'running'
+    return dispatch_shards(campaign)
+
+
+def _defer_key(shard_id):
+    return f'campaign-defer:{shard_id}'
+
+
+def queue_depth(name):
+    """
+    Messages waiting in broker queue ``name`` (every priority level).
+    """
+    from app import celery
+    from kombu.exceptions import ChannelError
+    with celery.connection_for_read() as conn:
+        try:
+            return conn.default_channel.queue_declare(queue=name, passive=True).message_count
+        except ChannelError:
+            return 0
+
+
+def _dispatchable(store):
+    """
+    Running campaigns with shards ready to enqueue, as ``{user_id:
+    {flow_id: (weight, [(campaign, shards)])}}``. Robot campaigns (of active
+    robots) are grouped by robot; the user's /compose campaigns share flow
+    ``COMPOSE_FLOW``.
+    """
+    tree = defaultdict(dict)
+    campaigns = Campaign.query.filter_by(status='running').all()
+    shards = [shard for campaign in campaigns for shard in campaign.shards if shard.status == 'running']
+    deferred = dict(zip([shard.id for shard in shards],
+                        store.get_many([_defer_key(shard.id) for shard in shards])))
+    for campaign in campaigns:
+        ready = [shard for shard in campaign.shards if shard.status == 'running' and not deferred[shard.id]]
+        if not ready:
+            continue
+        robot = campaign.robot
+        if campaign.robot_id is None:
+            flow, weight = COMPOSE_FLOW, 1
+        elif robot is not None and robot.active:
+            flow, weight = robot.id, robot.weight or 1
+        else:
+            continue
+        tree[campaign.owner_id].setdefault(flow, (weight, []))[1].append((campaign, ready))
+    return tree
+
+
+def _run_campaign(shards, grant, store):
+    """
+    Enqueue up to ``grant`` sends from the campaign's ready shards, split
+    evenly; returns how many were queued.
+    """
+    queued = 0
+    share = math.ceil(grant / len(shards))
+    for shard in shards:
+        size = min(share, grant - queued)
+        if size <= 0:
+            break
+        before = shard.queued or 0
+        delay = run_shard_batch(shard.id, shard.generation, batch_size=size)
+        queued += (shard.queued or 0) - before
+        if delay:
+            # Cota do dono esgotada: o shard fica fora dos próximos ticks
+            store.set(_defer_key(shard.id), 1, ttl=delay)
+    return queued
+
+
+def dispatch_fair(config, depth=None):
+    """
+    One tick of the fair campaign scheduler.
+
+    The campaign queue is topped up to CAMPAIGN_TARGET_DEPTH messages, which
+    keeps the workers busy while bounding how long a newly started robot
+    waits behind everyone else's backlog. The free room is split by deficit
+    round-robin first among users (CAMPAIGN_USER_WEIGHTS, default 1), then
+    among each user's robots (Robot.weight) and large /compose sends (weight
+    1), then among each robot's campaigns; every campaign asks for at most
+    CAMPAIGN_BATCH_SIZE per tick.
+    Returns ``{campaign_id: queued}``, or None if another tick is running.
+    """
+    store = get_counter_store(config)
+    if store.incr(DISPATCH_LOCK, ttl=config['CAMPAIGN_DISPATCH_INTERVAL'] * 12) > 1:
+        return None
+    try:
+        depth = queue_depth(CAMPAIGN) if depth is None else depth
+        capacity = config['CAMPAIGN_TARGET_DEPTH'] - depth
+        tree = _dispatchable(store)
+        if capacity <= 0 or not tree:
+            return {}
+        drr = DeficitRoundRobin(store, config['CAMPAIGN_FAIR_QUANTUM'])
+        batch = config['CAMPAIGN_BATCH_SIZE']
+        user_weights = config['CAMPAIGN_USER_WEIGHTS']
+        user_grants = drr.allocate('user', {
+            user_id: (int(user_weights.get(str(user_id), 1)),
+                      sum(batch * len(campaigns) for _, campaigns in flows.values()))
+            for user_id, flows in tree.items()}, capacity)
+
+        queued = {}
+        for user_id, flows in tree.items():
+            flow_grants = drr.allocate(f'robot:{user_id}', {
+                flow: (weight, batch * len(campaigns)) for flow, (weight, campaigns) in flows.items()},
+                user_grants[user_id])
+            for flow, flow_grant in flow_grants.items():
+                campaigns = {campaign.id: (campaign, shards) for campaign, shards in flows[flow][1]}
+                campaign_grants = drr.allocate(f'campaign:{user_id}:{flow}', {
+                    campaign_id: (1, batch) for campaign_id in campaigns}, flow_grant)
+                for campaign_id, grant in campaign_grants.items():
+                    if grant:
+                        _, shards = campaigns[campaign_id]
+                        queued[campaign_id] = _run_campaign(shards, grant, store)
+        return queued
+    finally:
+        store.delete(DISPATCH_LOCK)
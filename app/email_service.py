@@ -1,37 +1,91 @@
-from flask import render_template_string
+from flask import current_app
 from .tasks import send_email_task
 from .models import SendLog, Contact, db
 from flask_mail import Message
 from app import mail
+from .validation import get_validator, summarize_rejects
+from .queues import CAMPAIGN, queue_options
+from .limits import get_quota_service
+from .rendering import compile_template, contact_context
+from .bounces import get_suppression_set
 import smtplib
 from email.mime.text import MIMEText
 
-def enqueue_emails(template, contacts, rate_limit=None, robot_id=None):
+def enqueue_emails(template, contacts, rate_limit=None, robot_id=None, queue=CAMPAIGN, campaign_id=None):
     """
     Enqueue emails for sending with optional rate limit.
+
+    Addresses are normalized and validated first; invalid and suppressed
+    (bounced, complained or blocked by the owner) ones are skipped and
+    returned in bulk as ``{'queued': n, 'rejected': summarize_rejects(...)}``.
+    The owner's daily/monthly quota is then reserved for the whole batch in one
+    call; contacts that do not fit are left out and reported as ``limited``,
+    with ``deferred_from`` holding the id of the first of them.
+    ``queue`` selects the Celery queue (and its priority) for the sends;
+    ``campaign_id`` ties the sends to a Campaign for idempotency.
+    With RENDER_IN_WORKER the tasks carry only ids and the template version,
+    and workers render with their cached compiled template; otherwise the
+    rendered subject and bodies travel in the task arguments.
     """
+    validator = get_validator(current_app.config)
+    suppressions = get_suppression_set(current_app.config)
+    options = queue_options(queue, current_app.config)
+    candidates = []
+    rejects = []
     for contact in contacts:
-        # Construir contexto de dados a partir dos atributos do model
-        data = {col.name: getattr(contact, col.name) for col in contact.__table__.columns}
-        # Render dynamic subject and body
-        subject = render_template_string(template.subject, **data)
-        body = render_template_string(template.body, **data)
-        # Queue task (destinatário, assunto, corpo)
-        # Enfileirar task com robot_id para que a task saiba onde buscar credenciais
-        send_email_task.apply_async(
-            args=[robot_id, data.get('email'), subject, body],
-            rate_limit=rate_limit or ''
-        )
+        address, reason = validator.validate(contact.email)
+        if reason:
+            rejects.append((contact.email, reason))
+            continue
+        if suppressions.blocks(address, template.user_id):
+            rejects.append((contact.email, 'suppressed'))
+            continue
+        candidates.append((contact, address))
+
+    granted = get_quota_service(current_app.config).reserve(template.user_id, len(candidates))
+    limited = candidates[granted:]
+    render_in_worker = current_app.config['RENDER_IN_WORKER']
+    # Template compilado uma vez por versão (texto derivado do HTML incluso)
+    compiled = None if render_in_worker else compile_template(template)
+    template_id, template_version = template.id, template.version
+    pending = []
+    for contact, address in candidates[:granted]:
         # Log as pending
-        log = SendLog(contact_id=contact.id, template_id=template.id, status='pending')
+        log = SendLog(contact_id=contact.id, template_id=template_id, status='pending')
         db.session.add(log)
+        pending.append((log, contact, address))
+    db.session.flush()
+    # Ids e textos lidos antes do commit, que expira os objetos da sessão
+    pending = [(log.id, contact.id, address, None if render_in_worker else contact_context(contact, address))
+               for log, contact, address in pending]
+    # Confirmar os SendLogs antes de enfileirar: o id é a chave de idempotência
+    # e o worker pode atualizar o status assim que receber a task
     db.session.commit()
-    
+    for log_id, contact_id, address, context in pending:
+        kwargs = {'send_log_id': log_id, 'contact_id': contact_id, 'template_id': template_id,
+                  'campaign_id': campaign_id, 'reserved': True}
+        if render_in_worker:
+            # Só ids no broker: o tamanho da mensagem não depende do corpo
+            args = [robot_id]
+            kwargs['template_version'] = template_version
+        else:
+            subject, body, html = compiled.render(context)
+            args = [robot_id, address, subject, body]
+            kwargs['html'] = html
+        # Enfileirar task com robot_id para que a task saiba onde buscar credenciais
+        send_email_task.apply_async(args=args, kwargs=kwargs, rate_limit=rate_limit or '', **options)
+    return {
+        'queued': len(pending),
+        'rejected': summarize_rejects(rejects),
+        'limited': len(limited),
+        'deferred_from': limited[0][0].id if limited else None,
+    }
+
 def send_email(subject, recipients, body, html=None):
     msg = Message(subject, recipients=recipients, body=body, html=html)
     mail.send(msg)
 
-def send_email_via_smtp(to_address, smtp_config):
+def send_email_via_smtp(to_address, smtp_config, timeout=None):
     """
     Envia um email usando configurações SMTP dinâmicas.
     """
@@ -41,7 +95,9 @@ def send_email_via_smtp(to_address, smtp_config):
         msg['From'] = smtp_config['username']
         msg['To'] = to_address
 
-        with smtplib.SMTP(smtp_config['server'], smtp_config['port']) as server:
+        # Sem timeout um servidor que não responde prende quem chamou indefinidamente
+        smtp_options = {'timeout': timeout} if timeout else {}
+        with smtplib.SMTP(smtp_config['server'], smtp_config['port'], **smtp_options) as server:
             server.starttls()
             server.login(smtp_config['username'], smtp_config['password'])
             server.sendmail(smtp_config['username'], [to_address], msg.as_string())
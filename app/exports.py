@@ -0,0 +1,131 @@
+import csv
+import io
+import tempfile
+from datetime import datetime
+from sqlalchemy import select
+from .models import Contact, ContactList, EmailTemplate, Robot, RobotLog, SendLog, db
+
+STREAM_CHUNK = 64 * 1024
+# Limite de linhas de uma planilha do Excel, cabeçalho incluso
+XLSX_SHEET_ROWS = 1048576
+
+# Exportação -> (model, colunas)
+EXPORTS = {
+    'contacts': (Contact, ['id', 'list_id', 'titulo', 'email', 'nome_congresso', 'ano_congresso']),
+    'send_logs': (SendLog, ['id', 'contact_id', 'template_id', 'status', 'timestamp']),
+    'robot_logs': (RobotLog, ['id', 'robot_id', 'action', 'details', 'timestamp']),
+}
+
+
+def export_filters(name, user_id, args):
+    """
+    WHERE clauses for an export: always scoped to the user's own lists,
+    templates or robots, plus the optional filters from the query string.
+    Raises ValueError on malformed dates.
+    """
+    model, _ = EXPORTS[name]
+    if name == 'contacts':
+        filters = [Contact.list_id.in_(select(ContactList.id).where(ContactList.user_id == user_id))]
+        if args.get('list_id'):
+            filters.append(Contact.list_id == int(args['list_id']))
+        if args.get('titulo'):
+            filters.append(Contact.titulo == args['titulo'])
+        return filters
+    if name == 'send_logs':
+        filters = [SendLog.template_id.in_(select(EmailTemplate.id).where(EmailTemplate.user_id == user_id))]
+        if args.get('template_id'):
+            filters.append(SendLog.template_id == int(args['template_id']))
+        if args.get('status'):
+            filters.append(SendLog.status == args['status'])
+    else:
+        filters = [RobotLog.robot_id.in_(select(Robot.id).where(Robot.user_id == user_id))]
+        if args.get('robot_id'):
+            filters.append(RobotLog.robot_id == int(args['robot_id']))
+        if args.get('action'):
+            filters.append(RobotLog.action == args['action'])
+    if args.get('start'):
+        filters.append(model.timestamp >= datetime.fromisoformat(args['start']))
+    if args.get('end'):
+        filters.append(model.timestamp < datetime.fromisoformat(args['end']))
+    return filters
+
+
+def iter_rows(name, filters, page_size, yield_per=1000):
+    """
+    Yield the export's rows as tuples in primary-key order.
+
+    Rows come in keyset pages of ``page_size``, each read through a
+    server-side cursor (``yield_per``), and the transaction ends after every
+    page, so a long export never holds one snapshot or cursor open for its
+    whole duration and memory stays bounded by the page, not the result.
+    """
+    model, columns = EXPORTS[name]
+    last_id = 0
+    while True:
+        stmt = (select(*[getattr(model, column) for column in columns])
+                .where(model.id > last_id, *filters)
+                .order_by(model.id)
+                .limit(page_size)
+                .execution_options(yield_per=yield_per))
+        count = 0
+        for row in db.session.execute(stmt):
+            count += 1
+            last_id = row[0]
+            yield tuple(row)
+        # Fecha a transação entre páginas (só leitura)
+        db.session.commit()
+        if count < page_size:
+            return
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def csv_lines(columns, rows):
+    """
+    Encode rows (sequences) as CSV text one line at a time, header first.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([_csv_value(value) for value in row])
+    yield buffer.getvalue()
+
+
+def xlsx_chunks(columns, rows, title='export', sheet_rows=XLSX_SHEET_ROWS):
+    """
+    Build an XLSX in openpyxl write-only mode (rows go straight to a temp
+    file, not a worksheet in memory) and stream the finished file in chunks.
+
+    A sheet holds at most ``sheet_rows`` rows; past that the export goes on
+    in a new sheet (``title 2``, ``title 3``...) that repeats the header.
+    """
+    # openpyxl só é carregado quando alguém pede XLSX
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheets = written = 0
+    for row in rows:
+        if sheet is None or written == sheet_rows - 1:
+            sheets += 1
+            suffix = f' {sheets}' if sheets > 1 else ''
+            sheet = workbook.create_sheet(title=title[:31 - len(suffix)] + suffix)
+            sheet.append(columns)
+            written = 0
+        sheet.append([ILLEGAL_CHARACTERS_RE.sub('', value) if isinstance(value, str) else value for value in row])
+        written += 1
+    if sheet is None:
+        # Exportação vazia: só o cabeçalho
+        workbook.create_sheet(title=title[:31]).append(columns)
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        for chunk in iter(lambda: f.read(STREAM_CHUNK), b''):
+            yield chunk
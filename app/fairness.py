@@ -0,0 +1,80 @@
+from bisect import bisect_left
+from collections import deque
+
+
+class DeficitRoundRobin:
+    """
+    Deficit round-robin split of send capacity among flows (users, robots,
+    campaigns), in proportion to their weights.
+
+    Flows take turns in id order. A flow starting its turn earns
+    ``quantum * weight`` of credit (never more in total) and sends until the
+    credit, its demand or the capacity runs out; a flow that runs out of
+    demand loses what is left. When the capacity of a call runs out in the
+    middle of a turn, the flow and its remaining credit are kept in the
+    shared store under ``drr:<level>:...`` and the next call resumes that
+    same turn without new credit, so a capacity smaller than a round still
+    converges to the weighted shares over successive dispatches. Flow ids
+    are integers (user, robot and campaign ids).
+    """
+
+    def __init__(self, store, quantum, ttl=86400):
+        if quantum <= 0:
+            raise ValueError('quantum deve ser maior que zero')
+        self.store = store
+        self.quantum = quantum
+        self.ttl = ttl  # crédito de fluxos que somem (campanha encerrada) expira sozinho
+
+    @staticmethod
+    def _key(level, flow):
+        return f'drr:{level}:{flow}'
+
+    def allocate(self, level, flows, capacity):
+        """
+        Split ``capacity`` among ``flows`` ({flow_id: (weight, demand)});
+        returns {flow_id: grant} with every grant <= its demand.
+        """
+        active = sorted(flow for flow, (weight, demand) in flows.items() if demand > 0 and weight > 0)
+        grants = {flow: 0 for flow in flows}
+        if not active or capacity <= 0:
+            return grants
+        cursor_key = self._key(level, 'cursor')
+        # Cursor guardado como id + 1 (0 = nenhum): o fluxo que começa a próxima vez
+        cursor, *stored = self.store.get_many([cursor_key] + [self._key(level, flow) for flow in active])
+        deficits = dict(zip(active, stored))
+        start = bisect_left(active, cursor - 1) % len(active) if cursor else 0
+        queue = deque(active[start:] + active[:start])
+        demand = {flow: flows[flow][1] for flow in active}
+        # Vez interrompida pela capacidade na chamada anterior: continua sem novo crédito
+        resume = bool(cursor) and queue[0] == cursor - 1 and deficits[queue[0]] > 0
+
+        next_flow = None
+        while queue:
+            flow = queue.popleft()
+            quantum = max(int(self.quantum * flows[flow][0]), 1)
+            if not resume:
+                deficits[flow] += quantum
+            resume = False
+            deficits[flow] = min(deficits[flow], quantum)
+            sent = min(deficits[flow], demand[flow], capacity)
+            grants[flow] += sent
+            deficits[flow] -= sent
+            demand[flow] -= sent
+            capacity -= sent
+            if not demand[flow]:
+                deficits[flow] = 0
+            elif deficits[flow]:
+                # Capacidade acabou no meio da vez deste fluxo
+                next_flow = flow
+                break
+            else:
+                queue.append(flow)
+            if not capacity:
+                next_flow = queue[0] if queue else None
+                break
+
+        for flow, deficit in deficits.items():
+            self.store.set(self._key(level, flow), deficit, ttl=self.ttl)
+        if next_flow is not None:
+            self.store.set(cursor_key, next_flow + 1, ttl=self.ttl)
+        return grants
@@ -0,0 +1,175 @@
+import hashlib
+import threading
+import time
+from .state import redis_client
+
+PENDING = 'pending'
+DONE = 'done'
+
+
+def delivery_key(robot_id, to_address=None, send_log_id=None, contact_id=None, template_id=None, content=None,
+                 campaign_id=None):
+    """
+    Idempotency key for one delivery.
+
+    Campaign sends use (campaign, contact), which stays stable when a shard
+    re-enqueues a batch after a crash. Otherwise prefers the SendLog id, then
+    (robot, contact, template); as a last resort hashes the recipient and
+    rendered content.
+    """
+    if campaign_id is not None and contact_id is not None:
+        return f'send:campaign:{campaign_id}:{contact_id}'
+    if send_log_id is not None:
+        return f'send:log:{send_log_id}'
+    if contact_id is not None and template_id is not None:
+        return f'send:{robot_id}:{contact_id}:{template_id}'
+    digest = hashlib.sha1(f'{to_address}\0{content or ""}'.encode('utf-8')).hexdigest()
+    return f'send:{robot_id}:{digest}'
+
+
+class MemoryIdempotencyStore:
+    """
+    In-process stand-in for the Redis store (tests, single worker, no Redis).
+
+    A pending claim remembers its ``owner`` (a token of the attempt that
+    made it), so only that attempt can renew it with ``take_over``.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        entry = self._data.get(key)
+        if entry and entry[1] < time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    def claim(self, key, ttl, owner=None):
+        with self._lock:
+            if self._get(key):
+                return False
+            self._data[key] = (PENDING, time.monotonic() + ttl, owner)
+            return True
+
+    def take_over(self, key, ttl, owner):
+        with self._lock:
+            entry = self._get(key)
+            if not entry or entry[0] != PENDING or owner is None or entry[2] != owner:
+                return False
+            self._data[key] = (PENDING, time.monotonic() + ttl, owner)
+            return True
+
+    def complete(self, key, ttl):
+        with self._lock:
+            self._data[key] = (DONE, time.monotonic() + ttl, None)
+
+    def release(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def status(self, key):
+        with self._lock:
+            entry = self._get(key)
+            return entry[0] if entry else None
+
+
+class RedisIdempotencyStore:
+    """
+    Claims with ``SET key pending:<owner> NX EX ttl``; completion overwrites
+    with ``done``. ``take_over`` refreshes a pending claim only if the same
+    owner holds it (compare-and-set in one script).
+    """
+
+    TAKE_OVER = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    end
+    return false
+    """
+
+    def __init__(self, client, prefix='idem:'):
+        self.client = client
+        self.prefix = prefix
+
+    def claim(self, key, ttl, owner=None):
+        return bool(self.client.set(self.prefix + key, f'{PENDING}:{owner or ""}', nx=True, ex=ttl))
+
+    def take_over(self, key, ttl, owner):
+        if owner is None:
+            return False
+        return bool(self.client.eval(self.TAKE_OVER, 1, self.prefix + key, f'{PENDING}:{owner}', ttl))
+
+    def complete(self, key, ttl):
+        self.client.set(self.prefix + key, DONE, ex=ttl)
+
+    def release(self, key):
+        self.client.delete(self.prefix + key)
+
+    def status(self, key):
+        value = self.client.get(self.prefix + key)
+        value = value.decode() if isinstance(value, bytes) else value
+        return value.split(':', 1)[0] if value else value
+
+
+class ClaimKeeper:
+    """
+    Keeps a pending claim alive while a send runs longer than its TTL (slow
+    server, large attachments).
+
+    Used as a context manager around the SMTP session: a daemon thread renews
+    the claim (``take_over`` by the same owner) every third of the TTL, so
+    the TTL only has to cover a crashed worker, not the longest send.
+    ``held()`` renews it once more and says whether the claim is still ours;
+    once it is lost, ``lost`` stays True and the caller must not send.
+    """
+
+    def __init__(self, store, key, ttl, owner):
+        self.store = store
+        self.key = key
+        self.ttl = ttl
+        self.owner = owner
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def held(self):
+        if not self.lost and not self.store.take_over(self.key, self.ttl, self.owner):
+            self.lost = True
+        return not self.lost
+
+    def _run(self):
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                if not self.held():
+                    return
+            except Exception:
+                # Falha momentânea do Redis: tenta de novo no próximo intervalo
+                continue
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name=f'claim:{self.key}', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+_store = None
+
+
+def get_store(config):
+    """
+    Process-wide store chosen by IDEMPOTENCY_BACKEND ('redis' or 'memory').
+    """
+    global _store
+    if _store is None:
+        if config.get('IDEMPOTENCY_BACKEND') == 'redis':
+            _store = RedisIdempotencyStore(redis_client(config['IDEMPOTENCY_REDIS_URL']))
+        else:
+            _store = MemoryIdempotencyStore()
+    return _store
@@ -0,0 +1,149 @@
+import math
+import os
+import unicodedata
+from flask import current_app
+from .models import ContactImport, db
+from .loaders import get_contact_loader
+from .validation import get_validator
+
+REJECT_SAMPLE_SIZE = 100
+
+# A coluna 'numero' representa o identificador importado, substituindo 'num'
+REQUIRED_COLUMNS = ['numero', 'titulo', 'emails', 'nome_do_congresso', 'ano_do_congresso']
+
+
+def normalize_col(col):
+    # Remove acentos, coloca em minúsculo e troca espaços por underline
+    col = unicodedata.normalize('NFKD', str(col)).encode('ASCII', 'ignore').decode('ASCII')
+    return col.strip().lower().replace(' ', '_')
+
+
+def read_dataframe(path):
+    """
+    Read an uploaded spreadsheet (xlsx, xls or csv) with normalized column names.
+    """
+    # pandas (e openpyxl, via read_excel) só é carregado quando há importação
+    import pandas as pd
+    if os.path.splitext(path)[1].lower() == '.csv':
+        df = pd.read_csv(path, dtype=str)
+    else:
+        df = pd.read_excel(path, dtype=str)
+    df.columns = [normalize_col(col) for col in df.columns]
+    return df
+
+
+def missing_columns(df):
+    return [col for col in REQUIRED_COLUMNS if col not in df.columns]
+
+
+def _cell(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    return str(value).strip()
+
+
+def row_to_contacts(row, list_id, validator):
+    """
+    Split one spreadsheet row into Contact field dicts, one per valid address
+    in 'emails'. Returns ``(contacts, rejects)``.
+    """
+    emails = [e for e in _cell(row['emails']).split(',') if e.strip()]
+    if not emails:
+        return [], [('', 'empty')]
+    valid, rejects = validator.validate_many(emails)
+    contacts = [{
+        'list_id': list_id,
+        'titulo': _cell(row['titulo']),
+        'email': email,
+        'nome_congresso': _cell(row['nome_do_congresso']),
+        'ano_congresso': _cell(row['ano_do_congresso']),
+    } for email in valid]
+    return contacts, [(address.strip(), reason) for address, reason in rejects]
+
+
+def _record_rejects(job, rejects):
+    reasons = dict(job.reject_reasons or {})
+    for _, reason in rejects:
+        reasons[reason] = reasons.get(reason, 0) + 1
+    job.reject_reasons = reasons
+    samples = list(job.reject_samples or [])
+    room = REJECT_SAMPLE_SIZE - len(samples)
+    if room > 0:
+        samples.extend({'email': address, 'reason': reason} for address, reason in rejects[:room])
+        job.reject_samples = samples
+    job.rejects += len(rejects)
+
+
+def run_import(job, progress=None, validator=None):
+    """
+    Import the file of a ContactImport chunk by chunk.
+
+    Each chunk's contacts and the job counters are committed in the same
+    transaction, so ``last_chunk`` always matches what is in the database and a
+    rerun after a crash resumes from the next chunk without duplicates.
+    ``progress`` is called with ``job.to_dict()`` after every commit.
+    Addresses are normalized and validated on the way in; rejects are counted
+    per reason on the job.
+    """
+    validator = validator or get_validator(current_app.config)
+    job.status = 'running'
+    job.error = None
+    db.session.commit()
+
+    df = read_dataframe(job.file_path)
+    missing = missing_columns(df)
+    if missing:
+        job.status = 'failed'
+        job.error = f'Colunas obrigatórias ausentes: {", ".join(missing)}'
+        db.session.commit()
+        return job
+
+    job.total_rows = len(df)
+    loader = get_contact_loader(db.session)
+    chunk_size = job.chunk_size
+    start = (job.last_chunk + 1) * chunk_size
+    for offset in range(start, len(df), chunk_size):
+        chunk = df.iloc[offset:offset + chunk_size]
+        contacts = []
+        rejects = []
+        for _, row in chunk.iterrows():
+            found, rejected = row_to_contacts(row, job.list_id, validator)
+            contacts.extend(found)
+            rejects.extend(rejected)
+        inserted = loader.load(contacts)
+        job.rows_parsed = offset + len(chunk)
+        job.rows_inserted += inserted
+        _record_rejects(job, rejects)
+        job.last_chunk = offset // chunk_size
+        db.session.commit()
+        if progress:
+            progress(job.to_dict())
+
+    job.status = 'done'
+    db.session.commit()
+    try:
+        os.remove(job.file_path)
+    except OSError:
+        pass
+    return job
+
+
+def create_import(file, list_id, user_id, upload_folder, chunk_size):
+    """
+    Persist the uploaded file to disk and register a pending ContactImport.
+    """
+    os.makedirs(upload_folder, exist_ok=True)
+    job = ContactImport(
+        user_id=user_id,
+        list_id=list_id,
+        filename=file.filename,
+        file_path='',
+        chunk_size=chunk_size,
+        status='pending',
+    )
+    db.session.add(job)
+    db.session.flush()
+    ext = os.path.splitext(file.filename)[1].lower() or '.xlsx'
+    job.file_path = os.path.join(upload_folder, f'import_{job.id}{ext}')
+    file.save(job.file_path)
+    return job
@@ -0,0 +1,138 @@
+import math
+import time
+from datetime import date, datetime
+from .models import Limits
+from .state import get_counter_store
+
+DAY = 86400
+MONTH = 30 * DAY  # janela mensal deslizante de 30 dias
+
+
+class SlidingWindowCounter:
+    """
+    Approximate sliding-window counter over two fixed buckets.
+
+    The count for the last ``window`` seconds is estimated as
+    ``previous * (1 - elapsed) + current``, where ``elapsed`` is the fraction
+    of the current bucket already gone. Reads and reservations touch two keys,
+    so they cost the same no matter how many sends were made.
+    """
+
+    def __init__(self, store, window, name):
+        self.store = store
+        self.window = window
+        self.name = name
+
+    def _keys(self, subject, now):
+        bucket = int(now // self.window)
+        elapsed = (now % self.window) / self.window
+        prefix = f'limit:{self.name}:{subject}'
+        return f'{prefix}:{bucket}', f'{prefix}:{bucket - 1}', elapsed
+
+    def count(self, subject, now=None):
+        current_key, previous_key, elapsed = self._keys(subject, now or time.time())
+        current, previous = self.store.get_many([current_key, previous_key])
+        return previous * (1 - elapsed) + current
+
+    def reserve(self, subject, amount, limit, now=None):
+        """
+        Claim up to ``amount`` units under ``limit`` and return how many were
+        granted. The claim is an atomic increment; whatever went over the
+        limit is handed back, so concurrent callers never over-grant.
+        """
+        if amount <= 0:
+            return 0
+        current_key, previous_key, elapsed = self._keys(subject, now or time.time())
+        previous = self.store.get_many([previous_key])[0]
+        current = self.store.incr(current_key, amount, ttl=self.window * 2)
+        overshoot = min(max(math.ceil(previous * (1 - elapsed) + current - limit), 0), amount)
+        if overshoot:
+            self.store.incr(current_key, -overshoot)
+        return amount - overshoot
+
+    def release(self, subject, amount, now=None):
+        if amount > 0:
+            current_key, _, _ = self._keys(subject, now or time.time())
+            self.store.incr(current_key, -amount)
+
+
+# Cache curto dos limites por usuário para não consultar o banco a cada envio
+_limits_cache = {}
+LIMITS_CACHE_TTL = 60
+
+
+def _user_limits(user_id):
+    cached = _limits_cache.get(user_id)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    row = Limits.query.filter_by(user_id=user_id).first()
+    limits = None
+    if row:
+        limits = {
+            'daily': row.daily,
+            'monthly': row.monthly,
+            'blocked_dates': frozenset(str(d)[:10] for d in (row.blocked_dates or [])),
+        }
+    _limits_cache[user_id] = (limits, time.monotonic() + LIMITS_CACHE_TTL)
+    return limits
+
+
+class QuotaService:
+    """
+    Enforce a user's Limits (daily, monthly, blocked_dates).
+
+    Users without a Limits row are unlimited.
+    """
+
+    def __init__(self, store):
+        self.daily = SlidingWindowCounter(store, DAY, 'daily')
+        self.monthly = SlidingWindowCounter(store, MONTH, 'monthly')
+
+    def is_blocked(self, user_id, day=None):
+        limits = _user_limits(user_id)
+        day = day or date.today()
+        return bool(limits and day.isoformat() in limits['blocked_dates'])
+
+    def reserve(self, user_id, amount, now=None):
+        """
+        Claim quota for ``amount`` sends in one call; returns how many fit.
+        """
+        limits = _user_limits(user_id)
+        if not limits:
+            return amount
+        now = now or time.time()
+        if datetime.fromtimestamp(now).date().isoformat() in limits['blocked_dates']:
+            return 0
+        granted = amount
+        if limits['daily'] is not None:
+            granted = self.daily.reserve(user_id, granted, limits['daily'], now)
+        if limits['monthly'] is not None:
+            monthly = self.monthly.reserve(user_id, granted, limits['monthly'], now)
+            if limits['daily'] is not None:
+                self.daily.release(user_id, granted - monthly, now)
+            granted = monthly
+        return granted
+
+    def release(self, user_id, amount):
+        limits = _user_limits(user_id)
+        if limits:
+            self.daily.release(user_id, amount)
+            self.monthly.release(user_id, amount)
+
+    def usage(self, user_id):
+        limits = _user_limits(user_id) or {}
+        return {
+            'daily': {'limit': limits.get('daily'), 'used': round(self.daily.count(user_id))},
+            'monthly': {'limit': limits.get('monthly'), 'used': round(self.monthly.count(user_id))},
+            'blocked_today': self.is_blocked(user_id),
+        }
+
+
+def get_quota_service(config):
+    return QuotaService(get_counter_store(config))
+
+
+def seconds_until_tomorrow(now=None):
+    now = now or datetime.now()
+    midnight = datetime.combine(now.date(), datetime.min.time())
+    return DAY - int((now - midnight).total_seconds())
@@ -0,0 +1,99 @@
+import csv
+import io
+from .models import Contact
+
+# Colunas carregadas pelos loaders, na ordem usada no COPY/INSERT
+CONTACT_COLUMNS = ('list_id', 'titulo', 'email', 'nome_congresso', 'ano_congresso')
+
+
+class ContactLoader:
+    """
+    Bulk-load Contact rows inside the caller's transaction.
+
+    ``load(rows)`` takes dicts keyed by CONTACT_COLUMNS and returns how many
+    rows were written. Nothing is committed here: the importer commits the
+    rows together with its checkpoint.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def load(self, rows):
+        if rows:
+            self.session.bulk_insert_mappings(Contact, rows)
+        return len(rows)
+
+    def _dbapi_connection(self):
+        # Conexão DBAPI da transação corrente da sessão
+        return self.session.connection().connection.dbapi_connection
+
+
+class PostgresCopyLoader(ContactLoader):
+    """
+    Stream rows through ``COPY ... FROM STDIN`` from an in-memory CSV buffer.
+    """
+
+    copy_sql = 'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)'.format(
+        table=Contact.__tablename__, columns=', '.join(CONTACT_COLUMNS))
+
+    def load(self, rows):
+        if not rows:
+            return 0
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for row in rows:
+            writer.writerow([row.get(col) for col in CONTACT_COLUMNS])
+        buf.seek(0)
+        cursor = self._dbapi_connection().cursor()
+        try:
+            if hasattr(cursor, 'copy_expert'):  # psycopg2
+                cursor.copy_expert(self.copy_sql, buf)
+            else:  # psycopg 3
+                with cursor.copy(self.copy_sql) as copy:
+                    copy.write(buf.getvalue())
+        finally:
+            cursor.close()
+        return len(rows)
+
+
+class SQLiteLoader(ContactLoader):
+    """
+    Insert rows with a single ``executemany`` and write-friendly pragmas.
+    """
+
+    pragmas = (
+        'PRAGMA synchronous = NORMAL',
+        'PRAGMA temp_store = MEMORY',
+        'PRAGMA cache_size = -65536',
+    )
+    insert_sql = 'INSERT INTO {table} ({columns}) VALUES ({params})'.format(
+        table=Contact.__tablename__,
+        columns=', '.join(CONTACT_COLUMNS),
+        params=', '.join('?' for _ in CONTACT_COLUMNS))
+
+    def load(self, rows):
+        if not rows:
+            return 0
+        cursor = self._dbapi_connection().cursor()
+        try:
+            for pragma in self.pragmas:
+                cursor.execute(pragma)
+            cursor.executemany(self.insert_sql, [tuple(row.get(col) for col in CONTACT_COLUMNS) for row in rows])
+        finally:
+            cursor.close()
+        return len(rows)
+
+
+LOADERS = {
+    'postgresql': PostgresCopyLoader,
+    'sqlite': SQLiteLoader,
+}
+
+
+def get_contact_loader(session):
+    """
+    Return the native bulk loader for the session's database, falling back to
+    the ORM loader for other dialects.
+    """
+    dialect = session.get_bind().dialect.name
+    return LOADERS.get(dialect, ContactLoader)(session)
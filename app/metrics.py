@@ -0,0 +1,79 @@
+import time
+from datetime import datetime, timezone
+from .outcomes import FAILED, RETRIED, SENT
+from .state import get_counter_store
+
+METRICS = (SENT, FAILED, RETRIED)
+RESOLUTIONS = {'minute': 60, 'hour': 3600}
+
+
+class RobotMetrics:
+    """
+    Per-robot send counts in fixed-size ring buffers, one per resolution.
+
+    Every bucket is a counter key named after its bucket number that expires
+    once it falls out of the ring, so each robot keeps at most ``size``
+    buckets per resolution and metric. Workers add to the current bucket;
+    reading a window is a single multi-get of ``window * len(METRICS)`` keys.
+    """
+
+    def __init__(self, store, sizes):
+        self.store = store
+        self.sizes = sizes  # {'minute': 120, 'hour': 48}
+
+    @staticmethod
+    def _key(robot_id, resolution, bucket, metric):
+        return f'metrics:{robot_id}:{resolution[0]}:{bucket}:{metric}'
+
+    def record(self, robot_id, metric, now=None):
+        if metric not in METRICS:
+            return
+        now = now or time.time()
+        for resolution, seconds in RESOLUTIONS.items():
+            bucket = int(now // seconds)
+            self.store.incr(self._key(robot_id, resolution, bucket, metric),
+                            ttl=self.sizes[resolution] * seconds)
+
+    def series(self, robot_id, resolution='minute', window=None, now=None):
+        """
+        Oldest-first list of ``{'start', 'sent', 'failed', 'retried'}`` for
+        the last ``window`` buckets (the current, partial one included).
+        """
+        seconds = RESOLUTIONS[resolution]
+        size = self.sizes[resolution]
+        window = min(window or size, size)
+        current = int((now or time.time()) // seconds)
+        buckets = range(current - window + 1, current + 1)
+        values = self.store.get_many([self._key(robot_id, resolution, bucket, metric)
+                                      for bucket in buckets for metric in METRICS])
+        series = []
+        for index, bucket in enumerate(buckets):
+            counts = values[index * len(METRICS):(index + 1) * len(METRICS)]
+            start = datetime.fromtimestamp(bucket * seconds, timezone.utc).replace(tzinfo=None)
+            point = {'start': start.isoformat()}
+            point.update(zip(METRICS, counts))
+            series.append(point)
+        return series
+
+
+def summarize(series, seconds, pending=0, recent=5):
+    """
+    Totals, sends per minute over the last ``recent`` complete buckets,
+    error rate over the whole window and ETA for ``pending`` messages.
+    """
+    totals = {metric: sum(point[metric] for point in series) for metric in METRICS}
+    done = series[:-1][-recent:] or series
+    rate = sum(point[SENT] for point in done) / (len(done) * seconds / 60) if done else 0.0
+    attempts = totals[SENT] + totals[FAILED]
+    return {
+        'totals': totals,
+        'sent_per_minute': round(rate, 2),
+        'error_rate': round(totals[FAILED] / attempts, 4) if attempts else 0.0,
+        'pending': pending,
+        'eta_seconds': round(pending / rate * 60) if pending and rate else None,
+    }
+
+
+def get_robot_metrics(config):
+    return RobotMetrics(get_counter_store(config), {'minute': config['ROBOT_METRICS_MINUTES'],
+                                                     'hour': config['ROBOT_METRICS_HOURS']})
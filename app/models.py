@@ -63,14 +63,41 @@ class EmailTemplate(db.Model):
     name = db.Column(db.String(64), nullable=False)
     subject = db.Column(db.String(255), nullable=False)
     body = db.Column(db.Text, nullable=False)
+    html_body = db.Column(db.Text, nullable=True)
+    # Incrementada a cada edição; chave do cache do template compilado
+    version = db.Column(db.Integer, nullable=False, default=1)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    attachments = db.relationship('TemplateAttachment', backref='template', lazy=True,
+                                  cascade='all, delete-orphan', order_by='TemplateAttachment.id')
+
+
+class TemplateAttachment(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    template_id = db.Column(db.Integer, db.ForeignKey('email_template.id'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(128), nullable=False, default='application/octet-stream')
+    path = db.Column(db.String(512), nullable=False)
+    size = db.Column(db.Integer, nullable=False, default=0)
+    sha256 = db.Column(db.String(64), nullable=False)  # chave da parte MIME já codificada
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'template_id': self.template_id,
+            'filename': self.filename,
+            'content_type': self.content_type,
+            'size': self.size,
+            'sha256': self.sha256,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
 
 class SendLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     contact_id = db.Column(db.Integer, db.ForeignKey('contact.id'), nullable=False)
     template_id = db.Column(db.Integer, db.ForeignKey('email_template.id'), nullable=False)
     status = db.Column(db.String(32), default='pending')
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
 class Schedule(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -94,6 +121,8 @@ class Robot(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     active = db.Column(db.Boolean, default=True)
     emails_per_hour = db.Column(db.Integer, default=100)
+    # Peso do robô na divisão justa da capacidade de envio entre os robôs do usuário
+    weight = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     start_time = db.Column(db.Time, nullable=False)
     end_time = db.Column(db.Time, nullable=False)
     working_days = db.Column(db.JSON, default=list)  # [0,1,2,3,4] for Mon-Fri
@@ -106,13 +135,82 @@ class Robot(db.Model):
 
     template = db.relationship('EmailTemplate', backref='robots')
     logs = db.relationship('RobotLog', backref='robot', lazy=True)
+    senders = db.relationship('RobotSender', backref='robot', lazy=True, cascade='all, delete-orphan')
+
+    def sender_accounts(self):
+        """
+        ``(InternalEmail, weight)`` pairs the robot may send from: its pool, or
+        just ``internal_email`` when no pool is configured.
+        """
+        if self.senders:
+            return [(sender.account, sender.weight) for sender in self.senders]
+        account = InternalEmail.query.filter_by(email=self.internal_email).first()
+        return [(account, 1)] if account else []
+
+
+class RobotSender(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    robot_id = db.Column(db.Integer, db.ForeignKey('robot.id'), nullable=False, index=True)
+    internal_email_id = db.Column(db.Integer, db.ForeignKey('internal_email.id'), nullable=False)
+    weight = db.Column(db.Integer, nullable=False, default=1)
+
+    account = db.relationship('InternalEmail')
+
+    __table_args__ = (db.UniqueConstraint('robot_id', 'internal_email_id'),)
 
 class RobotLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     robot_id = db.Column(db.Integer, db.ForeignKey('robot.id'), nullable=False)
     action = db.Column(db.String(32), nullable=False)  # start, stop, send, error
     details = db.Column(db.Text)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+class LogRollup(db.Model):
+    """
+    Daily counts of archived SendLog/RobotLog rows (see app/archive.py).
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    source = db.Column(db.String(16), nullable=False)  # send_log ou robot_log
+    scope_id = db.Column(db.Integer, nullable=False)  # template_id (send_log) ou robot_id (robot_log)
+    key = db.Column(db.String(32), nullable=False)  # status ou action
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.UniqueConstraint('day', 'source', 'scope_id', 'key'),)
+
+
+class Suppression(db.Model):
+    """
+    An address that must not receive email any more: hard bounce or spam
+    complaint for every user, or a manual block of one user (see
+    app/bounces.py).
+    """
+    __table_args__ = (
+        db.UniqueConstraint('email', 'user_id', name='uq_suppression_email_user'),
+        # NULL não conflita no UNIQUE acima: um índice parcial cobre as globais
+        db.Index('uq_suppression_email_global', 'email', unique=True,
+                 postgresql_where=db.text('user_id IS NULL'), sqlite_where=db.text('user_id IS NULL')),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(255), nullable=False)  # endereço normalizado
+    # Dono do bloqueio manual; NULL = bounce/reclamação, vale para todos
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    reason = db.Column(db.String(16), nullable=False)  # hard_bounce, complaint ou manual
+    status = db.Column(db.String(16))  # código DSN (5.1.1), quando houver
+    detail = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'email': self.email,
+            'user_id': self.user_id,
+            'reason': self.reason,
+            'status': self.status,
+            'detail': self.detail,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
 
 
 class InternalEmail(db.Model):
@@ -124,4 +222,137 @@ class InternalEmail(db.Model):
     smtp_server = db.Column(db.String(255), nullable=False)
     smtp_port = db.Column(db.Integer, nullable=False, default=587)
     smtp_username = db.Column(db.String(128), nullable=False)
-    smtp_password = db.Column(db.String(128), nullable=False)
\ No newline at end of file
+    smtp_password = db.Column(db.String(128), nullable=False)
+    # Limites do provedor para esta conta (None = sem limite)
+    hourly_quota = db.Column(db.Integer, nullable=True)
+    daily_quota = db.Column(db.Integer, nullable=True)
+    max_sessions = db.Column(db.Integer, nullable=False, default=2)
+
+class ContactImport(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    list_id = db.Column(db.Integer, db.ForeignKey('contact_list.id'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(512), nullable=False)
+    status = db.Column(db.String(32), default='pending')  # pending, running, done, failed
+    task_id = db.Column(db.String(155))
+    total_rows = db.Column(db.Integer, default=0)
+    chunk_size = db.Column(db.Integer, nullable=False, default=1000)
+    rows_parsed = db.Column(db.Integer, default=0)
+    rows_inserted = db.Column(db.Integer, default=0)
+    rejects = db.Column(db.Integer, default=0)
+    reject_reasons = db.Column(db.JSON, default=dict)  # motivo -> quantidade
+    reject_samples = db.Column(db.JSON, default=list)  # primeiros emails rejeitados
+    # Último chunk confirmado no banco; a importação recomeça a partir do seguinte
+    last_chunk = db.Column(db.Integer, default=-1)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    contact_list = db.relationship('ContactList', backref='imports')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'list_id': self.list_id,
+            'filename': self.filename,
+            'status': self.status,
+            'total_rows': self.total_rows,
+            'rows_parsed': self.rows_parsed,
+            'rows_inserted': self.rows_inserted,
+            'rejects': self.rejects,
+            'reject_reasons': self.reject_reasons or {},
+            'reject_samples': self.reject_samples or [],
+            'progress': round(self.rows_parsed / self.total_rows * 100, 2) if self.total_rows else 0,
+            'error': self.error,
+        }
+
+
+class DeadLetter(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    task_name = db.Column(db.String(155), nullable=False)
+    args = db.Column(db.JSON, default=list)
+    robot_id = db.Column(db.Integer, db.ForeignKey('robot.id'), nullable=True, index=True)
+    to_address = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    kind = db.Column(db.String(16), nullable=False)  # temporary (esgotou tentativas) ou permanent
+    smtp_code = db.Column(db.Integer)
+    retries = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    replayed_at = db.Column(db.DateTime)
+    replay_task_id = db.Column(db.String(155))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'task_name': self.task_name,
+            'robot_id': self.robot_id,
+            'to_address': self.to_address,
+            'error': self.error,
+            'kind': self.kind,
+            'smtp_code': self.smtp_code,
+            'retries': self.retries,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'replayed_at': self.replayed_at.isoformat() if self.replayed_at else None,
+        }
+
+
+class Campaign(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    # NULL: envio grande do /compose, com os filtros e o ritmo abaixo
+    robot_id = db.Column(db.Integer, db.ForeignKey('robot.id'), nullable=True, index=True)
+    template_id = db.Column(db.Integer, db.ForeignKey('email_template.id'), nullable=False)
+    filter_rules = db.Column(db.JSON)
+    rate_limit = db.Column(db.String(32))
+    status = db.Column(db.String(32), default='running')  # running, paused, done
+    strategy = db.Column(db.String(16), default='range')  # range (faixas de id) ou hash (id % shards)
+    shard_count = db.Column(db.Integer, default=1)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    robot = db.relationship('Robot', backref='campaigns')
+    template = db.relationship('EmailTemplate')
+    shards = db.relationship('CampaignShard', backref='campaign', lazy=True, order_by='CampaignShard.shard_index')
+
+    @property
+    def owner_id(self):
+        return self.robot.user_id if self.robot_id is not None else self.template.user_id
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'robot_id': self.robot_id,
+            'template_id': self.template_id,
+            'status': self.status,
+            'strategy': self.strategy,
+            'shard_count': self.shard_count,
+            'queued': sum(shard.queued or 0 for shard in self.shards),
+            'shards': [shard.to_dict() for shard in self.shards],
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class CampaignShard(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    campaign_id = db.Column(db.Integer, db.ForeignKey('campaign.id'), nullable=False, index=True)
+    shard_index = db.Column(db.Integer, nullable=False)
+    min_id = db.Column(db.Integer)  # faixa [min_id, max_id] na estratégia range
+    max_id = db.Column(db.Integer)
+    # Checkpoint: último contato já enfileirado por este shard
+    last_contact_id = db.Column(db.Integer, default=0)
+    queued = db.Column(db.Integer, default=0)
+    status = db.Column(db.String(32), default='pending')  # pending, running, done
+    # Incrementado a cada retomada; tasks de gerações antigas param sozinhas
+    generation = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'shard_index': self.shard_index,
+            'min_id': self.min_id,
+            'max_id': self.max_id,
+            'last_contact_id': self.last_contact_id,
+            'queued': self.queued,
+            'status': self.status,
+        }
@@ -0,0 +1,53 @@
+import json
+from datetime import datetime
+from .state import get_counter_store
+
+SENT = 'sent'
+FAILED = 'failed'
+DUPLICATE = 'duplicate'
+RETRIED = 'retried'
+DEFERRED = 'deferred'
+OUTCOMES = (SENT, FAILED, DUPLICATE, RETRIED, DEFERRED)
+
+
+class CampaignOutcomes:
+    """
+    Per-campaign delivery counters plus a capped list of the latest failures.
+
+    Replaces per-email task results: a campaign costs a handful of keys in the
+    shared store however many messages it sends.
+    """
+
+    def __init__(self, store, ttl, failure_limit):
+        self.store = store
+        self.ttl = ttl
+        self.failure_limit = failure_limit
+
+    @staticmethod
+    def _key(campaign_id, name):
+        return f'campaign:{campaign_id}:{name}'
+
+    def record(self, campaign_id, outcome, **failure):
+        """
+        Count one ``outcome`` for the campaign; for failures, keep ``failure``
+        (recipient, error, kind...) in the capped failure list.
+        """
+        if campaign_id is None:
+            return
+        self.store.incr(self._key(campaign_id, outcome), ttl=self.ttl)
+        if failure:
+            failure['at'] = datetime.utcnow().isoformat()
+            self.store.push(self._key(campaign_id, 'failures'), json.dumps(failure, default=str),
+                            self.failure_limit, ttl=self.ttl)
+
+    def counts(self, campaign_id):
+        values = self.store.get_many([self._key(campaign_id, outcome) for outcome in OUTCOMES])
+        return dict(zip(OUTCOMES, values))
+
+    def failures(self, campaign_id):
+        return [json.loads(item) for item in self.store.get_list(self._key(campaign_id, 'failures'))]
+
+
+def get_campaign_outcomes(config):
+    return CampaignOutcomes(get_counter_store(config), config['CAMPAIGN_OUTCOMES_TTL'],
+                            config['CAMPAIGN_FAILURE_SAMPLE'])
@@ -0,0 +1,259 @@
+import cProfile
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+
+# Coletor de SQL ativo no contexto atual (request ou task perfilada)
+_sql_collector = ContextVar('profile_sql_collector', default=None)
+_sql_listeners_installed = False
+
+SQL_TOP = 20
+
+
+class SQLCollector:
+    """
+    Count and time the SQL statements run while a profile is active,
+    grouped by statement text.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = {}
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        key = ' '.join(statement.split())[:500]
+        entry = self.statements.setdefault(key, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def to_dict(self):
+        top = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)[:SQL_TOP]
+        return {
+            'count': self.count,
+            'total_ms': round(self.seconds * 1000, 2),
+            'statements': [{'sql': sql, 'count': count, 'total_ms': round(seconds * 1000, 2)}
+                           for sql, (count, seconds) in top],
+        }
+
+
+def _install_sql_listeners():
+    """
+    Engine-wide cursor hooks; they cost one ContextVar lookup per statement
+    when no profile is active.
+    """
+    global _sql_listeners_installed
+    if _sql_listeners_installed:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _sql_collector.get() is not None:
+            conn.info.setdefault('profile_started', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        collector = _sql_collector.get()
+        started = conn.info.get('profile_started')
+        if collector is not None and started:
+            collector.record(statement, time.perf_counter() - started.pop())
+
+    _sql_listeners_installed = True
+
+
+def _frame_label(code):
+    # Formato "folded": ';' separa os quadros, então não pode aparecer no nome
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':')
+
+
+class StackSampler:
+    """
+    Statistical profiler: a background thread samples the target thread's
+    stack every ``interval`` seconds and counts identical stacks, which is
+    exactly the collapsed ("folded") input of flamegraph.pl, inferno and
+    speedscope. Overhead depends on the interval, not on the code profiled.
+    """
+
+    extension = 'folded'
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._sampler = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._sampler.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class DeterministicProfiler:
+    """
+    cProfile over the whole request or task; the dump is a pstats file
+    (snakeviz, flameprof, gprof2dot, ``python -m pstats``).
+    """
+
+    extension = 'prof'
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+
+    def dump(self, path):
+        self._profile.dump_stats(path)
+
+
+class ProfileSession:
+    """
+    One profiled request or task: the profiler plus its SQL collector.
+    ``finish()`` writes ``<name>.<folded|prof>`` and ``<name>.json`` (timing
+    and SQL summary) under ``<folder>/<YYYY-MM-DD>/``.
+    """
+
+    def __init__(self, config, kind, name):
+        self.folder = config['PROFILE_FOLDER']
+        self.kind = kind
+        self.name = name
+        self.id = uuid.uuid4().hex[:12]
+        self.started_at = datetime.utcnow()
+        # 'sampling' (padrão, flame graph) ou 'cprofile' (pstats)
+        self.profiler = (DeterministicProfiler() if config['PROFILER'] == 'cprofile'
+                         else StackSampler(config['PROFILE_SAMPLE_INTERVAL']))
+        self.sql = SQLCollector()
+
+    def start(self):
+        self._token = _sql_collector.set(self.sql)
+        self._start = time.perf_counter()
+        self.profiler.start()
+        return self
+
+    def finish(self, **meta):
+        self.profiler.stop()
+        duration = time.perf_counter() - self._start
+        _sql_collector.reset(self._token)
+        directory = os.path.join(self.folder, self.started_at.strftime('%Y-%m-%d'))
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.join(directory, '{}-{}-{:%H%M%S}-{}'.format(
+            self.kind, re.sub(r'[^A-Za-z0-9_.-]+', '_', self.name)[:80], self.started_at, self.id))
+        self.profiler.dump(f'{stem}.{self.profiler.extension}')
+        with open(f'{stem}.json', 'w', encoding='utf-8') as f:
+            json.dump({
+                'id': self.id,
+                'kind': self.kind,
+                'name': self.name,
+                'started_at': self.started_at.isoformat(),
+                'duration_ms': round(duration * 1000, 2),
+                'profile': os.path.basename(f'{stem}.{self.profiler.extension}'),
+                # Amostras do perfil estatístico (requests curtos podem ter poucas ou nenhuma)
+                'samples': getattr(self.profiler, 'samples', None),
+                'sql': self.sql.to_dict(),
+                **meta,
+            }, f, indent=2, default=str)
+        return stem
+
+
+def _sampled(rate):
+    return rate > 0 and random.random() < rate
+
+
+def init_request_profiling(app):
+    """
+    Profile a Flask request when PROFILE_ENABLED and either the request
+    carries PROFILE_HEADER with the PROFILE_TOKEN value or it falls in the
+    PROFILE_REQUEST_SAMPLE_RATE fraction. Profiled responses get the
+    profile id in the same header.
+    """
+    config = app.config
+    if not config['PROFILE_ENABLED']:
+        return
+    from flask import g, request
+    _install_sql_listeners()
+    header = config['PROFILE_HEADER']
+
+    @app.before_request
+    def _start_profile():
+        token = config['PROFILE_TOKEN']
+        asked = bool(token) and request.headers.get(header) == token
+        if asked or _sampled(config['PROFILE_REQUEST_SAMPLE_RATE']):
+            g.profile = ProfileSession(config, 'request', request.endpoint or request.path).start()
+
+    @app.after_request
+    def _finish_profile(response):
+        session = g.pop('profile', None)
+        if session is not None:
+            session.finish(method=request.method, path=request.path, status=response.status_code)
+            response.headers[header] = session.id
+        return response
+
+    @app.teardown_request
+    def _abort_profile(exc):
+        # Exceção não tratada: after_request não roda, mas o amostrador precisa parar
+        session = g.pop('profile', None)
+        if session is not None:
+            session.finish(method=request.method, path=request.path, status=500, error=repr(exc))
+
+
+def init_task_profiling(config):
+    """
+    Profile the PROFILE_TASK_SAMPLE_RATE fraction of Celery tasks (only
+    those named in PROFILE_TASKS, when set) in this worker.
+    """
+    if not config['PROFILE_ENABLED'] or config['PROFILE_TASK_SAMPLE_RATE'] <= 0:
+        return
+    from celery.signals import task_postrun, task_prerun
+    _install_sql_listeners()
+    sessions = {}
+    names = set(config['PROFILE_TASKS'])
+
+    @task_prerun.connect(weak=False)
+    def _start_task_profile(task_id=None, task=None, **kwargs):
+        if (not names or task.name in names) and _sampled(config['PROFILE_TASK_SAMPLE_RATE']):
+            sessions[task_id] = ProfileSession(config, 'task', task.name).start()
+
+    @task_postrun.connect(weak=False)
+    def _finish_task_profile(task_id=None, task=None, state=None, **kwargs):
+        session = sessions.pop(task_id, None)
+        if session is not None:
+            session.finish(task_id=task_id, state=state, retries=task.request.retries)
@@ -0,0 +1,93 @@
+from kombu import Exchange, Queue
+
+# Filas nomeadas e as tasks que caem em cada uma por padrão
+TRANSACTIONAL = 'transactional'
+CAMPAIGN = 'campaign'
+MAINTENANCE = 'maintenance'
+
+TASK_ROUTES = {
+    'app.tasks.send_email_task': {'queue': CAMPAIGN},
+    'app.tasks.import_contacts_task': {'queue': MAINTENANCE},
+    'app.tasks.run_campaign_shard_task': {'queue': CAMPAIGN},
+    'app.tasks.dispatch_campaigns_task': {'queue': MAINTENANCE},
+    'app.tasks.archive_logs_task': {'queue': MAINTENANCE},
+    'app.tasks.process_bounces_task': {'queue': MAINTENANCE},
+    'app.tasks.send_robot_test_email_task': {'queue': TRANSACTIONAL},
+}
+
+MAX_PRIORITY = 9
+
+
+def _is_redis(broker_url):
+    return (broker_url or '').startswith(('redis://', 'rediss://'))
+
+
+def broker_priority(priority, config):
+    """
+    Translate an AMQP-convention priority (higher is more urgent) for the
+    configured broker; the Redis transport uses the opposite order.
+    """
+    if _is_redis(config.get('CELERY_BROKER_URL')):
+        return MAX_PRIORITY - priority
+    return priority
+
+
+def configure_queues(celery, config):
+    """
+    Declare the named queues, default routes and priority support on ``celery``.
+    """
+    settings = config['CELERY_QUEUE_SETTINGS']
+    celery.conf.update(
+        task_queues=[
+            Queue(name, Exchange(name), routing_key=name, queue_arguments={'x-max-priority': MAX_PRIORITY})
+            for name in settings
+        ],
+        task_routes=TASK_ROUTES,
+        task_default_queue=CAMPAIGN,
+        task_queue_max_priority=MAX_PRIORITY,
+        task_default_priority=broker_priority(settings[CAMPAIGN]['priority'], config),
+        # Redis emula prioridade com uma lista por nível
+        broker_transport_options={
+            'priority_steps': list(range(MAX_PRIORITY + 1)),
+            'sep': ':',
+        },
+    )
+
+
+def queue_options(name, config):
+    """
+    ``apply_async`` options for sending a task to queue ``name``.
+
+    Priorities in CELERY_QUEUE_SETTINGS use the AMQP convention and are
+    translated by broker_priority.
+    """
+    return {'queue': name, 'priority': broker_priority(config['CELERY_QUEUE_SETTINGS'][name]['priority'], config)}
+
+
+def retry_priority(config):
+    """
+    Lowest priority in broker terms, so retries yield to fresh traffic.
+    """
+    return broker_priority(0, config)
+
+
+def queue_for_recipients(count, config):
+    """
+    Small interactive jobs go to the transactional queue, the rest to campaign.
+    """
+    return TRANSACTIONAL if count <= config['TRANSACTIONAL_MAX_RECIPIENTS'] else CAMPAIGN
+
+
+def worker_argv(name, config):
+    """
+    ``celery worker`` arguments for a worker dedicated to queue ``name``.
+    """
+    settings = config['CELERY_QUEUE_SETTINGS'][name]
+    return [
+        'worker',
+        '-Q', name,
+        '-n', f'{name}@%h',
+        '-c', str(settings['concurrency']),
+        '--prefetch-multiplier', str(settings['prefetch_multiplier']),
+        '-l', 'info',
+    ]
@@ -0,0 +1,211 @@
+import base64
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from email import policy
+from email.message import EmailMessage
+from html import unescape
+from html.parser import HTMLParser
+from jinja2 import Environment
+from .models import EmailTemplate
+
+# Assunto e texto sem escape; HTML com autoescape para os dados do contato
+_text_env = Environment(autoescape=False)
+_html_env = Environment(autoescape=True)
+
+TEXT_HEADERS = b'Content-Type: text/plain; charset="utf-8"\r\nContent-Transfer-Encoding: base64\r\n\r\n'
+HTML_HEADERS = b'Content-Type: text/html; charset="utf-8"\r\nContent-Transfer-Encoding: base64\r\n\r\n'
+
+_BLOCK_TAGS = {'p', 'div', 'section', 'article', 'header', 'footer', 'table', 'tr', 'ul', 'ol',
+               'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre', 'hr'}
+_SKIP_TAGS = {'script', 'style', 'head', 'title'}
+
+
+class _TextExtractor(HTMLParser):
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.out = []
+        self.skip = 0
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self.skip += 1
+        elif tag == 'br':
+            self.out.append('\n')
+        elif tag == 'li':
+            self.out.append('\n- ')
+        elif tag in ('td', 'th'):
+            self.out.append(' ')
+        elif tag in _BLOCK_TAGS:
+            self.out.append('\n\n')
+        elif tag == 'a':
+            self.links.append(dict(attrs).get('href'))
+        elif tag == 'img':
+            alt = dict(attrs).get('alt')
+            if alt:
+                self.out.append(alt)
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self.skip = max(self.skip - 1, 0)
+        elif tag in _BLOCK_TAGS:
+            self.out.append('\n\n')
+        elif tag == 'a' and self.links:
+            href = self.links.pop()
+            if href and not href.startswith(('#', 'mailto:')):
+                self.out.append(f' ({href})')
+
+    def handle_data(self, data):
+        if not self.skip:
+            self.out.append(re.sub(r'\s+', ' ', data))
+
+    def handle_entityref(self, name):
+        self.handle_data(unescape(f'&{name};'))
+
+    def handle_charref(self, name):
+        self.handle_data(unescape(f'&#{name};'))
+
+
+def html_to_text(html):
+    """
+    Plain-text rendering of an HTML body: block elements become paragraphs,
+    list items get dashes and links keep their URL in parentheses.
+    Jinja placeholders pass through untouched, so this runs on the template
+    source once instead of on every rendered email.
+    """
+    parser = _TextExtractor()
+    parser.feed(html or '')
+    parser.close()
+    lines = [line.strip() for line in ''.join(parser.out).split('\n')]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def _encode_body(text):
+    return base64.encodebytes(text.encode('utf-8')).replace(b'\n', b'\r\n')
+
+
+def mime_entity(text, html=None, boundary=None):
+    """
+    The message body as a MIME entity (its Content-Type headers included):
+    text/plain alone, or multipart/alternative with the HTML part last.
+    Part headers are constants; only the encoded bodies vary per recipient.
+    """
+    if html is None:
+        return TEXT_HEADERS + _encode_body(text)
+    boundary = boundary or f'=_alt_{uuid.uuid4().hex}'
+    return b''.join([
+        f'Content-Type: multipart/alternative; boundary="{boundary}"\r\n\r\n--{boundary}\r\n'.encode('ascii'),
+        TEXT_HEADERS, _encode_body(text),
+        f'\r\n--{boundary}\r\n'.encode('ascii'),
+        HTML_HEADERS, _encode_body(html),
+        f'\r\n--{boundary}--\r\n'.encode('ascii'),
+    ])
+
+
+def message_head(subject, from_addr, to_address):
+    """
+    Top-level headers (no blank line); the entity's own headers follow them.
+    """
+    head = EmailMessage(policy=policy.SMTP)
+    head['Subject'] = subject
+    head['From'] = from_addr
+    head['To'] = to_address
+    head['MIME-Version'] = '1.0'
+    return b''.join(policy.SMTP.fold_binary(name, value) for name, value in head.items())
+
+
+def build_message(subject, from_addr, to_address, text, html=None):
+    return message_head(subject, from_addr, to_address) + mime_entity(text, html)
+
+
+class CompiledTemplate:
+    """
+    An EmailTemplate compiled once per version: Jinja templates for subject,
+    text and HTML, with the text alternative derived from the HTML when the
+    template has no text body of its own.
+    """
+
+    def __init__(self, template):
+        self.id = template.id
+        self.version = template.version
+        self.html_source = template.html_body or None
+        text_source = template.body
+        if self.html_source and not (text_source or '').strip():
+            text_source = html_to_text(self.html_source)
+        self.text_source = text_source or ''
+        self.subject = _text_env.from_string(template.subject)
+        self.text = _text_env.from_string(self.text_source)
+        self.html = _html_env.from_string(self.html_source) if self.html_source else None
+
+    def render(self, context):
+        """
+        ``(subject, text, html)`` for one recipient; html is None for
+        text-only templates.
+        """
+        return (self.subject.render(context), self.text.render(context),
+                self.html.render(context) if self.html is not None else None)
+
+
+class TemplateCache:
+    """
+    Small LRU of CompiledTemplate keyed by (template id, version); editing a
+    template bumps its version, so stale entries simply age out.
+    """
+
+    def __init__(self, size=128):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, template_id, version):
+        with self._lock:
+            return self._items.get((template_id, version))
+
+    def get(self, template):
+        key = (template.id, template.version)
+        with self._lock:
+            compiled = self._items.get(key)
+            if compiled is not None:
+                self._items.move_to_end(key)
+                return compiled
+        compiled = CompiledTemplate(template)
+        with self._lock:
+            self._items[key] = compiled
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+        return compiled
+
+
+_template_cache = TemplateCache()
+
+
+def compile_template(template):
+    return _template_cache.get(template)
+
+
+def compiled_template(template_id, version=None):
+    """
+    CompiledTemplate for a template id, straight from the cache when
+    ``version`` is known and already compiled (no query); None if the
+    template no longer exists.
+    """
+    if version is not None:
+        compiled = _template_cache.lookup(template_id, version)
+        if compiled is not None:
+            return compiled
+    template = EmailTemplate.query.get(template_id)
+    return compile_template(template) if template else None
+
+
+def contact_context(contact, address=None):
+    """
+    Template variables for a contact: every column, with ``email`` replaced
+    by the normalized address when given.
+    """
+    data = {col.name: getattr(contact, col.name) for col in contact.__table__.columns}
+    if address is not None:
+        data['email'] = address
+    return data
@@ -0,0 +1,90 @@
+import random
+import smtplib
+import socket
+from datetime import datetime
+from .models import DeadLetter, db
+
+TEMPORARY = 'temporary'
+PERMANENT = 'permanent'
+
+# Erros de rede/conexão que valem nova tentativa
+TRANSIENT_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    ConnectionError,
+    socket.timeout,
+    TimeoutError,
+)
+
+
+def _classify_code(code):
+    if code is None:
+        return PERMANENT
+    return TEMPORARY if 400 <= code < 500 else PERMANENT
+
+
+def classify_smtp_error(exc):
+    """
+    Classify an exception raised while sending as temporary or permanent.
+
+    Returns ``(kind, smtp_code)``. 4xx replies and network failures are
+    temporary; 5xx replies, refused recipients with 5xx codes and anything
+    unexpected are permanent, so unknown bugs never turn into retry storms.
+    """
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in exc.recipients.values()]
+        # Só é temporário se todos os destinatários foram recusados com 4xx
+        if codes and all(_classify_code(code) == TEMPORARY for code in codes):
+            return TEMPORARY, codes[0]
+        return PERMANENT, codes[0] if codes else None
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return _classify_code(exc.smtp_code), exc.smtp_code
+    if isinstance(exc, TRANSIENT_ERRORS):
+        return TEMPORARY, None
+    if isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException):
+        return TEMPORARY, None
+    return PERMANENT, None
+
+
+def backoff_delay(retries, base, cap):
+    """
+    Full-jitter exponential backoff: uniform in ``[0, min(cap, base * 2**retries)]``.
+    """
+    return random.uniform(0, min(cap, base * (2 ** retries)))
+
+
+def dead_letter(task_name, args, robot_id, to_address, error, kind, smtp_code, retries):
+    """
+    Park a message that will not be retried again. Not committed here.
+    """
+    letter = DeadLetter(
+        task_name=task_name,
+        args=list(args),
+        robot_id=robot_id,
+        to_address=to_address,
+        error=str(error),
+        kind=kind,
+        smtp_code=smtp_code,
+        retries=retries,
+    )
+    db.session.add(letter)
+    return letter
+
+
+def replay_dead_letter(letter, **options):
+    """
+    Send a dead-lettered task again with its original arguments.
+
+    Returns None without sending if the letter was already replayed. The
+    mark is a conditional UPDATE, so concurrent replays (double click,
+    client retry) send it once. The caller commits.
+    """
+    from app import celery
+    claimed = (DeadLetter.query.filter(DeadLetter.id == letter.id, DeadLetter.replayed_at.is_(None))
+               .update({'replayed_at': datetime.utcnow()}, synchronize_session=False))
+    if not claimed:
+        return None
+    result = celery.send_task(letter.task_name, args=letter.args, **options)
+    db.session.refresh(letter)
+    letter.replay_task_id = result.id
+    return result
@@ -1,14 +1,27 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import csv, io, json
-import pandas as pd
-from datetime import datetime
-from .models import ContactList, Contact, EmailTemplate, InternalEmail, db, User
-from .models import SendLog, Robot, RobotLog
-from .filters import apply_filters
-from .email_service import enqueue_emails, send_email_via_smtp
-import unicodedata
+from datetime import datetime, timedelta
+from .models import ContactList, Contact, EmailTemplate, TemplateAttachment, InternalEmail, db, User
+from .models import SendLog, Robot, RobotLog, ContactImport, DeadLetter, Campaign, RobotSender, Suppression
+from .email_service import enqueue_emails
+from .importer import create_import
+from .attachments import save_attachment, delete_attachment
+from .queues import queue_for_recipients, queue_options, CAMPAIGN, TRANSACTIONAL
+from .retry import replay_dead_letter
+from .campaigns import (FAIR, compose_query, create_campaign, create_compose_campaign, dispatch_shards,
+                        pause_campaign, resume_campaign)
+from .sender_pool import get_sender_pool
+from .limits import get_quota_service
+from .outcomes import get_campaign_outcomes, SENT, FAILED, DUPLICATE
+from .metrics import RESOLUTIONS, get_robot_metrics, summarize
+from .simulator import simulate_robot
+from .archive import ARCHIVED_TABLES, iter_archive, parse_day, rollup_totals
+from .exports import EXPORTS, csv_lines, export_filters, iter_rows, xlsx_chunks
+from .bounces import MANUAL, Bounce, get_suppression_set, normalize, suppress
+from .tasks import import_contacts_task, send_robot_test_email_task
+from .state import get_counter_store
 
 main = Blueprint('main', __name__)
 
@@ -24,7 +37,8 @@ def dashboard():
     user = current_user 
     stats = {
         'total_robots': Robot.query.count(),
-        'total_sent': SendLog.query.filter_by(status='sent').count(),
+        # Linhas já arquivadas entram pelos rollups diários
+        'total_sent': SendLog.query.filter_by(status='sent').count() + rollup_totals('send_log', key='sent').get('sent', 0),
         'total_pending': SendLog.query.filter_by(status='pending').count(),
         'delivery_rate': calculate_delivery_rate()
     }
@@ -35,13 +49,22 @@ def dashboard():
 @login_required
 def templates():
     if request.method == 'POST':
+        html_body = request.form.get('html_body', '').strip() or None
+        if not html_body and not request.form.get('body', '').strip():
+            flash('Informe o corpo em texto ou em HTML.', 'danger')
+            return redirect(url_for('main.templates'))
         template = EmailTemplate(
             name=request.form['name'],
             subject=request.form['subject'],
-            body=request.form['body'],
+            body=request.form.get('body', ''),
+            html_body=html_body,
             user_id=current_user.id
         )
         db.session.add(template)
+        db.session.flush()
+        for file in request.files.getlist('attachments'):
+            if file and file.filename:
+                save_attachment(template, file, current_app.config['ATTACHMENT_FOLDER'])
         db.session.commit()
         flash('Template criado com sucesso!', 'success')
         return redirect(url_for('main.templates'))
@@ -61,7 +84,10 @@ def edit_template(id):
     if request.method == 'POST':
         template.name = request.form['name']
         template.subject = request.form['subject']
-        template.body = request.form['body']
+        template.body = request.form.get('body', '')
+        template.html_body = request.form.get('html_body', '').strip() or None
+        # Nova versão: workers recompilam o template (e o texto derivado do HTML)
+        template.version = (template.version or 1) + 1
         db.session.commit()
         flash('Template atualizado com sucesso!', 'success')
         return redirect(url_for('main.templates'))
@@ -71,11 +97,39 @@ def edit_template(id):
 @login_required
 def delete_template(id):
     template = EmailTemplate.query.get_or_404(id)
+    for attachment in list(template.attachments):
+        delete_attachment(attachment)
     db.session.delete(template)
     db.session.commit()
     flash('Template excluído com sucesso!', 'success')
     return redirect(url_for('main.templates'))
 
+@main.route('/templates/<int:id>/attachments', methods=['POST'])
+@login_required
+def add_template_attachments(id):
+    template = EmailTemplate.query.get_or_404(id)
+    if template.user_id != current_user.id:
+        flash('Você não tem permissão para editar este template.', 'danger')
+        return redirect(url_for('main.templates'))
+    files = [file for file in request.files.getlist('attachments') if file and file.filename]
+    for file in files:
+        save_attachment(template, file, current_app.config['ATTACHMENT_FOLDER'])
+    db.session.commit()
+    flash(f'{len(files)} anexo(s) adicionado(s).', 'success')
+    return redirect(url_for('main.templates'))
+
+@main.route('/templates/attachments/<int:attachment_id>/delete', methods=['POST'])
+@login_required
+def delete_template_attachment(attachment_id):
+    attachment = TemplateAttachment.query.get_or_404(attachment_id)
+    if attachment.template.user_id != current_user.id:
+        flash('Você não tem permissão para editar este template.', 'danger')
+        return redirect(url_for('main.templates'))
+    delete_attachment(attachment)
+    db.session.commit()
+    flash('Anexo removido.', 'success')
+    return redirect(url_for('main.templates'))
+
 
 @main.route('/api/contacts/<titulo>', methods=['GET'])
 @login_required
@@ -106,17 +160,26 @@ def robots():
             working_days=request.form.getlist('days[]'),
             filter_rules=filter_rules,
             internal_email=internal_email,
-            contact_title=request.form.get('contact_title')
+            contact_title=request.form.get('contact_title'),
+            weight=max(request.form.get('weight', 1, type=int) or 1, 1)
         )
         db.session.add(robot)
+        db.session.flush()
+        # Pool de contas: o email interno principal mais as contas adicionais
+        pool_ids = {int(i) for i in request.form.getlist('sender_accounts') if i.isdigit()}
+        if pool_ids:
+            primary = InternalEmail.query.filter_by(email=internal_email, user_id=current_user.id).first()
+            if primary:
+                pool_ids.add(primary.id)
+            for account in InternalEmail.query.filter(InternalEmail.id.in_(pool_ids),
+                                                      InternalEmail.user_id == current_user.id):
+                db.session.add(RobotSender(robot_id=robot.id, internal_email_id=account.id, weight=1))
+        db.session.commit()
+        # Iniciar a campanha do robô: shards paralelos com checkpoint por shard
+        campaign = create_campaign(robot)
         db.session.commit()
-        # Enfileirar envio inicial de e-mails para o título selecionado
-        contacts = Contact.query.filter_by(titulo=robot.contact_title).all()
-        # Enfileirar e-mails com ID do robô para que a task receba robot_id corretamente
-        enqueue_emails(robot.template, contacts,
-                       rate_limit=str(robot.emails_per_hour),
-                       robot_id=robot.id)
-        flash('Robô criado e e-mails enfileirados com sucesso!', 'success')
+        dispatch_shards(campaign)
+        flash('Robô criado e campanha iniciada com sucesso!', 'success')
         return redirect(url_for('main.dashboard'))
     
     # Buscar templates, titulos e emails 
@@ -136,6 +199,9 @@ def internal_emails():
         smtp_port = request.form.get('smtp_port')
         smtp_username = request.form.get('smtp_username')
         smtp_password = request.form.get('smtp_password')
+        hourly_quota = request.form.get('hourly_quota', type=int)
+        daily_quota = request.form.get('daily_quota', type=int)
+        max_sessions = request.form.get('max_sessions', type=int) or 2
 
         # Verificar se todos os campos obrigatórios estão preenchidos
         if not email or not smtp_server or not smtp_port or not smtp_username or not smtp_password:
@@ -150,6 +216,9 @@ def internal_emails():
             smtp_port=smtp_port,
             smtp_username=smtp_username,
             smtp_password=smtp_password,
+            hourly_quota=hourly_quota,
+            daily_quota=daily_quota,
+            max_sessions=max_sessions,
             user_id=current_user.id
         )
         db.session.add(internal_email)
@@ -185,6 +254,102 @@ def toggle_robot(id):
     db.session.commit()
     return jsonify({'status': 'success'})
  
+@main.route('/api/robots/<int:id>/metrics', methods=['GET'])
+@login_required
+def robot_metrics(id):
+    robot = Robot.query.get_or_404(id)
+    if robot.user_id != current_user.id:
+        return jsonify({'error': 'Você não tem permissão'}), 403
+    resolution = request.args.get('resolution', 'minute')
+    if resolution not in RESOLUTIONS:
+        return jsonify({'error': 'resolution deve ser minute ou hour'}), 400
+    series = get_robot_metrics(current_app.config).series(robot.id, resolution, request.args.get('window', type=int))
+    # Pendentes: enfileirados nas campanhas em andamento que ainda não tiveram desfecho
+    outcomes = get_campaign_outcomes(current_app.config)
+    pending = 0
+    for campaign in Campaign.query.filter_by(robot_id=robot.id, status='running'):
+        counts = outcomes.counts(campaign.id)
+        queued = sum(shard.queued or 0 for shard in campaign.shards)
+        pending += max(queued - counts[SENT] - counts[FAILED] - counts[DUPLICATE], 0)
+    return jsonify({
+        'robot_id': robot.id,
+        'resolution': resolution,
+        'series': series,
+        **summarize(series, RESOLUTIONS[resolution], pending),
+    })
+
+@main.route('/api/robots/<int:id>/simulate', methods=['GET'])
+@login_required
+def simulate_robot_route(id):
+    robot = Robot.query.get_or_404(id)
+    if robot.user_id != current_user.id:
+        return jsonify({'error': 'Você não tem permissão'}), 403
+    try:
+        start = datetime.fromisoformat(request.args['start']) if request.args.get('start') else None
+    except ValueError:
+        return jsonify({'error': 'start deve estar no formato ISO (AAAA-MM-DDTHH:MM)'}), 400
+    # Simulação: nada é enviado nem reservado
+    return jsonify(simulate_robot(robot, audience=request.args.get('audience', type=int), start=start,
+                                  max_days=min(request.args.get('days', 3650, type=int), 3650),
+                                  quota=get_quota_service(current_app.config)))
+
+@main.route('/api/archive/<table>', methods=['GET'])
+@login_required
+def archived_logs(table):
+    """
+    Stream archived send_log/robot_log rows as CSV. Query: start, end
+    (YYYY-MM-DD, default: last 7 days, at most ARCHIVE_MAX_DAYS apart),
+    robot_id (robot_log), key (status or action).
+    """
+    if table not in ARCHIVED_TABLES:
+        return jsonify({'error': 'Tabela deve ser send_log ou robot_log'}), 404
+    try:
+        end = parse_day(request.args.get('end'), datetime.utcnow().date())
+        start = parse_day(request.args.get('start'), end - timedelta(days=7))
+    except ValueError:
+        return jsonify({'error': 'Datas no formato YYYY-MM-DD'}), 400
+    max_days = current_app.config['ARCHIVE_MAX_DAYS']
+    if start > end or (end - start).days >= max_days:
+        return jsonify({'error': f'Intervalo deve ter entre 1 e {max_days} dias'}), 400
+    # Só as linhas do usuário: templates (send_log) ou robôs (robot_log) dele
+    if table == 'send_log':
+        scope_ids = [t.id for t in EmailTemplate.query.filter_by(user_id=current_user.id)]
+    else:
+        scope_ids = [r.id for r in Robot.query.filter_by(user_id=current_user.id)]
+        robot_id = request.args.get('robot_id', type=int)
+        if robot_id is not None:
+            scope_ids = [r for r in scope_ids if r == robot_id]
+    columns = ARCHIVED_TABLES[table][1]
+    rows = iter_archive(current_app.config['ARCHIVE_FOLDER'], table, start, end, scope_ids, request.args.get('key'))
+    rows = ([row[column] for column in columns] for row in rows)
+    return Response(stream_with_context(csv_lines(columns, rows)), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={table}_{start}_{end}.csv'})
+
+@main.route('/api/export/<name>', methods=['GET'])
+@login_required
+def export(name):
+    """
+    Stream contacts, send-logs or robot-logs as CSV (default) or XLSX
+    (``format=xlsx``). Filters: list_id/titulo, template_id/status or
+    robot_id/action, plus start/end (ISO dates) for the logs.
+    """
+    name = name.replace('-', '_')
+    if name not in EXPORTS:
+        return jsonify({'error': 'Exportação deve ser contacts, send-logs ou robot-logs'}), 404
+    try:
+        filters = export_filters(name, current_user.id, request.args)
+    except ValueError:
+        return jsonify({'error': 'Filtro inválido'}), 400
+    columns = EXPORTS[name][1]
+    rows = iter_rows(name, filters, current_app.config['EXPORT_PAGE_SIZE'])
+    stamp = datetime.utcnow().strftime('%Y%m%d%H%M')
+    if request.args.get('format') == 'xlsx':
+        return Response(stream_with_context(xlsx_chunks(columns, rows, name)),
+                        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                        headers={'Content-Disposition': f'attachment; filename={name}_{stamp}.xlsx'})
+    return Response(stream_with_context(csv_lines(columns, rows)), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={name}_{stamp}.csv'})
+
 @main.route('/api/robots/<int:id>/logs', methods=['GET'])
 @login_required
 def robot_logs(id):
@@ -200,6 +365,179 @@ def robot_logs(id):
         for log in logs
     ])
 
+@main.route('/api/robots/<int:id>/campaigns', methods=['GET', 'POST'])
+@login_required
+def robot_campaigns(id):
+    robot = Robot.query.get_or_404(id)
+    if robot.user_id != current_user.id:
+        return jsonify({'error': 'Você não tem permissão'}), 403
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        strategy = data.get('strategy', 'range')
+        if strategy not in ('range', 'hash'):
+            return jsonify({'error': 'Estratégia inválida'}), 400
+        campaign = create_campaign(robot, shard_count=data.get('shards'), strategy=strategy)
+        db.session.commit()
+        dispatch_shards(campaign)
+        return jsonify(campaign.to_dict()), 202
+    campaigns = Campaign.query.filter_by(robot_id=id).order_by(Campaign.id.desc()).all()
+    return jsonify([campaign.to_dict() for campaign in campaigns])
+
+@main.route('/api/robots/<int:id>/senders', methods=['GET', 'PUT'])
+@login_required
+def robot_senders(id):
+    robot = Robot.query.get_or_404(id)
+    if robot.user_id != current_user.id:
+        return jsonify({'error': 'Você não tem permissão'}), 403
+    if request.method == 'PUT':
+        # [{"internal_email_id": 1, "weight": 3}, ...]
+        entries = request.get_json(silent=True) or []
+        weights = {int(e['internal_email_id']): max(int(e.get('weight', 1)), 1) for e in entries}
+        accounts = InternalEmail.query.filter(InternalEmail.id.in_(weights),
+                                              InternalEmail.user_id == current_user.id).all()
+        robot.senders = [RobotSender(internal_email_id=a.id, weight=weights[a.id]) for a in accounts]
+        db.session.commit()
+    pool = get_sender_pool(current_app.config)
+    senders = []
+    for account, weight in robot.sender_accounts():
+        snap = pool.snapshot(account)
+        senders.append({
+            'internal_email_id': account.id,
+            'email': account.email,
+            'weight': weight,
+            'hourly_quota': account.hourly_quota,
+            'daily_quota': account.daily_quota,
+            'max_sessions': account.max_sessions,
+            'sent_hour': snap['hour'],
+            'sent_day': snap['day'],
+            'inflight': snap['inflight'],
+            'error_rate': round(snap['error_rate'], 4),
+            'healthy': snap['healthy'],
+            'score': round(pool.score(account, weight, snap), 4),
+        })
+    return jsonify(senders)
+
+def _get_user_campaign(id):
+    campaign = Campaign.query.get_or_404(id)
+    if campaign.owner_id != current_user.id:
+        return None
+    return campaign
+
+@main.route('/api/campaigns/<int:id>', methods=['GET'])
+@login_required
+def campaign_status(id):
+    campaign = _get_user_campaign(id)
+    if not campaign:
+        return jsonify({'error': 'Você não tem permissão'}), 403
+    return jsonify(campaign.to_dict())
+
+@main.route('/api/campaigns/<int:id>/outcomes', methods=['GET'])
+@login_required
+def campaign_outcomes(id):
+    campaign = _get_user_campaign(id)
+    if not campaign:
+        return jsonify({'error': 'Você não tem permissão'}), 403
+    outcomes = get_campaign_outcomes(current_app.config)
+    return jsonify({
+        'campaign_id': campaign.id,
+        'status': campaign.status,
+        'queued': sum(shard.queued or 0 for shard in campaign.shards),
+        'outcomes': outcomes.counts(campaign.id),
+        'failures': outcomes.failures(campaign.id),
+    })
+
+@main.route('/api/campaigns/<int:id>/pause', methods=['POST'])
+@login_required
+def pause_campaign_route(id):
+    campaign = _get_user_campaign(id)
+    if not campaign:
+        return jsonify({'error': 'Você não tem permissão'}), 403
+    pause_campaign(campaign)
+    return jsonify(campaign.to_dict())
+
+@main.route('/api/campaigns/<int:id>/resume', methods=['POST'])
+@login_required
+def resume_campaign_route(id):
+    campaign = _get_user_campaign(id)
+    if not campaign:
+        return jsonify({'error': 'Você não tem permissão'}), 403
+    if campaign.status == 'done':
+        return jsonify(campaign.to_dict())
+    resume_campaign(campaign)
+    return jsonify(campaign.to_dict()), 202
+
+@main.route('/api/limits', methods=['GET'])
+@login_required
+def limits_usage():
+    return jsonify(get_quota_service(current_app.config).usage(current_user.id))
+
+@main.route('/api/dead-letters', methods=['GET'])
+@login_required
+def dead_letters():
+    query = DeadLetter.query.join(Robot).filter(Robot.user_id == current_user.id)
+    if request.args.get('robot_id'):
+        query = query.filter(DeadLetter.robot_id == request.args.get('robot_id', type=int))
+    if request.args.get('kind'):
+        query = query.filter(DeadLetter.kind == request.args['kind'])
+    if request.args.get('pending') == '1':
+        query = query.filter(DeadLetter.replayed_at.is_(None))
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    letters = query.order_by(DeadLetter.id.desc()).limit(limit).all()
+    return jsonify([letter.to_dict() for letter in letters])
+
+@main.route('/api/dead-letters/<int:id>/replay', methods=['POST'])
+@login_required
+def replay_dead_letter_route(id):
+    letter = DeadLetter.query.get_or_404(id)
+    robot = Robot.query.get(letter.robot_id)
+    if not robot or robot.user_id != current_user.id:
+        return jsonify({'error': 'Você não tem permissão'}), 403
+    if replay_dead_letter(letter, **queue_options(CAMPAIGN, current_app.config)) is None:
+        return jsonify({'error': 'Esta mensagem já foi reenviada'}), 409
+    db.session.commit()
+    return jsonify(letter.to_dict()), 202
+
+@main.route('/api/suppressions', methods=['GET', 'POST'])
+@login_required
+def suppressions():
+    # Bounces e reclamações valem para todos; bloqueios manuais são do usuário.
+    # Sem listagem dos endereços, só totais e consulta por endereço
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        address = normalize(data.get('email'))
+        if not address:
+            return jsonify({'error': 'Email inválido'}), 400
+        suppress([Bounce(address, MANUAL, None, (data.get('detail') or '')[:255] or None)], user_id=current_user.id)
+        db.session.commit()
+        get_suppression_set(current_app.config).refresh(force=True)
+        return jsonify(Suppression.query.filter_by(email=address, user_id=current_user.id).first().to_dict()), 201
+    visible = db.or_(Suppression.user_id == current_user.id, Suppression.user_id.is_(None))
+    if request.args.get('email'):
+        address = normalize(request.args['email'])
+        rows = Suppression.query.filter(Suppression.email == address, visible).all()
+        own = [row for row in rows if row.user_id == current_user.id]
+        # Bounce de outro cliente só aparece se o endereço está nos contatos do usuário
+        if not own and rows and not Contact.query.join(ContactList).filter(
+                ContactList.user_id == current_user.id, db.func.lower(Contact.email) == address).first():
+            rows = []
+        suppression = own[0] if own else (rows[0] if rows else None)
+        return jsonify({'suppressed': suppression is not None,
+                        'suppression': suppression.to_dict() if suppression else None})
+    reasons = dict(db.session.query(Suppression.reason, db.func.count(Suppression.id))
+                   .filter(visible).group_by(Suppression.reason))
+    return jsonify({'total': sum(reasons.values()), 'reasons': reasons})
+
+@main.route('/api/suppressions/<path:email>', methods=['DELETE'])
+@login_required
+def delete_suppression(email):
+    # Só os bloqueios manuais do próprio usuário podem ser removidos
+    suppression = Suppression.query.filter_by(email=normalize(email), user_id=current_user.id,
+                                              reason=MANUAL).first_or_404()
+    db.session.delete(suppression)
+    db.session.commit()
+    get_suppression_set(current_app.config).invalidate()
+    return jsonify({'deleted': suppression.email})
+
 @main.route('/upload', methods=['GET', 'POST'])
 @login_required
 def upload():
@@ -215,51 +553,28 @@ def upload():
                 flash('Nenhum arquivo selecionado', 'error')
                 return redirect(request.url)
 
-            # Ler o arquivo Excel
-            df = pd.read_excel(file)
-            print("DataFrame lido:", df.head())  # Debug
-            
-            def normalize_col(col):
-                # Remove acentos, coloca em minúsculo e troca espaços por underline
-                col = unicodedata.normalize('NFKD', col).encode('ASCII', 'ignore').decode('ASCII')
-                return col.strip().lower().replace(' ', '_')
-
-            # Padronizar nomes das colunas
-            df.columns = [normalize_col(col) for col in df.columns]
-            print("Colunas após padronização:", df.columns)  # Debug
-            
-            # Validar colunas necessárias
-            # A coluna 'numero' representa o identificador importado, substituindo 'num'
-            required_cols = ['numero', 'titulo', 'emails', 'nome_do_congresso', 'ano_do_congresso']
-            missing_cols = [col for col in required_cols if col not in df.columns]
-            if missing_cols:
-                flash(f'Colunas obrigatórias ausentes: {", ".join(missing_cols)}', 'error')
-                return redirect(request.url)
-            
-            # Criar nova lista de contatos
+            # Criar nova lista de contatos; o conteúdo é importado em background
             name = request.form.get('name', 'Lista Importada ' + datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
             contact_list = ContactList(name=name, user_id=current_user.id)
             db.session.add(contact_list)
             db.session.flush()
 
-            # Processar cada linha do Excel
-            for _, row in df.iterrows():
-                emails = [e.strip() for e in str(row['emails']).split(',') if e.strip()]
-                for email in emails:
-                    contact = Contact(
-                        list_id=contact_list.id,
-                        titulo=str(row['titulo']),
-                        email=email,
-                        nome_congresso=str(row['nome_do_congresso']),
-                        ano_congresso=str(row['ano_do_congresso'])
-                    )
-                    db.session.add(contact)
-            
+            job = create_import(file, contact_list.id, current_user.id,
+                                current_app.config['UPLOAD_FOLDER'],
+                                current_app.config['IMPORT_CHUNK_SIZE'])
+            db.session.commit()
+            result = import_contacts_task.delay(job.id)
+            job.task_id = result.id
             db.session.commit()
-            flash(f'Lista importada com sucesso! {len(df)} contatos adicionados.', 'success')
+
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify(job.to_dict()), 202
+            flash('Arquivo recebido! A importação dos contatos está em andamento.', 'success')
         except Exception as e:
             db.session.rollback()
             print("Erro ao processar arquivo:", str(e))  # Debug
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify({'error': str(e)}), 400
             flash(f'Erro ao processar arquivo: {str(e)}', 'error')
             return redirect(request.url)
 
@@ -270,6 +585,28 @@ def upload():
 
     return render_template('upload.html', contact_lists=contact_lists)
 
+@main.route('/api/imports/<int:id>', methods=['GET'])
+@login_required
+def import_status(id):
+    job = ContactImport.query.get_or_404(id)
+    if job.user_id != current_user.id:
+        return jsonify({'error': 'Você não tem permissão'}), 403
+    return jsonify(job.to_dict())
+
+@main.route('/api/imports/<int:id>/resume', methods=['POST'])
+@login_required
+def resume_import(id):
+    job = ContactImport.query.get_or_404(id)
+    if job.user_id != current_user.id:
+        return jsonify({'error': 'Você não tem permissão'}), 403
+    if job.status == 'done':
+        return jsonify(job.to_dict())
+    # Retoma a partir do último chunk confirmado (last_chunk)
+    result = import_contacts_task.delay(job.id)
+    job.task_id = result.id
+    db.session.commit()
+    return jsonify(job.to_dict()), 202
+
 @main.route('/robots/monitor')
 @login_required
 def robots_monitor():
@@ -288,12 +625,24 @@ def compose():
             filters = json.loads(filters_json)
         except ValueError:
             filters = {}
-        template = EmailTemplate.query.get_or_404(tpl_id)
-        query = Contact.query
-        query = apply_filters(query, Contact, filters)
-        contacts = query.all()
-        enqueue_emails(template, contacts, rate)
-        flash(f'Enfileirados {len(contacts)} e-mails', 'success')
+        template = EmailTemplate.query.filter_by(id=tpl_id, user_id=current_user.id).first_or_404()
+        query = compose_query(current_user.id, filters)
+        count = query.count()
+        # Jobs pequenos vão para a fila transactional e não esperam campanhas
+        queue = queue_for_recipients(count, current_app.config)
+        if queue == CAMPAIGN and current_app.config['CAMPAIGN_SCHEDULER'] == FAIR:
+            # Jobs grandes viram campanha: o escalonador justo os divide com os robôs
+            campaign = create_compose_campaign(template, filters, rate)
+            db.session.commit()
+            dispatch_shards(campaign)
+            flash(f'Envio para {count} contatos agendado (campanha {campaign.id})', 'success')
+            return redirect(url_for('main.dashboard'))
+        result = enqueue_emails(template, query.all(), rate, queue=queue)
+        message = (f'Enfileirados {result["queued"]} e-mails; '
+                   f'{result["rejected"]["total"]} endereços inválidos ignorados')
+        if result['limited']:
+            message += f'; {result["limited"]} não enviados por limite diário/mensal'
+        flash(message, 'success')
         return redirect(url_for('main.dashboard'))
     return render_template('compose.html', templates=templates)
 
@@ -305,31 +654,41 @@ def send_email(robot_id):
         flash('Você não tem permissão para enviar emails com este robô.', 'danger')
         return redirect(url_for('main.dashboard'))
 
-    internal_email = InternalEmail.query.filter_by(email=robot.internal_email).first()
-    if not internal_email:
+    if not InternalEmail.query.filter_by(email=robot.internal_email).first():
         flash('O email interno associado ao robô não foi encontrado.', 'danger')
         return redirect(url_for('main.dashboard'))
 
-    # Configurar credenciais SMTP dinamicamente
-    smtp_config = {
-        'server': internal_email.smtp_server,
-        'port': internal_email.smtp_port,
-        'username': internal_email.smtp_username,
-        'password': internal_email.smtp_password
-    }
-
-    # Enviar email usando smtp_config
-    try:
-        send_email_via_smtp(robot.email, smtp_config)
-        flash('Email enviado com sucesso!', 'success')
-    except Exception as e:
-        flash(f'Erro ao enviar email: {str(e)}', 'danger')
-
+    # O envio SMTP roda no worker (fila transactional): a requisição não espera o servidor
+    job = send_robot_test_email_task.apply_async(args=[robot.id],
+                                                 **queue_options(TRANSACTIONAL, current_app.config))
+    get_counter_store(current_app.config).set(f'send-job:{job.id}', robot.id,
+                                              ttl=current_app.config['SEND_JOB_TTL'])
+    status_url = url_for('main.send_email_status', robot_id=robot.id, job_id=job.id)
+    if request.is_json or request.accept_mimetypes.best == 'application/json':
+        return jsonify({'job_id': job.id, 'status': 'queued', 'status_url': status_url}), 202
+    flash(f'Envio do email de teste enfileirado (job {job.id}).', 'success')
     return redirect(url_for('main.dashboard'))
 
+@main.route('/api/robots/<int:robot_id>/send-email/<job_id>', methods=['GET'])
+@login_required
+def send_email_status(robot_id, job_id):
+    robot = Robot.query.get_or_404(robot_id)
+    if robot.user_id != current_user.id:
+        return jsonify({'error': 'Você não tem permissão'}), 403
+    # Só jobs criados para este robô (a chave expira junto com o resultado)
+    if get_counter_store(current_app.config).get_many([f'send-job:{job_id}'])[0] != robot.id:
+        return jsonify({'error': 'Job não encontrado'}), 404
+    result = send_robot_test_email_task.AsyncResult(job_id)
+    if result.state == 'SUCCESS':
+        return jsonify({'job_id': job_id, **result.result})
+    if result.state == 'FAILURE':
+        return jsonify({'job_id': job_id, 'status': 'error', 'error': str(result.result)})
+    return jsonify({'job_id': job_id, 'status': 'queued' if result.state == 'PENDING' else result.state.lower()})
+
 def calculate_delivery_rate():
-    total = SendLog.query.count()
+    archived = rollup_totals('send_log')
+    total = SendLog.query.count() + sum(archived.values())
     if total == 0:
         return 0
-    sent = SendLog.query.filter_by(status='sent').count()
+    sent = SendLog.query.filter_by(status='sent').count() + archived.get('sent', 0)
     return round((sent / total) * 100, 2)
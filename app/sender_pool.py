@@ -0,0 +1,132 @@
+import random
+import smtplib
+import time
+from datetime import datetime, timezone
+from .state import get_counter_store
+
+HOUR = 3600
+DAY = 86400
+
+
+class SenderPool:
+    """
+    Quota- and health-aware selection of the InternalEmail account for a send.
+
+    Per-account state lives in the shared counter store so every worker sees
+    the same numbers: sends in the current hour and day, in-flight SMTP
+    sessions, attempts/errors in the current health window and a cooldown
+    flag. ``acquire`` increments the quota counters atomically and backs off
+    if that pushed the account over a limit, so concurrent workers cannot
+    overshoot a quota. Each SMTP session is a lease of its owner (the send
+    attempt) with its own deadline, taken only while fewer than
+    ``max_sessions`` are live; the session of a worker that died without
+    ``release`` stops counting when its deadline passes.
+    """
+
+    def __init__(self, store, config, rng=random):
+        self.store = store
+        self.rng = rng
+        self.health_window = config['SENDER_HEALTH_WINDOW']
+        self.max_error_rate = config['SENDER_MAX_ERROR_RATE']
+        self.min_attempts = config['SENDER_MIN_ATTEMPTS']
+        self.cooldown = config['SENDER_COOLDOWN']
+        self.session_ttl = config['SMTP_TIMEOUT'] * 4
+
+    def _keys(self, account_id, now=None):
+        now = now or time.time()
+        stamp = datetime.fromtimestamp(now, timezone.utc)
+        bucket = int(now // self.health_window)
+        prefix = f'pool:{account_id}'
+        return {
+            'hour': f'{prefix}:h:{stamp:%Y%m%d%H}',
+            'day': f'{prefix}:d:{stamp:%Y%m%d}',
+            'inflight': f'{prefix}:inflight',
+            'attempts': f'{prefix}:att:{bucket}',
+            'errors': f'{prefix}:err:{bucket}',
+            'cooldown': f'{prefix}:cooldown',
+        }
+
+    def snapshot(self, account):
+        keys = self._keys(account.id)
+        names = [name for name in keys if name != 'inflight']
+        values = dict(zip(names, self.store.get_many([keys[name] for name in names])))
+        values['inflight'] = self.store.count_leases(keys['inflight'])
+        values['error_rate'] = values['errors'] / values['attempts'] if values['attempts'] else 0.0
+        values['healthy'] = not values['cooldown']
+        return values
+
+    @staticmethod
+    def _remaining(used, quota):
+        if quota is None:
+            return 1.0
+        return max(quota - used, 0) / quota if quota else 0.0
+
+    def score(self, account, weight, snap):
+        """
+        0 when the account cannot take a send now, otherwise its weight scaled
+        by remaining quota share, success rate and free sessions.
+        """
+        if snap['cooldown'] or snap['inflight'] >= (account.max_sessions or 1):
+            return 0.0
+        headroom = min(self._remaining(snap['hour'], account.hourly_quota),
+                       self._remaining(snap['day'], account.daily_quota))
+        if headroom <= 0:
+            return 0.0
+        return (weight or 1) * headroom * (1.0 - snap['error_rate']) / (1 + snap['inflight'])
+
+    def choose(self, accounts):
+        """
+        Weighted random pick among ``(account, weight)`` pairs; None if every
+        account is exhausted, busy or cooling down.
+        """
+        scored = [(account, self.score(account, weight, self.snapshot(account))) for account, weight in accounts]
+        scored = [(account, score) for account, score in scored if score > 0]
+        if not scored:
+            return None
+        point = self.rng.uniform(0, sum(score for _, score in scored))
+        for account, score in scored:
+            point -= score
+            if point <= 0:
+                return account
+        return scored[-1][0]
+
+    def acquire(self, account, owner):
+        """
+        Reserve a session for ``owner`` and quota on ``account``; False if a
+        concurrent worker took the last session or unit first.
+        """
+        keys = self._keys(account.id)
+        if not self.store.lease(keys['inflight'], owner, account.max_sessions or 1, self.session_ttl):
+            return False
+        hour = self.store.incr(keys['hour'], ttl=HOUR * 2)
+        day = self.store.incr(keys['day'], ttl=DAY * 2)
+        over = ((account.hourly_quota is not None and hour > account.hourly_quota) or
+                (account.daily_quota is not None and day > account.daily_quota))
+        if over:
+            self.store.incr(keys['hour'], -1)
+            self.store.incr(keys['day'], -1)
+            self.store.unlease(keys['inflight'], owner)
+            return False
+        self.store.incr(keys['attempts'], ttl=self.health_window * 2)
+        return True
+
+    def release(self, account, owner, error=None):
+        """
+        Free the session of ``owner`` and record the outcome. Recipient-level
+        refusals do not count against the account's health; a failed login
+        takes it out of rotation immediately.
+        """
+        keys = self._keys(account.id)
+        self.store.unlease(keys['inflight'], owner)
+        if error is None or isinstance(error, smtplib.SMTPRecipientsRefused):
+            return
+        errors = self.store.incr(keys['errors'], ttl=self.health_window * 2)
+        attempts = self.store.get_many([keys['attempts']])[0]
+        unhealthy = isinstance(error, smtplib.SMTPAuthenticationError) or (
+            attempts >= self.min_attempts and errors / attempts > self.max_error_rate)
+        if unhealthy:
+            self.store.set(keys['cooldown'], 1, ttl=self.cooldown)
+
+
+def get_sender_pool(config):
+    return SenderPool(get_counter_store(config), config)
@@ -0,0 +1,191 @@
+import math
+from collections import Counter
+from datetime import datetime, timedelta
+from .limits import DAY, MONTH, SlidingWindowCounter
+from .models import Limits
+from .state import MemoryCounterStore
+
+HOUR = 3600
+
+# Restrições que limitam um intervalo de uma hora
+SCHEDULE = 'schedule'  # fora do horário/dia de trabalho do robô
+BLOCKED = 'blocked_date'
+RATE = 'emails_per_hour'
+DAILY = 'daily_limit'
+MONTHLY = 'monthly_limit'
+SENDER_HOURLY = 'sender_hourly_quota'
+SENDER_DAILY = 'sender_daily_quota'
+AUDIENCE = 'audience'  # último intervalo: acabaram os destinatários
+
+
+def _working_days(days):
+    # O formulário grava os dias como strings ('0' = segunda); vazio = todos os dias
+    return frozenset(int(day) for day in days) if days else frozenset(range(7))
+
+
+class CampaignSimulator:
+    """
+    Dry-run model of a robot's sending rules: ``emails_per_hour`` inside the
+    ``start_time``/``end_time`` window on ``working_days``, the owner's
+    Limits (daily and 30-day sliding windows, blocked dates) and the hourly
+    and daily quotas of the robot's sender accounts.
+
+    Time advances in one-hour steps, each one sending as much as the
+    tightest rule allows and recording which rule that was. Daily and
+    monthly limits go through the same SlidingWindowCounter the workers use,
+    on an in-memory store and simulated clock, so a campaign of millions of
+    recipients runs in well under a second and nothing is sent or stored.
+    """
+
+    def __init__(self, emails_per_hour, start_time, end_time, working_days=None, daily=None, monthly=None,
+                 blocked_dates=(), sender_quotas=(), used_daily=0, used_monthly=0):
+        self.rate = emails_per_hour or 0
+        self.start_time = start_time
+        self.end_time = end_time
+        self.working_days = _working_days(working_days)
+        self.daily = daily
+        self.monthly = monthly
+        self.blocked_dates = frozenset(str(day)[:10] for day in blocked_dates or ())
+        # (hourly_quota, daily_quota) por conta; None = sem limite
+        hourly = [quota for quota, _ in sender_quotas]
+        daily_quotas = [quota for _, quota in sender_quotas]
+        self.sender_hourly = None if not sender_quotas or None in hourly else sum(hourly)
+        self.sender_daily = None if not sender_quotas or None in daily_quotas else sum(daily_quotas)
+        self.used_daily = used_daily
+        self.used_monthly = used_monthly
+
+    def _windows(self, day):
+        """
+        Sending windows that start on ``day`` (one, or none on a day off).
+        """
+        if day.weekday() not in self.working_days:
+            return []
+        start = datetime.combine(day, self.start_time)
+        end = datetime.combine(day, self.end_time)
+        if end <= start:
+            # Janela que atravessa a meia-noite (ou o dia inteiro, se iguais)
+            end += timedelta(days=1)
+        return [(start, end)]
+
+    def _open(self, slot_start, slot_end):
+        """
+        ``(first_open_instant, open_seconds)`` of the slot.
+        """
+        first, seconds = None, 0.0
+        for day in (slot_start.date() - timedelta(days=1), slot_start.date()):
+            for start, end in self._windows(day):
+                lo, hi = max(start, slot_start), min(end, slot_end)
+                if hi > lo:
+                    first = lo if first is None else min(first, lo)
+                    seconds += (hi - lo).total_seconds()
+        return first, min(seconds, HOUR)
+
+    def run(self, audience, start=None, max_days=3650):
+        """
+        Simulate sending to ``audience`` recipients from ``start``.
+
+        Returns the projected ``completion`` (None if it does not finish
+        within ``max_days``), the daily throughput curve, the hours spent
+        under each constraint and the ``binding`` one: the rule that capped
+        the most sending hours (``emails_per_hour`` when nothing else did).
+        """
+        start = start or datetime.now()
+        store = MemoryCounterStore()
+        daily = SlidingWindowCounter(store, DAY, 'daily')
+        monthly = SlidingWindowCounter(store, MONTH, 'monthly')
+        # Uso atual do dono entra como envios feitos logo antes do início
+        seeded = start.timestamp() - 1
+        if self.used_daily:
+            daily.reserve('sim', self.used_daily, self.used_daily, seeded)
+        if self.used_monthly:
+            monthly.reserve('sim', self.used_monthly, self.used_monthly, seeded)
+
+        remaining = audience
+        completion = None
+        constraints = Counter()
+        curve = {}
+        sender_day, sender_day_used = None, 0
+        carry = 0.0
+        slot_start = start
+        horizon = start + timedelta(days=max_days)
+        while remaining > 0 and slot_start < horizon:
+            slot_end = (slot_start + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
+            first_open, open_seconds = self._open(slot_start, slot_end)
+            if slot_start.date().isoformat() in self.blocked_dates:
+                constraints[BLOCKED] += 1
+            elif not open_seconds:
+                constraints[SCHEDULE] += 1
+            else:
+                if slot_start.date() != sender_day:
+                    sender_day, sender_day_used = slot_start.date(), 0
+                # Fração do ritmo por hora, acumulando o resto entre intervalos
+                budget = self.rate * open_seconds / HOUR + carry
+                caps = {RATE: math.floor(budget), AUDIENCE: remaining}
+                if self.sender_hourly is not None:
+                    caps[SENDER_HOURLY] = self.sender_hourly
+                if self.sender_daily is not None:
+                    caps[SENDER_DAILY] = max(self.sender_daily - sender_day_used, 0)
+                binding = min(caps, key=caps.get)
+                sent = caps[binding]
+                now = first_open.timestamp()
+                if self.daily is not None and sent:
+                    granted = daily.reserve('sim', sent, self.daily, now)
+                    if granted < sent:
+                        binding, sent = DAILY, granted
+                if self.monthly is not None and sent:
+                    granted = monthly.reserve('sim', sent, self.monthly, now)
+                    if granted < sent:
+                        if self.daily is not None:
+                            daily.release('sim', sent - granted, now)
+                        binding, sent = MONTHLY, granted
+                carry = budget - sent if binding == RATE else 0.0
+                constraints[binding] += 1
+                sender_day_used += sent
+                remaining -= sent
+                curve[slot_start.date()] = curve.get(slot_start.date(), 0) + sent
+                if remaining <= 0:
+                    # Envios espalhados pelo trecho aberto do intervalo
+                    share = sent / max(caps[RATE], sent, 1)
+                    completion = first_open + timedelta(seconds=open_seconds * share)
+            slot_start = slot_end
+
+        sending = {name: hours for name, hours in constraints.items() if name not in (SCHEDULE, BLOCKED, AUDIENCE)}
+        cumulative = 0
+        daily_curve = []
+        for day in sorted(curve):
+            cumulative += curve[day]
+            daily_curve.append({'date': day.isoformat(), 'sent': curve[day], 'cumulative': cumulative})
+        return {
+            'audience': audience,
+            'start': start.isoformat(),
+            'completion': completion.isoformat() if completion else None,
+            'unsent': max(remaining, 0),
+            # Tudo coube no primeiro intervalo aberto: só o tamanho do público limitou
+            'binding': max(sending, key=sending.get) if sending else (AUDIENCE if constraints[AUDIENCE] else None),
+            'constraint_hours': dict(constraints),
+            'daily': daily_curve,
+        }
+
+
+def simulate_robot(robot, audience=None, start=None, max_days=3650, quota=None):
+    """
+    Simulate ``robot`` with its current settings, the owner's Limits and
+    current usage (from ``quota``, a QuotaService) and its sender pool.
+    ``audience`` defaults to the size of the robot's recipient query.
+    """
+    from .campaigns import recipient_query
+
+    if audience is None:
+        audience = recipient_query(robot).count()
+    limits = Limits.query.filter_by(user_id=robot.user_id).first()
+    usage = quota.usage(robot.user_id) if quota is not None and limits else {}
+    simulator = CampaignSimulator(
+        robot.emails_per_hour, robot.start_time, robot.end_time, robot.working_days,
+        daily=limits.daily if limits else None,
+        monthly=limits.monthly if limits else None,
+        blocked_dates=limits.blocked_dates if limits else (),
+        sender_quotas=[(account.hourly_quota, account.daily_quota) for account, _ in robot.sender_accounts()],
+        used_daily=usage.get('daily', {}).get('used', 0),
+        used_monthly=usage.get('monthly', {}).get('used', 0),
+    )
+    return simulator.run(audience, start, max_days)
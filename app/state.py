@@ -0,0 +1,168 @@
+import threading
+import time
+
+_redis_clients = {}
+
+
+def redis_client(url):
+    """
+    One Redis client (and connection pool) per URL per process.
+    """
+    client = _redis_clients.get(url)
+    if client is None:
+        import redis
+        client = _redis_clients[url] = redis.Redis.from_url(url)
+    return client
+
+
+class MemoryCounterStore:
+    """
+    In-process stand-in for RedisCounterStore (tests, single worker, no Redis).
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _value(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return 0
+        value, expires = entry
+        if expires is not None and expires < now:
+            del self._data[key]
+            return 0
+        return value
+
+    def incr(self, key, amount=1, ttl=None):
+        with self._lock:
+            now = time.monotonic()
+            value = self._value(key, now) + amount
+            expires = self._data[key][1] if key in self._data else None
+            if ttl is not None:
+                expires = now + ttl
+            self._data[key] = (value, expires)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+
+    def get_many(self, keys):
+        with self._lock:
+            now = time.monotonic()
+            return [self._value(key, now) for key in keys]
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def push(self, key, value, limit, ttl=None):
+        with self._lock:
+            now = time.monotonic()
+            items = ([value] + (self._value(key, now) or []))[:limit]
+            self._data[key] = (items, now + ttl if ttl is not None else None)
+
+    def get_list(self, key):
+        with self._lock:
+            return list(self._value(key, time.monotonic()) or [])
+
+    def _live_leases(self, key, now):
+        leases = {member: deadline for member, deadline in (self._value(key, now) or {}).items() if deadline > now}
+        self._data[key] = (leases, None)
+        return leases
+
+    def lease(self, key, member, limit, ttl):
+        with self._lock:
+            now = time.monotonic()
+            leases = self._live_leases(key, now)
+            if len(leases) >= limit:
+                return False
+            leases[member] = now + ttl
+            return True
+
+    def unlease(self, key, member):
+        with self._lock:
+            self._live_leases(key, time.monotonic()).pop(member, None)
+
+    def count_leases(self, key):
+        with self._lock:
+            return len(self._live_leases(key, time.monotonic()))
+
+
+class RedisCounterStore:
+    """
+    Integer counters in Redis (INCRBY + EXPIRE, MGET for reads), capped
+    lists (LPUSH + LTRIM) and leases (a sorted set member -> deadline).
+    """
+
+    # Poda leases vencidos e adiciona o novo só se houver vaga, atomicamente
+    LEASE = """
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+    if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+        return 0
+    end
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[4])
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+    return 1
+    """
+
+    def __init__(self, client, prefix='state:'):
+        self.client = client
+        self.prefix = prefix
+
+    def incr(self, key, amount=1, ttl=None):
+        pipe = self.client.pipeline()
+        pipe.incrby(self.prefix + key, amount)
+        if ttl is not None:
+            pipe.expire(self.prefix + key, int(ttl))
+        return pipe.execute()[0]
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, value, ex=int(ttl) if ttl is not None else None)
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        return [int(value) if value is not None else 0 for value in self.client.mget([self.prefix + key for key in keys])]
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def push(self, key, value, limit, ttl=None):
+        pipe = self.client.pipeline()
+        pipe.lpush(self.prefix + key, value)
+        pipe.ltrim(self.prefix + key, 0, limit - 1)
+        if ttl is not None:
+            pipe.expire(self.prefix + key, int(ttl))
+        pipe.execute()
+
+    def get_list(self, key):
+        return [value.decode() if isinstance(value, bytes) else value
+                for value in self.client.lrange(self.prefix + key, 0, -1)]
+
+    def lease(self, key, member, limit, ttl):
+        now = time.time()
+        return bool(self.client.eval(self.LEASE, 1, self.prefix + key, now, now + ttl, limit, member, int(ttl) + 1))
+
+    def unlease(self, key, member):
+        self.client.zrem(self.prefix + key, member)
+
+    def count_leases(self, key):
+        return self.client.zcount(self.prefix + key, f'({time.time()}', '+inf')
+
+
+_counter_store = None
+
+
+def get_counter_store(config):
+    """
+    Process-wide counter store chosen by STATE_BACKEND ('redis' or 'memory').
+    """
+    global _counter_store
+    if _counter_store is None:
+        if config.get('STATE_BACKEND') == 'redis':
+            _counter_store = RedisCounterStore(redis_client(config['REDIS_URL']))
+        else:
+            _counter_store = MemoryCounterStore()
+    return _counter_store
@@ -1,35 +1,352 @@
+from flask import current_app
 from flask_mail import Message
 from app import mail, celery
-from app.models import Robot
-from email.mime.text import MIMEText
+from app.models import Contact, InternalEmail, Robot, RobotLog, ContactImport, SendLog, TemplateAttachment, db
+from app.attachments import send_with_attachments
+from app.rendering import build_message, compiled_template, contact_context, mime_entity
+from app.validation import get_validator
+from app.idempotency import PENDING, ClaimKeeper, delivery_key, get_store
+from app.sender_pool import get_sender_pool
+from app.limits import get_quota_service, seconds_until_tomorrow
+from app.queues import CAMPAIGN, MAINTENANCE, queue_options, retry_priority
+from app.retry import TEMPORARY, classify_smtp_error, backoff_delay, dead_letter
+from app.outcomes import DEFERRED, DUPLICATE, FAILED, RETRIED, SENT, get_campaign_outcomes
+from app.metrics import get_robot_metrics
 import smtplib
+import uuid
 
-@celery.task(name='app.tasks.send_email_task')
-def send_email_task(robot_id, to_address, subject, body):
+def _set_send_log_status(send_log_id, status, only_from=None):
+    if send_log_id is not None:
+        query = SendLog.query.filter_by(id=send_log_id)
+        if only_from:
+            query = query.filter_by(status=only_from)
+        query.update({'status': status})
+
+
+def _defer(task, countdown, **overrides):
+    """
+    Re-enqueue the current send as a fresh message (retry count untouched).
+    """
+    kwargs = dict(task.request.kwargs or {})
+    kwargs.update(overrides)
+    routing = (task.request.delivery_info or {}).get('routing_key')
+    task.apply_async(args=task.request.args, kwargs=kwargs, countdown=countdown,
+                     **({'queue': routing} if routing else {}))
+
+
+def _render_for_contact(config, template_id, template_version, contact_id):
+    """
+    Render a send that arrived as ids only: ``(to_address, subject, body,
+    html)``, or None if the template or contact no longer exists.
+
+    The contact is one primary-key lookup per send, not a bulk fetch: a
+    task per recipient keeps the per-message rate limit, ack, retries,
+    idempotency key and dead letter, and the lookup is small next to the
+    SMTP session it precedes.
+    """
+    compiled = compiled_template(template_id, template_version)
+    contact = Contact.query.get(contact_id)
+    if compiled is None or contact is None:
+        return None
+    address, _ = get_validator(config).validate(contact.email)
+    address = address or contact.email
+    subject, body, html = compiled.render(contact_context(contact, address))
+    return address, subject, body, html
+
+
+# acks_late: a mensagem só é confirmada depois do envio; a chave de
+# idempotência impede que uma cópia da mesma entrega mande o email duas vezes.
+# A chave pertence à tentativa que a criou e é renovada enquanto o envio
+# dura (ClaimKeeper), então uma reentrega não a assume no meio de um envio
+# lento. Se o worker cai, a renovação para e a chave expira em
+# SEND_CLAIM_TTL; a reentrega adia até lá e então envia: preferimos um
+# possível duplicado (queda entre o DATA e o registro) a perder o email.
+# ignore_result: nada lê o resultado de cada email; o desfecho vai para os
+# contadores da campanha (app.outcomes), SendLog e RobotLog.
+@celery.task(bind=True, name='app.tasks.send_email_task', acks_late=True, reject_on_worker_lost=True,
+             ignore_result=True)
+def send_email_task(self, robot_id, to_address=None, subject=None, body=None, send_log_id=None, contact_id=None,
+                    template_id=None, campaign_id=None, reserved=False, html=None, template_version=None):
     robot = Robot.query.get(robot_id)
     if not robot:
         return {'status': 'error', 'error': 'Robô não encontrado'}
+    config = current_app.config
+    # Argumentos originais: um replay da dead-letter renderiza de novo se vierem só ids
+    original = [robot_id, to_address, subject, body, send_log_id, contact_id, template_id, campaign_id,
+                False, html, template_version]
+    outcomes = get_campaign_outcomes(config)
+    metrics = get_robot_metrics(config)
+
+    def record(outcome, **failure):
+        # Contadores da campanha e séries por minuto/hora do robô
+        outcomes.record(campaign_id, outcome, **failure)
+        metrics.record(robot_id, outcome)
+
+    # Cota do usuário reservada para este envio (em lote pelo enqueue_emails ou
+    # aqui): volta ao usuário em todo caminho que termina sem enviar
+    quota = get_quota_service(config)
+
+    def give_back_quota():
+        if reserved:
+            quota.release(robot.user_id, 1)
+
+    store = get_store(config)
+    key = delivery_key(robot_id, to_address, send_log_id=send_log_id, contact_id=contact_id,
+                       template_id=template_id, content=f'{subject}\0{body}', campaign_id=campaign_id)
+    claim_ttl = config['SEND_CLAIM_TTL']
+    # Dono da chave é esta tentativa, não o task id: uma reentrega tem o mesmo id
+    claim = ClaimKeeper(store, key, claim_ttl, uuid.uuid4().hex)
+    if not store.claim(key, claim_ttl, owner=claim.owner):
+        state = store.status(key)
+        if state == PENDING and (self.request.delivery_info or {}).get('redelivered'):
+            # Reentrega enquanto outra tentativa segura a chave: esperar ela
+            # concluir ou expirar, em vez de descartar o envio como duplicado
+            _defer(self, claim_ttl)
+            record(DEFERRED)
+            return {'status': 'deferred', 'to': to_address, 'reason': 'pending_claim'}
+        # Já enviado, ou outra cópia da entrega está enviando: não reenviar
+        # Só marca logs ainda pendentes; um envio já concluído continua 'sent'
+        _set_send_log_status(send_log_id, 'duplicate', only_from='pending')
+        db.session.add(RobotLog(robot_id=robot.id, action='duplicate',
+                                details=f'Envio para {to_address or f"contato {contact_id}"} ignorado '
+                                        f'({state or "em andamento"})'))
+        db.session.commit()
+        give_back_quota()
+        record(DUPLICATE)
+        return {'status': 'duplicate', 'to': to_address, 'state': state}
 
+    if subject is None:
+        # Task com ids apenas: renderizar aqui com o template compilado em cache
+        rendered = _render_for_contact(config, template_id, template_version, contact_id)
+        if rendered is None:
+            store.release(key)
+            _set_send_log_status(send_log_id, 'failed')
+            db.session.add(RobotLog(robot_id=robot.id, action='error',
+                                    details=f'Template {template_id} ou contato {contact_id} não encontrado'))
+            db.session.commit()
+            give_back_quota()
+            record(FAILED, contact_id=contact_id, error='Template ou contato não encontrado')
+            return {'status': 'error', 'error': 'Template ou contato não encontrado'}
+        to_address, subject, body, html = rendered
+
+    # Limits do usuário: data bloqueada adia para amanhã; envios que não
+    # passaram por enqueue_emails (replays, envios avulsos) reservam cota aqui
+    if quota.is_blocked(robot.user_id):
+        # A cota de hoje volta; amanhã o envio reserva na janela de amanhã
+        store.release(key)
+        give_back_quota()
+        _defer(self, seconds_until_tomorrow(), reserved=False)
+        record(DEFERRED)
+        return {'status': 'deferred', 'to': to_address, 'reason': 'blocked_date'}
+    if not reserved:
+        if not quota.reserve(robot.user_id, 1):
+            store.release(key)
+            _defer(self, config['LIMITS_RETRY_DELAY'])
+            record(DEFERRED)
+            return {'status': 'deferred', 'to': to_address, 'reason': 'limit'}
+        reserved = True
+
+    # Escolher a conta do pool com mais cota/saúde disponível
+    pool = get_sender_pool(config)
+    accounts = robot.sender_accounts()
+    internal_email = pool.choose(accounts) if accounts else None
+    if accounts and (internal_email is None or not pool.acquire(internal_email, claim.owner)):
+        # Todas as contas sem cota, ocupadas ou em cooldown: adiar sem contar
+        # como falha, mantendo a cota do usuário já reservada
+        store.release(key)
+        _defer(self, config['SENDER_DEFER_DELAY'], reserved=True)
+        record(DEFERRED)
+        return {'status': 'deferred', 'to': to_address, 'reason': 'sender_pool'}
+
+    sent = released = False
     try:
         # Configurar o servidor SMTP usando o email interno
-        msg = MIMEText(body)
-        msg['Subject'] = subject
-        msg['From'] = robot.internal_email
-        msg['To'] = to_address
+        if not internal_email:
+            raise ValueError('Email interno do robô não encontrado')
+        attachments = TemplateAttachment.query.filter_by(template_id=template_id).all() if template_id else []
 
-        with smtplib.SMTP(robot.smtp_server, robot.smtp_port) as server:
+        with claim, smtplib.SMTP(internal_email.smtp_server, internal_email.smtp_port,
+                                 timeout=config['SMTP_TIMEOUT']) as server:
             server.starttls()
-            server.login(robot.smtp_username, robot.smtp_password)
-            server.sendmail(robot.internal_email, [to_address], msg.as_string())
+            server.login(internal_email.smtp_username, internal_email.smtp_password)
+            # Conexão e login podem demorar: confirmar que a chave ainda é nossa antes do DATA
+            if claim.held():
+                if attachments:
+                    # Anexos saem da parte MIME em cache, direto para o DATA
+                    send_with_attachments(server, internal_email.email, to_address, subject,
+                                          mime_entity(body, html), attachments, config['ATTACHMENT_FOLDER'])
+                else:
+                    server.sendmail(internal_email.email, [to_address],
+                                    build_message(subject, internal_email.email, to_address, body, html))
+                # Marcar como concluído assim que o servidor aceitou a mensagem
+                store.complete(key, config['SEND_DONE_TTL'])
+                sent = True
+                record(SENT)
+        pool.release(internal_email, claim.owner)
+        released = True
+
+        if not sent:
+            # A chave expirou e outra tentativa a assumiu: ela envia, esta não
+            _set_send_log_status(send_log_id, 'duplicate', only_from='pending')
+            db.session.add(RobotLog(robot_id=robot.id, action='duplicate',
+                                    details=f'Envio para {to_address} assumido por outra tentativa'))
+            db.session.commit()
+            give_back_quota()
+            record(DUPLICATE)
+            return {'status': 'duplicate', 'to': to_address, 'state': PENDING}
 
         # Log de envio bem-sucedido
-        from app.models import RobotLog, db
+        _set_send_log_status(send_log_id, 'sent')
         db.session.add(RobotLog(robot_id=robot.id, action='send', details=f'Email enviado para {to_address}'))
         db.session.commit()
         return {'status': 'success', 'to': to_address}
     except Exception as e:
-        # Log de erro
-        from app.models import RobotLog, db
+        db.session.rollback()
+        if internal_email and not released:
+            pool.release(internal_email, claim.owner, error=None if sent else e)
+        if sent:
+            # O email saiu; só o registro falhou. Não retentar o envio.
+            return {'status': 'success', 'to': to_address, 'error': str(e)}
+        # Nada foi enviado: libera a chave para a próxima tentativa (se ainda for nossa)
+        if not claim.lost:
+            store.release(key)
+        kind, smtp_code = classify_smtp_error(e)
+        if isinstance(e, smtplib.SMTPAuthenticationError) and len(accounts) > 1:
+            # Problema da conta, não do destinatário: outra conta do pool pode enviar
+            kind = TEMPORARY
+        retries = self.request.retries
+        if kind == TEMPORARY and retries < config['SMTP_MAX_RETRIES']:
+            countdown = backoff_delay(retries, config['SMTP_RETRY_BACKOFF'], config['SMTP_RETRY_BACKOFF_MAX'])
+            db.session.add(RobotLog(robot_id=robot.id, action='retry',
+                                    details=f'Tentativa {retries + 1} para {to_address} em {countdown:.0f}s: {e}'))
+            db.session.commit()
+            record(RETRIED)
+            # Retentativas com prioridade mínima para não atrasar o tráfego saudável;
+            # a cota já reservada segue com a retentativa
+            raise self.retry(exc=e, countdown=countdown, max_retries=config['SMTP_MAX_RETRIES'],
+                             priority=retry_priority(config), kwargs={**(self.request.kwargs or {}), 'reserved': True})
+
+        # Falha permanente ou tentativas esgotadas: vai para a dead-letter queue
+        # reserved=False: o replay reserva cota de novo
+        dead_letter(self.name, original, robot.id, to_address, e, kind, smtp_code, retries)
+        _set_send_log_status(send_log_id, 'failed')
         db.session.add(RobotLog(robot_id=robot.id, action='error', details=str(e)))
         db.session.commit()
-        return {'status': 'error', 'error': str(e)}
\ No newline at end of file
+        give_back_quota()
+        record(FAILED, to=to_address, contact_id=contact_id, error=str(e), kind=kind, smtp_code=smtp_code,
+               retries=retries)
+        return {'status': 'error', 'error': str(e), 'kind': kind}
+
+
+# Resultado guardado no backend: a rota /api/robots/<id>/send-email/<job_id> o consulta
+@celery.task(bind=True, name='app.tasks.send_robot_test_email_task')
+def send_robot_test_email_task(self, robot_id):
+    """
+    Send the robot's test email through its internal SMTP account, off the
+    web request. Returns ``{'status': 'sent'}`` or ``{'status': 'error', 'error': ...}``.
+    """
+    from app.email_service import send_email_via_smtp
+
+    robot = Robot.query.get(robot_id)
+    if not robot:
+        return {'status': 'error', 'error': 'Robô não encontrado'}
+    internal_email = InternalEmail.query.filter_by(email=robot.internal_email).first()
+    if not internal_email:
+        return {'status': 'error', 'error': 'O email interno associado ao robô não foi encontrado.'}
+    smtp_config = {
+        'server': internal_email.smtp_server,
+        'port': internal_email.smtp_port,
+        'username': internal_email.smtp_username,
+        'password': internal_email.smtp_password
+    }
+    try:
+        send_email_via_smtp(robot.email, smtp_config, timeout=current_app.config['SMTP_TIMEOUT'])
+    except Exception as e:
+        db.session.add(RobotLog(robot_id=robot.id, action='error', details=f'Email de teste: {e}'))
+        db.session.commit()
+        return {'status': 'error', 'error': str(e)}
+    db.session.add(RobotLog(robot_id=robot.id, action='send', details=f'Email de teste enviado para {robot.email}'))
+    db.session.commit()
+    return {'status': 'sent'}
+
+
+# acks_late + reject_on_worker_lost: se o worker morrer no meio da importação a
+# mensagem volta para a fila e a task retoma a partir do último chunk confirmado.
+@celery.task(bind=True, name='app.tasks.import_contacts_task', acks_late=True, reject_on_worker_lost=True)
+def import_contacts_task(self, import_id):
+    from app.importer import run_import
+
+    job = ContactImport.query.get(import_id)
+    if not job:
+        return {'status': 'error', 'error': 'Importação não encontrada'}
+    if job.status == 'done':
+        return job.to_dict()
+
+    def progress(meta):
+        self.update_state(state='PROGRESS', meta=meta)
+
+    try:
+        run_import(job, progress=progress)
+    except Exception as e:
+        db.session.rollback()
+        job.status = 'failed'
+        job.error = str(e)
+        db.session.commit()
+    return job.to_dict()
+
+
+@celery.task(bind=True, name='app.tasks.run_campaign_shard_task', acks_late=True, reject_on_worker_lost=True,
+             ignore_result=True)
+def run_campaign_shard_task(self, shard_id, generation):
+    """
+    Process one batch of a campaign shard and reschedule itself while there
+    is work left, so shards interleave with other traffic on the workers.
+    """
+    from app.campaigns import run_shard_batch
+
+    countdown = run_shard_batch(shard_id, generation)
+    if countdown is not None:
+        self.apply_async(args=[shard_id, generation], countdown=countdown,
+                         **queue_options(CAMPAIGN, current_app.config))
+
+
+@celery.task(bind=True, name='app.tasks.dispatch_campaigns_task', ignore_result=True)
+def dispatch_campaigns_task(self):
+    """
+    One tick of the fair campaign scheduler (CAMPAIGN_SCHEDULER='fair'):
+    top up the campaign queue, shared among users and robots.
+    """
+    from app.campaigns import dispatch_fair
+
+    queued = dispatch_fair(current_app.config)
+    return sum(queued.values()) if queued else 0
+
+
+@celery.task(bind=True, name='app.tasks.archive_logs_task', ignore_result=True)
+def archive_logs_task(self):
+    """
+    Archive old SendLog/RobotLog rows in bounded batches; if the backlog is
+    larger than one run allows, continue in a fresh task so other
+    maintenance work can interleave.
+    """
+    from app.archive import archive_old_logs
+
+    moved, more_left = archive_old_logs(current_app.config)
+    if more_left:
+        self.apply_async(countdown=1, **queue_options(MAINTENANCE, current_app.config))
+    return moved
+
+
+@celery.task(bind=True, name='app.tasks.process_bounces_task', ignore_result=True)
+def process_bounces_task(self):
+    """
+    Record the hard bounces and complaints waiting in BOUNCE_MAILBOX as
+    suppressions.
+    """
+    from app.bounces import process_mailbox
+    from app.state import get_counter_store
+
+    path = current_app.config['BOUNCE_MAILBOX']
+    if not path:
+        return None
+    return process_mailbox(path, store=get_counter_store(current_app.config))
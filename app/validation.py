@@ -0,0 +1,206 @@
+import re
+import time
+from collections import OrderedDict
+from email_validator import validate_email, EmailNotValidError
+
+# Parte local em dot-atom ASCII (RFC 5322), já em minúsculas
+LOCAL_PART_RE = re.compile(r"^[a-z0-9!#$%&'*+/=?^_`{|}~-]+(\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*$")
+MAX_LOCAL_PART = 64
+MAX_ADDRESS = 254
+
+
+class DnsMxResolver:
+    """
+    Resolve MX records with dnspython (installed with email-validator).
+
+    A domain without MX but with an A/AAAA record still receives mail
+    (implicit MX, RFC 5321 section 5.1). Resolver failures (timeout,
+    SERVFAIL) are not proof of a bad domain and are accepted.
+    """
+
+    def __init__(self, timeout=5.0):
+        import dns.resolver
+        self._resolver = dns.resolver.Resolver()
+        self._resolver.lifetime = timeout
+
+    def has_mx(self, domain):
+        import dns.exception
+        import dns.resolver
+        try:
+            return len(self._resolver.resolve(domain, 'MX')) > 0
+        except dns.resolver.NXDOMAIN:
+            return False
+        except dns.resolver.NoAnswer:
+            # Sem MX: o próprio host recebe se tiver endereço (MX implícito)
+            return self._has_address(domain)
+        except (dns.exception.Timeout, dns.resolver.NoNameservers):
+            # Sem resposta (ou SERVFAIL) não é prova de domínio inválido
+            return True
+
+    def _has_address(self, domain):
+        import dns.exception
+        import dns.resolver
+        for rdtype in ('A', 'AAAA'):
+            try:
+                if len(self._resolver.resolve(domain, rdtype)) > 0:
+                    return True
+            except dns.resolver.NXDOMAIN:
+                return False
+            except dns.resolver.NoAnswer:
+                continue
+            except (dns.exception.Timeout, dns.resolver.NoNameservers):
+                return True
+        return False
+
+
+class StubMxResolver:
+    """
+    Local resolver for tests and offline environments.
+
+    ``domains`` maps a domain to whether it has MX records; unknown domains get
+    ``default``. ``lookups`` counts calls so callers can check cache hits.
+    """
+
+    def __init__(self, domains=None, default=True):
+        self.domains = dict(domains or {})
+        self.default = default
+        self.lookups = 0
+
+    def has_mx(self, domain):
+        self.lookups += 1
+        return self.domains.get(domain, self.default)
+
+
+class DomainCache:
+    """
+    Bounded LRU cache of per-domain verdicts with a TTL.
+    """
+
+    def __init__(self, max_size=100000, ttl=86400):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        verdict, expires = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return verdict
+
+    def set(self, key, verdict):
+        self._data[key] = (verdict, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class EmailAddressValidator:
+    """
+    Normalize and validate addresses, caching the verdict for each domain.
+
+    The local part is checked with a compiled regex on every call; the domain
+    (syntax, IDNA normalization and, with ``check_mx``, the MX lookup) is
+    checked once and cached, so a large import pays the expensive checks once
+    per distinct domain.
+    """
+
+    def __init__(self, resolver=None, check_mx=False, cache=None):
+        self.resolver = resolver
+        self.check_mx = check_mx and resolver is not None
+        self.cache = cache if cache is not None else DomainCache()
+
+    def _domain_verdict(self, domain):
+        key = (domain, self.check_mx)
+        verdict = self.cache.get(key)
+        if verdict is not None:
+            return verdict
+        try:
+            ascii_domain = validate_email(f'postmaster@{domain}', check_deliverability=False).ascii_domain
+        except EmailNotValidError:
+            verdict = (None, 'invalid_domain')
+        else:
+            if self.check_mx and not self.resolver.has_mx(ascii_domain):
+                verdict = (None, 'no_mx')
+            else:
+                verdict = (ascii_domain, None)
+        self.cache.set(key, verdict)
+        return verdict
+
+    def validate(self, address):
+        """
+        Return ``(normalized_address, None)`` or ``(None, reason)``.
+        """
+        address = (address or '').strip().lower()
+        if not address:
+            return None, 'empty'
+        if len(address) > MAX_ADDRESS or address.count('@') != 1:
+            return None, 'syntax'
+        local, domain = address.split('@')
+        if not local or len(local) > MAX_LOCAL_PART or not LOCAL_PART_RE.match(local):
+            return None, 'syntax'
+        ascii_domain, reason = self._domain_verdict(domain)
+        if reason:
+            return None, reason
+        return f'{local}@{ascii_domain}', None
+
+    def validate_many(self, addresses):
+        """
+        Validate a batch, returning ``(valid, rejects)`` where ``rejects`` is a
+        list of ``(address, reason)``.
+        """
+        valid, rejects = [], []
+        for address in addresses:
+            normalized, reason = self.validate(address)
+            if reason:
+                rejects.append((address, reason))
+            else:
+                valid.append(normalized)
+        return valid, rejects
+
+
+# Cache de domínios compartilhado entre importações no mesmo processo
+_domain_cache = DomainCache()
+# Um validador (e resolver) por configuração, reutilizado a cada envio
+_validators = {}
+
+
+def get_validator(config):
+    """
+    Process-wide validator for the app config, sharing the domain cache.
+    """
+    resolver_name = config.get('EMAIL_MX_RESOLVER', 'dns')
+    check_mx = config.get('EMAIL_VALIDATION_CHECK_MX', False)
+    key = (resolver_name, check_mx)
+    validator = _validators.get(key)
+    if validator is None:
+        resolver = None
+        if check_mx:
+            resolver = StubMxResolver() if resolver_name == 'stub' else DnsMxResolver()
+        validator = _validators[key] = EmailAddressValidator(resolver=resolver, check_mx=check_mx,
+                                                             cache=_domain_cache)
+    return validator
+
+
+def summarize_rejects(rejects, sample_size=100):
+    """
+    Aggregate ``(address, reason)`` pairs into per-reason counts and a sample.
+    """
+    reasons = {}
+    for _, reason in rejects:
+        reasons[reason] = reasons.get(reason, 0) + 1
+    return {
+        'total': len(rejects),
+        'reasons': reasons,
+        'sample': [{'email': address, 'reason': reason} for address, reason in rejects[:sample_size]],
+    }
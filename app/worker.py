@@ -0,0 +1,41 @@
+from celery.signals import task_prerun, task_postrun, worker_process_init
+from app import db
+
+# Contexto de aplicação aberto para cada task em execução, por task_id
+_task_contexts = {}
+
+
+def init_worker_signals(flask_app):
+    """
+    Give every task its own app context and database session.
+
+    Flask-SQLAlchemy scopes the session to the app context, so pushing one per
+    task means each task starts with an empty identity map. After the task the
+    session is rolled back if the task did not succeed and then removed, so a
+    failed transaction never leaks into the next task. In prefork workers each
+    child drops the connections inherited from the parent on start.
+    """
+
+    @worker_process_init.connect(weak=False)
+    def reset_pool_after_fork(**kwargs):
+        with flask_app.app_context():
+            # close=False: não fecha os sockets do processo pai, só os esquece
+            db.engine.dispose(close=False)
+
+    @task_prerun.connect(weak=False)
+    def push_task_context(task_id=None, **kwargs):
+        ctx = flask_app.app_context()
+        ctx.push()
+        _task_contexts[task_id] = ctx
+
+    @task_postrun.connect(weak=False)
+    def cleanup_task_session(task_id=None, state=None, **kwargs):
+        ctx = _task_contexts.pop(task_id, None)
+        if ctx is None:
+            return
+        try:
+            if state != 'SUCCESS':
+                db.session.rollback()
+            db.session.remove()
+        finally:
+            ctx.pop()
@@ -0,0 +1,79 @@
+"""
+Throughput benchmark for the contact bulk loaders.
+
+Compares ORM ``add_all``, the ORM bulk loader and the native loader for the
+configured database (COPY on PostgreSQL, executemany on SQLite).
+
+    python benchmarks/bench_contact_loaders.py --rows 200000 --chunk 5000
+    DATABASE_URL=postgresql://... python benchmarks/bench_contact_loaders.py
+
+Without DATABASE_URL a throwaway SQLite file is used.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def make_rows(n, list_id):
+    return [{
+        'list_id': list_id,
+        'titulo': f'Titulo {i % 50}',
+        'email': f'contato{i}@exemplo{i % 997}.com',
+        'nome_congresso': 'Congresso Brasileiro',
+        'ano_congresso': '2024',
+    } for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--chunk', type=int, default=5000)
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ.setdefault('SECRET_KEY', 'bench')
+
+    from app import create_app, db
+    from app.models import Contact, ContactList, User
+    from app.loaders import ContactLoader, get_contact_loader
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user = User(username=f'bench{time.time_ns()}', email=f'{time.time_ns()}@bench.local', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        contact_list = ContactList(name='bench', user_id=user.id)
+        db.session.add(contact_list)
+        db.session.commit()
+        rows = make_rows(args.rows, contact_list.id)
+
+        def orm_add_all(chunk):
+            db.session.add_all(Contact(**row) for row in chunk)
+            db.session.flush()
+
+        strategies = [
+            ('orm add_all', orm_add_all),
+            ('orm bulk_insert_mappings', ContactLoader(db.session).load),
+            (f'native ({db.engine.dialect.name})', get_contact_loader(db.session).load),
+        ]
+        print(f'{args.rows} rows, chunk={args.chunk}, db={db.engine.dialect.name}')
+        for name, load in strategies:
+            start = time.perf_counter()
+            for offset in range(0, len(rows), args.chunk):
+                load(rows[offset:offset + args.chunk])
+                db.session.commit()
+            elapsed = time.perf_counter() - start
+            print(f'{name:32s} {elapsed:8.2f}s {args.rows / elapsed:12,.0f} rows/s')
+            Contact.query.filter_by(list_id=contact_list.id).delete()
+            db.session.commit()
+
+
+if __name__ == '__main__':
+    main()
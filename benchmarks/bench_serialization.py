@@ -0,0 +1,106 @@
+"""
+Broker payload benchmark for send_email_task messages.
+
+For each serializer/compression pair, reports the bytes a message takes in
+the broker (the JSON envelope the Redis transport stores, body included)
+and enqueue/dequeue throughput, for three typical payloads: ids only
+(RENDER_IN_WORKER), a rendered text email and a rendered HTML email.
+
+    python benchmarks/bench_serialization.py --messages 20000
+    python benchmarks/bench_serialization.py --broker redis://localhost:6379/15
+
+The default broker is kombu's in-memory transport, so throughput there is
+serialization cost only; point --broker at a scratch Redis database (the
+bench queue is cleared first) to include the network round trips.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+TASK = 'app.tasks.send_email_task'
+QUEUE = 'bench_serialization'
+
+TEXT_BODY = ('Olá Maria Silva,\n\nConfirmamos sua inscrição no Congresso Brasileiro de Cardiologia 2025. '
+             'Seguem abaixo as informações do evento e os próximos passos.\n\n') * 6
+HTML_BODY = ('<table width="100%" style="font-family:Arial,sans-serif;color:#333"><tr><td>'
+             '<h1 style="font-size:22px">Olá Maria Silva</h1><p style="line-height:1.5">Confirmamos sua '
+             'inscrição no <strong>Congresso Brasileiro de Cardiologia 2025</strong>. Veja a '
+             '<a href="https://exemplo.com.br/programacao?utm_source=email">programação</a>.</p>'
+             '</td></tr></table>\n') * 12
+
+
+def payloads():
+    ids = {'send_log_id': 1234567, 'contact_id': 7654321, 'template_id': 321, 'campaign_id': 98,
+           'reserved': True, 'template_version': 3}
+    return [
+        ('ids only', [42], ids),
+        ('rendered text', [42, 'maria.silva@exemplo.com.br', 'Inscrição confirmada', TEXT_BODY],
+         {**ids, 'html': None}),
+        ('rendered html', [42, 'maria.silva@exemplo.com.br', 'Inscrição confirmada', TEXT_BODY],
+         {**ids, 'html': HTML_BODY}),
+    ]
+
+
+def broker_bytes(conn):
+    """
+    Size of the oldest queued message exactly as the broker stores it.
+    """
+    if conn.transport_cls == 'memory':
+        from kombu.transport.memory import Channel
+        from kombu.utils.json import dumps
+        # Mesmo envelope JSON que o transporte Redis grava (corpo em base64)
+        return len(dumps(Channel.queues[QUEUE].queue[0]))
+    return len(conn.default_channel.client.lindex(QUEUE, -1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--broker', default='memory://')
+    args = parser.parse_args()
+
+    from celery import Celery
+    from kombu import Connection, Exchange, Queue
+    from kombu.serialization import registry
+    from app import _serialization_options
+
+    serializers = [name for name in ('json', 'msgpack') if name in registry.name_to_type]
+    combos = [(serializer, compression) for serializer in serializers for compression in (None, 'zlib', 'lzma')]
+    queue = Queue(QUEUE, Exchange(QUEUE), routing_key=QUEUE)
+
+    print(f'{args.messages} messages per run, broker={args.broker}')
+    if 'msgpack' not in serializers:
+        print('msgpack not installed: only json is measured')
+    print(f'{"payload":14s} {"serializer":10s} {"compression":11s} {"bytes/msg":>10s} '
+          f'{"enqueue/s":>11s} {"dequeue/s":>11s}')
+    with Connection(args.broker) as conn:
+        consumer = conn.SimpleQueue(queue, accept=serializers)
+        consumer.clear()
+        for label, task_args, task_kwargs in payloads():
+            for serializer, compression in combos:
+                celery = Celery('bench', broker=args.broker)
+                celery.conf.update(**_serialization_options({'CELERY_TASK_SERIALIZER': serializer,
+                                                             'CELERY_TASK_COMPRESSION': compression}))
+                with celery.producer_or_acquire() as producer:
+                    start = time.perf_counter()
+                    for _ in range(args.messages):
+                        celery.send_task(TASK, args=task_args, kwargs=task_kwargs, queue=queue, producer=producer)
+                    enqueue = args.messages / (time.perf_counter() - start)
+
+                size = broker_bytes(conn)
+                start = time.perf_counter()
+                for _ in range(args.messages):
+                    message = consumer.get(timeout=5)
+                    message.decode()
+                    message.ack()
+                dequeue = args.messages / (time.perf_counter() - start)
+                print(f'{label:14s} {serializer:10s} {compression or "-":11s} {size:10,d} '
+                      f'{enqueue:11,.0f} {dequeue:11,.0f}')
+        consumer.close()
+
+
+if __name__ == '__main__':
+    main()
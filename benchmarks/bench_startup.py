@@ -0,0 +1,66 @@
+"""
+Startup time and memory of the web and worker entry points.
+
+Each entry point is loaded in a fresh interpreter several times; the script
+reports the median wall time to a ready app, the peak RSS, and whether the
+heavy optional modules (pandas, openpyxl, alembic) were imported.
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+PROBE = '''
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+{load}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy': sorted(m for m in ('pandas', 'openpyxl', 'alembic') if m in sys.modules),
+}}))
+'''
+
+ENTRY_POINTS = {
+    'web (run.create_app)': 'from app import create_app\ncreate_app()',
+    'worker (celery_worker)': 'import celery_worker',
+}
+
+
+def measure(load, runs, env):
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', PROBE.format(root=ROOT, load=load)],
+                             capture_output=True, text=True, env=env, cwd=ROOT, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', f'sqlite:///{os.path.join(tempfile.mkdtemp(), "bench.db")}')
+    env.setdefault('SECRET_KEY', 'bench')
+
+    for name, load in ENTRY_POINTS.items():
+        results = measure(load, args.runs, env)
+        seconds = statistics.median(r['seconds'] for r in results)
+        rss = statistics.median(r['rss_mb'] for r in results)
+        heavy = ', '.join(results[0]['heavy']) or '-'
+        print(f'{name:24s} {seconds * 1000:8.0f} ms {rss:8.1f} MB RSS   heavy modules: {heavy}')
+
+
+if __name__ == '__main__':
+    main()
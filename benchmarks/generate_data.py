@@ -0,0 +1,200 @@
+"""
+Synthetic dataset for load tests: users with templates, sender accounts and
+robots, plus millions of Contact, SendLog and RobotLog rows.
+
+    python benchmarks/generate_data.py --users 20 --contacts 2000000 --send-logs 5000000 --robot-logs 2000000
+    DATABASE_URL=postgresql://... python benchmarks/generate_data.py --users 50 --contacts 10000000
+
+Users are ``loadtest<N>@example.com`` with --password, the accounts
+benchmarks/loadtest.py logs in with; they are reused when they already
+exist, and rows are always added, never replaced. Rows are spread evenly
+across users and their timestamps over the last --days days. Contacts go
+through the importer's native loader (COPY on PostgreSQL, executemany on
+SQLite); the log tables use COPY on PostgreSQL and a bulk INSERT elsewhere.
+Without DATABASE_URL the development database is used.
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, time as dtime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+TITLES = [f'Titulo {i}' for i in range(50)]
+STATUSES = (['sent'] * 90) + (['failed'] * 7) + (['pending'] * 3)
+ACTIONS = (['send'] * 85) + (['error'] * 5) + (['retry'] * 5) + (['reject'] * 5)
+
+
+def load_rows(session, table, columns, rows):
+    """
+    Bulk-insert tuples into ``table`` inside the session's transaction.
+    """
+    if not rows:
+        return 0
+    if session.get_bind().dialect.name == 'postgresql':
+        buf = io.StringIO()
+        csv.writer(buf).writerows([value.isoformat() if isinstance(value, datetime) else value for value in row]
+                                  for row in rows)
+        buf.seek(0)
+        sql = f'COPY {table.name} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)'
+        cursor = session.connection().connection.dbapi_connection.cursor()
+        try:
+            if hasattr(cursor, 'copy_expert'):  # psycopg2
+                cursor.copy_expert(sql, buf)
+            else:  # psycopg 3
+                with cursor.copy(sql) as copy:
+                    copy.write(buf.getvalue())
+        finally:
+            cursor.close()
+    else:
+        session.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+    return len(rows)
+
+
+def ensure_users(args):
+    """
+    One user per --users with a contact list, template, sender account and
+    --robots robots; returns ``[(user, contact_list, template, robots)]``.
+    """
+    from app.models import ContactList, EmailTemplate, InternalEmail, Robot, User, db
+
+    fixtures = []
+    for index in range(args.users):
+        email = f'loadtest{index}@example.com'
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            user = User(username=f'loadtest{index}', email=email, password=args.password)
+            db.session.add(user)
+            db.session.flush()
+        contact_list = ContactList(name=f'Carga {datetime.now():%Y-%m-%d %H:%M}', user_id=user.id)
+        template = EmailTemplate(name='Carga', subject='Olá {{ nome_congresso }}',
+                                 body='Confirmamos sua inscrição no {{ nome_congresso }} {{ ano_congresso }}.',
+                                 user_id=user.id)
+        db.session.add_all([contact_list, template])
+        sender = InternalEmail.query.filter_by(email=f'sender-loadtest{index}@example.com').first()
+        if sender is None:
+            # SMTP inexistente: envios disparados pelo teste de carga falham sem sair da máquina
+            sender = InternalEmail(email=f'sender-loadtest{index}@example.com', user_id=user.id,
+                                   smtp_server='127.0.0.1', smtp_port=2525, smtp_username='loadtest',
+                                   smtp_password='loadtest', hourly_quota=500, daily_quota=5000)
+            db.session.add(sender)
+        db.session.flush()
+        robots = []
+        for number in range(args.robots):
+            robot = Robot(name=f'Robô {number}', email=email, template_id=template.id, user_id=user.id,
+                          emails_per_hour=100, start_time=dtime(8), end_time=dtime(18),
+                          working_days=['0', '1', '2', '3', '4'], contact_title=random.choice(TITLES),
+                          internal_email=sender.email, active=False)
+            db.session.add(robot)
+            robots.append(robot)
+        db.session.flush()
+        fixtures.append((user, contact_list, template, robots))
+    db.session.commit()
+    return fixtures
+
+
+def random_timestamp(now, days):
+    return now - timedelta(seconds=random.randrange(days * 86400))
+
+
+def generate_contacts(fixtures, total, chunk):
+    """
+    Insert ``total`` contacts spread over the users' lists; returns each
+    list's ``(first_id, last_id)``.
+    """
+    from sqlalchemy import func
+    from app.loaders import get_contact_loader
+    from app.models import Contact, db
+
+    per_user = total // len(fixtures)
+    loader = get_contact_loader(db.session)
+    ranges = {}
+    for user, contact_list, _, _ in fixtures:
+        for start in range(0, per_user, chunk):
+            loader.load([{
+                'list_id': contact_list.id,
+                'titulo': TITLES[i % len(TITLES)],
+                'email': f'contato{i}.l{contact_list.id}@exemplo{i % 997}.com.br',
+                'nome_congresso': f'Congresso {i % 200}',
+                'ano_congresso': str(2020 + i % 6),
+            } for i in range(start, min(start + chunk, per_user))])
+            db.session.commit()
+        ranges[contact_list.id] = db.session.query(func.min(Contact.id), func.max(Contact.id)).filter(
+            Contact.list_id == contact_list.id).one()
+    return ranges
+
+
+def generate_send_logs(fixtures, ranges, total, chunk, days):
+    from app.models import SendLog, db
+
+    columns = ['contact_id', 'template_id', 'status', 'timestamp']
+    per_user = total // len(fixtures)
+    now = datetime.utcnow()
+    for _, contact_list, template, _ in fixtures:
+        first, last = ranges[contact_list.id]
+        if first is None:
+            continue
+        for start in range(0, per_user, chunk):
+            load_rows(db.session, SendLog.__table__, columns,
+                      [(random.randint(first, last), template.id, random.choice(STATUSES), random_timestamp(now, days))
+                       for _ in range(min(chunk, per_user - start))])
+            db.session.commit()
+
+
+def generate_robot_logs(fixtures, total, chunk, days):
+    from app.models import RobotLog, db
+
+    columns = ['robot_id', 'action', 'details', 'timestamp']
+    robots = [robot.id for _, _, _, user_robots in fixtures for robot in user_robots]
+    if not robots:
+        return
+    now = datetime.utcnow()
+    for start in range(0, total, chunk):
+        rows = []
+        for _ in range(min(chunk, total - start)):
+            action = random.choice(ACTIONS)
+            details = f'Email enviado para contato{random.randrange(10 ** 6)}@exemplo.com.br' if action == 'send' \
+                else f'{action}: 421 4.7.0 Try again later'
+            rows.append((random.choice(robots), action, details, random_timestamp(now, days)))
+        load_rows(db.session, RobotLog.__table__, columns, rows)
+        db.session.commit()
+
+
+def timed(label, rows, step, *args):
+    start = time.perf_counter()
+    result = step(*args)
+    elapsed = time.perf_counter() - start
+    print(f'{label:10s} {rows:>12,d} rows {elapsed:8.1f}s {rows / elapsed if elapsed else 0:>12,.0f} rows/s')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--robots', type=int, default=3, help='robots per user')
+    parser.add_argument('--contacts', type=int, default=1000000)
+    parser.add_argument('--send-logs', type=int, default=1000000)
+    parser.add_argument('--robot-logs', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=90, help='timestamps spread over the last N days')
+    parser.add_argument('--chunk', type=int, default=10000)
+    parser.add_argument('--password', default='loadtest')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    from app import create_app, db
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        print(f'database: {db.engine.url.render_as_string(hide_password=True)}')
+        fixtures = timed('users', args.users, ensure_users, args)
+        ranges = timed('contacts', args.contacts, generate_contacts, fixtures, args.contacts, args.chunk)
+        timed('send_log', args.send_logs, generate_send_logs, fixtures, ranges, args.send_logs, args.chunk, args.days)
+        timed('robot_log', args.robot_logs, generate_robot_logs, fixtures, args.robot_logs, args.chunk, args.days)
+
+if __name__ == '__main__':
+    main()
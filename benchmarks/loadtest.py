@@ -0,0 +1,262 @@
+"""
+HTTP load test for the web app: concurrent virtual users log in and run
+weighted scenarios, and per-route latency percentiles and error rates are
+reported at the end.
+
+    python benchmarks/generate_data.py --users 20 --contacts 2000000
+    python run.py  # or gunicorn, against the same database
+    python benchmarks/loadtest.py --url http://127.0.0.1:5000 --users 50 --duration 120
+    python benchmarks/loadtest.py --users 200 --ramp 60 --read-only --json results.json
+
+Virtual user N logs in as ``loadtest<N % accounts>@example.com`` (the
+accounts benchmarks/generate_data.py creates) and keeps its own session
+cookie. Scenarios: dashboard, robots list and create, compose (page and a
+send whose filter matches no contact), upload (page and a small CSV) and
+the robots monitor polling a robot's logs like the page does. --read-only
+drops the scenarios that write. Only the standard library is used.
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+# Cenário -> (peso, escreve no banco)
+SCENARIOS = {
+    'dashboard': (25, False),
+    'robots_list': (15, False),
+    'robots_create': (2, True),
+    'compose_page': (10, False),
+    'compose_send': (3, True),
+    'upload_page': (5, False),
+    'upload_file': (2, True),
+    'monitor_poll': (38, False),
+}
+
+PERCENTILES = (50, 90, 95, 99)
+
+CSV_HEADER = 'Numero,Titulo,Emails,Nome do Congresso,Ano do Congresso\r\n'
+
+
+def percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Stats:
+    """
+    Latencies (seconds) and error counts per route, one instance per thread.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+
+    def merge(self, other):
+        for route, values in other.latencies.items():
+            self.latencies[route].extend(values)
+        for route, errors in other.errors.items():
+            for reason, count in errors.items():
+                self.errors[route][reason] += count
+
+
+class VirtualUser(threading.Thread):
+
+    def __init__(self, index, args, deadline, scenarios):
+        super().__init__(daemon=True)
+        self.index = index
+        self.args = args
+        self.deadline = deadline
+        self.scenarios = scenarios
+        self.stats = Stats()
+        self.rng = random.Random(args.seed + index)
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()))
+        self.robot_ids = []
+        self.form = {}
+
+    def request(self, route, path, data=None, headers=None):
+        """
+        Timed request; returns the body (str) or None on error. A redirect to
+        the login page counts as an error: the session was lost.
+        """
+        request = Request(self.args.url + path, data=data, headers=headers or {})
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=self.args.timeout) as response:
+                body = response.read().decode('utf-8', 'replace')
+                final_url = response.geturl()
+        except HTTPError as e:
+            self.stats.latencies[route].append(time.perf_counter() - start)
+            self.stats.errors[route][str(e.code)] += 1
+            return None
+        except (URLError, OSError) as e:
+            self.stats.latencies[route].append(time.perf_counter() - start)
+            self.stats.errors[route][type(getattr(e, 'reason', e)).__name__] += 1
+            return None
+        self.stats.latencies[route].append(time.perf_counter() - start)
+        if route != 'login' and '/auth/login' in final_url:
+            self.stats.errors[route]['login_redirect'] += 1
+            return None
+        return body
+
+    def post_form(self, route, path, fields):
+        return self.request(route, path, urlencode(fields, doseq=True).encode(),
+                            {'Content-Type': 'application/x-www-form-urlencoded'})
+
+    def login(self):
+        email = f'loadtest{self.index % self.args.accounts}@example.com'
+        body = self.post_form('login', '/auth/login', {'email': email, 'password': self.args.password})
+        if body is None:
+            return False
+        # Opções do formulário de robôs para o cenário de criação
+        page = self.request('robots_list', '/robots') or ''
+        for field in ('template_id', 'internal_email', 'contact_title'):
+            select = re.search(rf'name="{field}".*?</select>', page, re.S)
+            self.form[field] = re.findall(r'<option value="([^"]+)"', select.group(0)) if select else []
+        self.form['template_id'] = [value for value in self.form['template_id'] if value]
+        monitor = self.request('monitor_poll', '/robots/monitor') or ''
+        self.robot_ids = sorted(set(re.findall(r'data-id="(\d+)"', monitor)))
+        return True
+
+    def robots_create(self):
+        if not all(self.form.get(field) for field in ('template_id', 'internal_email', 'contact_title')):
+            self.stats.errors['robots_create']['no_form_options'] += 1
+            return
+        self.post_form('robots_create', '/robots', {
+            'name': f'Carga {uuid.uuid4().hex[:8]}',
+            'email': f'loadtest{self.index}@example.com',
+            'template_id': self.rng.choice(self.form['template_id']),
+            'internal_email': self.rng.choice(self.form['internal_email']),
+            'contact_title': self.rng.choice(self.form['contact_title']),
+            'emails_per_hour': 100,
+            'start_time': '08:00',
+            'end_time': '18:00',
+            'days[]': ['0', '1', '2', '3', '4'],
+        })
+
+    def compose_send(self):
+        if not self.form.get('template_id'):
+            self.stats.errors['compose_send']['no_form_options'] += 1
+            return
+        # Filtro sem correspondência: mede o caminho do envio sem enfileirar emails
+        self.post_form('compose_send', '/compose', {
+            'template': self.form['template_id'][0],
+            'filters': json.dumps({'titulo': f'__loadtest_{uuid.uuid4().hex}__'}),
+        })
+
+    def upload_file(self):
+        boundary = uuid.uuid4().hex
+        rows = ''.join(f'{i},Titulo {i % 50},carga{uuid.uuid4().hex[:10]}@exemplo.com.br,Congresso Carga,2025\r\n'
+                       for i in range(20))
+        body = (f'--{boundary}\r\nContent-Disposition: form-data; name="name"\r\n\r\nCarga upload\r\n'
+                f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="carga.csv"\r\n'
+                f'Content-Type: text/csv\r\n\r\n{CSV_HEADER}{rows}\r\n--{boundary}--\r\n').encode('utf-8')
+        self.request('upload_file', '/upload', body, {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+
+    def monitor_poll(self):
+        if not self.robot_ids:
+            self.request('monitor_poll', '/robots/monitor')
+            return
+        # Como a página: abre os logs de um robô e atualiza algumas vezes
+        robot_id = self.rng.choice(self.robot_ids)
+        for _ in range(self.args.polls):
+            self.request('robot_logs', f'/api/robots/{robot_id}/logs')
+            if time.monotonic() >= self.deadline:
+                return
+            time.sleep(self.args.poll_interval)
+
+    def run(self):
+        if not self.login():
+            return
+        names = list(self.scenarios)
+        weights = [self.scenarios[name] for name in names]
+        simple = {'dashboard': '/dashboard', 'robots_list': '/robots', 'compose_page': '/compose',
+                  'upload_page': '/upload'}
+        while time.monotonic() < self.deadline:
+            name = self.rng.choices(names, weights)[0]
+            if name in simple:
+                self.request(name, simple[name])
+            else:
+                getattr(self, name)()
+            if self.args.think:
+                time.sleep(self.rng.uniform(0, 2 * self.args.think))
+
+
+def report(stats, elapsed):
+    rows = []
+    for route in sorted(stats.latencies):
+        ordered = sorted(stats.latencies[route])
+        errors = sum(stats.errors[route].values())
+        rows.append({
+            'route': route,
+            'requests': len(ordered),
+            'errors': errors,
+            'error_rate': round(errors / len(ordered), 4) if ordered else 0.0,
+            'rps': round(len(ordered) / elapsed, 2),
+            **{f'p{p}_ms': round(percentile(ordered, p) * 1000, 1) for p in PERCENTILES},
+            'max_ms': round(ordered[-1] * 1000, 1) if ordered else 0.0,
+            'error_reasons': dict(stats.errors[route]),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--users', type=int, default=20, help='concurrent virtual users')
+    parser.add_argument('--accounts', type=int, default=10, help='loadtest accounts to spread users over')
+    parser.add_argument('--password', default='loadtest')
+    parser.add_argument('--duration', type=float, default=60, help='seconds, ramp-up included')
+    parser.add_argument('--ramp', type=float, default=10, help='seconds to start every user')
+    parser.add_argument('--think', type=float, default=0.5, help='mean pause between scenarios (s)')
+    parser.add_argument('--polls', type=int, default=5, help='log polls per monitor scenario')
+    parser.add_argument('--poll-interval', type=float, default=2.0)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--read-only', action='store_true', help='skip the scenarios that write')
+    parser.add_argument('--json', help='also write the report to this file')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    args.url = args.url.rstrip('/')
+
+    scenarios = {name: weight for name, (weight, writes) in SCENARIOS.items() if not (writes and args.read_only)}
+    start = time.monotonic()
+    deadline = start + args.duration
+    users = []
+    for index in range(args.users):
+        user = VirtualUser(index, args, deadline, scenarios)
+        user.start()
+        users.append(user)
+        time.sleep(args.ramp / args.users if args.users else 0)
+    for user in users:
+        user.join(max(deadline - time.monotonic(), 0) + args.timeout * 2)
+    elapsed = time.monotonic() - start
+
+    stats = Stats()
+    for user in users:
+        stats.merge(user.stats)
+    rows = report(stats, elapsed)
+    print(f'{args.users} users, {elapsed:.0f}s, {args.url}')
+    print(f'{"route":14s} {"reqs":>7s} {"err%":>6s} {"req/s":>7s} ' +
+          ' '.join(f'{f"p{p}":>8s}' for p in PERCENTILES) + f' {"max":>8s}  errors')
+    for row in rows:
+        print(f'{row["route"]:14s} {row["requests"]:7d} {row["error_rate"] * 100:6.2f} {row["rps"]:7.2f} ' +
+              ' '.join(f'{row[f"p{p}_ms"]:8.1f}' for p in PERCENTILES) +
+              f' {row["max_ms"]:8.1f}  {row["error_reasons"] or ""}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'users': args.users, 'duration': elapsed, 'url': args.url, 'routes': rows}, f, indent=2)
+    return 1 if not rows else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,14 @@
-from app import create_app, celery
+import sys
+from app import create_worker_app, celery
+from app.queues import worker_argv
 
-app = create_app()
-app.app_context().push()
+# Cada task roda no seu próprio contexto de aplicação (ver app/worker.py)
+app = create_worker_app()
 
 if __name__ == '__main__':
-    celery.start()
+    # python celery_worker.py <fila> inicia um worker dedicado com a
+    # concorrência configurada em CELERY_QUEUE_SETTINGS
+    if len(sys.argv) > 1 and sys.argv[1] in app.config['CELERY_QUEUE_SETTINGS']:
+        celery.worker_main(worker_argv(sys.argv[1], app.config))
+    else:
+        celery.start()
@@ -2,13 +2,151 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
+
+def _engine_options(url, pool_size, max_overflow):
+    """
+    SQLAlchemy engine options; pool sizing only applies to server databases.
+    """
+    options = {
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'True') == 'True',
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+    if url and not url.startswith('sqlite'):
+        options.update(
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        )
+    return options
+
+
 class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
+    # Pool de conexões do app web
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(
+        SQLALCHEMY_DATABASE_URI,
+        pool_size=int(os.environ.get('DB_POOL_SIZE', 10)),
+        max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+    )
+    # Workers prefork executam uma task por processo: pool pequeno por processo
+    WORKER_SQLALCHEMY_ENGINE_OPTIONS = _engine_options(
+        SQLALCHEMY_DATABASE_URI,
+        pool_size=int(os.environ.get('WORKER_DB_POOL_SIZE', 2)),
+        max_overflow=int(os.environ.get('WORKER_DB_MAX_OVERFLOW', 2)),
+    )
     SECRET_KEY = os.environ.get('SECRET_KEY')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
     CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
-    
+    # Corpo das tasks no broker: serializer ('json' ou 'msgpack') e compressão
+    # opcional ('zlib' ou 'lzma'); benchmarks/bench_serialization.py compara
+    CELERY_TASK_SERIALIZER = os.environ.get('CELERY_TASK_SERIALIZER', 'json')
+    CELERY_TASK_COMPRESSION = os.environ.get('CELERY_TASK_COMPRESSION') or None
+    # Filas do Celery: prioridade (0-9, maior = mais urgente), concorrência e
+    # prefetch de cada worker dedicado (python celery_worker.py <fila>)
+    CELERY_QUEUE_SETTINGS = {
+        'transactional': {
+            'priority': 9,
+            'concurrency': int(os.environ.get('TRANSACTIONAL_CONCURRENCY', 4)),
+            'prefetch_multiplier': 1,
+        },
+        'campaign': {
+            'priority': 3,
+            'concurrency': int(os.environ.get('CAMPAIGN_CONCURRENCY', 16)),
+            'prefetch_multiplier': 4,
+        },
+        'maintenance': {
+            'priority': 0,
+            'concurrency': int(os.environ.get('MAINTENANCE_CONCURRENCY', 2)),
+            'prefetch_multiplier': 1,
+        },
+    }
+    # Envios com até este número de destinatários usam a fila transactional
+    TRANSACTIONAL_MAX_RECIPIENTS = int(os.environ.get('TRANSACTIONAL_MAX_RECIPIENTS', 50))
+    # Envio SMTP: timeout e novas tentativas para falhas temporárias (4xx/rede)
+    SMTP_TIMEOUT = int(os.environ.get('SMTP_TIMEOUT', 30))
+    # Por quanto tempo o status de um envio avulso (/send-email) pode ser consultado
+    SEND_JOB_TTL = int(os.environ.get('SEND_JOB_TTL', 86400))
+    SMTP_MAX_RETRIES = int(os.environ.get('SMTP_MAX_RETRIES', 5))
+    SMTP_RETRY_BACKOFF = int(os.environ.get('SMTP_RETRY_BACKOFF', 30))  # segundos
+    SMTP_RETRY_BACKOFF_MAX = int(os.environ.get('SMTP_RETRY_BACKOFF_MAX', 3600))
+    # Estado compartilhado entre workers (contadores, cotas): 'redis' ou 'memory'
+    STATE_BACKEND = os.environ.get('STATE_BACKEND', 'redis')
+    REDIS_URL = os.environ.get('REDIS_URL', CELERY_BROKER_URL)
+    # Chaves de idempotência dos envios ('redis' ou 'memory')
+    IDEMPOTENCY_BACKEND = os.environ.get('IDEMPOTENCY_BACKEND', STATE_BACKEND)
+    IDEMPOTENCY_REDIS_URL = os.environ.get('IDEMPOTENCY_REDIS_URL', REDIS_URL)
+    # Envio em andamento: curto, na ordem do SMTP_TIMEOUT, para que uma mensagem
+    # reentregue depois da queda de um worker não fique presa na chave pendente.
+    # Envios mais longos (anexos grandes) renovam a chave a cada TTL/3 enquanto duram
+    SEND_CLAIM_TTL = int(os.environ.get('SEND_CLAIM_TTL', SMTP_TIMEOUT * 4))
+    SEND_DONE_TTL = int(os.environ.get('SEND_DONE_TTL', 7 * 86400))  # envio concluído
+    # Campanhas: shards paralelos e contatos enfileirados por lote de cada shard
+    CAMPAIGN_SHARDS = int(os.environ.get('CAMPAIGN_SHARDS', 4))
+    CAMPAIGN_BATCH_SIZE = int(os.environ.get('CAMPAIGN_BATCH_SIZE', 500))
+    # Escalonador de campanhas: 'fair' divide a fila entre usuários e robôs
+    # (deficit round-robin) a cada CAMPAIGN_DISPATCH_INTERVAL segundos,
+    # mantendo até CAMPAIGN_TARGET_DEPTH mensagens na fila; 'fifo' deixa cada
+    # shard enfileirar o mais rápido que puder
+    CAMPAIGN_SCHEDULER = os.environ.get('CAMPAIGN_SCHEDULER', 'fair')
+    CAMPAIGN_DISPATCH_INTERVAL = int(os.environ.get('CAMPAIGN_DISPATCH_INTERVAL', 5))
+    CAMPAIGN_TARGET_DEPTH = int(os.environ.get('CAMPAIGN_TARGET_DEPTH', 2000))
+    CAMPAIGN_FAIR_QUANTUM = int(os.environ.get('CAMPAIGN_FAIR_QUANTUM', 100))
+    # Pesos por usuário no formato "user_id:peso,user_id:peso" (padrão 1)
+    CAMPAIGN_USER_WEIGHTS = dict(item.split(':', 1) for item in os.environ.get('CAMPAIGN_USER_WEIGHTS', '').split(',') if item)
+    # Pool de contas de envio: saúde medida em janelas de SENDER_HEALTH_WINDOW
+    # segundos; conta com taxa de erro acima do limite sai de rotação por
+    # SENDER_COOLDOWN segundos
+    SENDER_HEALTH_WINDOW = int(os.environ.get('SENDER_HEALTH_WINDOW', 600))
+    SENDER_MAX_ERROR_RATE = float(os.environ.get('SENDER_MAX_ERROR_RATE', 0.3))
+    SENDER_MIN_ATTEMPTS = int(os.environ.get('SENDER_MIN_ATTEMPTS', 10))
+    SENDER_COOLDOWN = int(os.environ.get('SENDER_COOLDOWN', 900))
+    SENDER_DEFER_DELAY = int(os.environ.get('SENDER_DEFER_DELAY', 60))  # sem conta disponível
+    # Limits (daily/monthly): espera antes de tentar de novo quando a cota acaba
+    LIMITS_RETRY_DELAY = int(os.environ.get('LIMITS_RETRY_DELAY', 900))
+    # Resultado dos envios: contadores por campanha e as últimas falhas
+    CAMPAIGN_OUTCOMES_TTL = int(os.environ.get('CAMPAIGN_OUTCOMES_TTL', 30 * 86400))
+    CAMPAIGN_FAILURE_SAMPLE = int(os.environ.get('CAMPAIGN_FAILURE_SAMPLE', 200))
+    # Retenção de SendLog/RobotLog: linhas mais antigas vão para arquivos
+    # gzip CSV particionados por dia, em lotes, a cada LOG_ARCHIVE_INTERVAL
+    LOG_RETENTION_DAYS = int(os.environ.get('LOG_RETENTION_DAYS', 30))
+    ARCHIVE_FOLDER = os.environ.get('ARCHIVE_FOLDER', os.path.join(os.path.abspath(os.path.dirname(__file__)), 'instance', 'archive'))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 5000))
+    ARCHIVE_MAX_BATCHES = int(os.environ.get('ARCHIVE_MAX_BATCHES', 20))  # por tabela e execução
+    LOG_ARCHIVE_INTERVAL = int(os.environ.get('LOG_ARCHIVE_INTERVAL', 3600))
+    ARCHIVE_MAX_DAYS = int(os.environ.get('ARCHIVE_MAX_DAYS', 366))  # intervalo máximo de uma consulta
+    # Exportações CSV/XLSX: linhas por página (uma transação curta por página)
+    EXPORT_PAGE_SIZE = int(os.environ.get('EXPORT_PAGE_SIZE', 5000))
+    # Séries por robô (monitor): quantos baldes de minuto e de hora manter
+    ROBOT_METRICS_MINUTES = int(os.environ.get('ROBOT_METRICS_MINUTES', 120))
+    ROBOT_METRICS_HOURS = int(os.environ.get('ROBOT_METRICS_HOURS', 48))
+    # Importação de contatos em background
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', os.path.join(os.path.abspath(os.path.dirname(__file__)), 'instance', 'uploads'))
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 1000))
+    # Renderizar nos workers: as tasks levam só ids (robô, template, contato)
+    RENDER_IN_WORKER = os.environ.get('RENDER_IN_WORKER', 'True') == 'True'
+    # Anexos dos templates e suas partes MIME já codificadas (em 'parts/')
+    ATTACHMENT_FOLDER = os.environ.get('ATTACHMENT_FOLDER', os.path.join(os.path.abspath(os.path.dirname(__file__)), 'instance', 'attachments'))
+    # Profiling sob demanda: header PROFILE_HEADER com o valor de PROFILE_TOKEN ou amostragem
+    PROFILE_ENABLED = os.environ.get('PROFILE_ENABLED', 'False') == 'True'
+    PROFILER = os.environ.get('PROFILER', 'sampling')  # sampling (flame graph) ou cprofile (pstats)
+    PROFILE_HEADER = os.environ.get('PROFILE_HEADER', 'X-Profile')
+    PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+    PROFILE_REQUEST_SAMPLE_RATE = float(os.environ.get('PROFILE_REQUEST_SAMPLE_RATE', 0))
+    PROFILE_TASK_SAMPLE_RATE = float(os.environ.get('PROFILE_TASK_SAMPLE_RATE', 0))
+    PROFILE_TASKS = [name for name in os.environ.get('PROFILE_TASKS', '').split(',') if name]
+    PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.005))
+    PROFILE_FOLDER = os.environ.get('PROFILE_FOLDER', os.path.join(os.path.abspath(os.path.dirname(__file__)), 'instance', 'profiles'))
+    # Bounces e reclamações: Maildir (ou mbox) lido pelo beat a cada BOUNCE_POLL_INTERVAL segundos
+    BOUNCE_MAILBOX = os.environ.get('BOUNCE_MAILBOX')
+    BOUNCE_POLL_INTERVAL = int(os.environ.get('BOUNCE_POLL_INTERVAL', 300))
+    # Conjunto de supressões em memória: novas linhas a cada REFRESH, recarga completa a cada RELOAD
+    SUPPRESSION_REFRESH_INTERVAL = int(os.environ.get('SUPPRESSION_REFRESH_INTERVAL', 60))
+    SUPPRESSION_RELOAD_INTERVAL = int(os.environ.get('SUPPRESSION_RELOAD_INTERVAL', 3600))
+    # Validação de emails: consulta MX por domínio (resolver 'dns' ou 'stub')
+    EMAIL_VALIDATION_CHECK_MX = os.environ.get('EMAIL_VALIDATION_CHECK_MX', 'False') == 'True'
+    EMAIL_MX_RESOLVER = os.environ.get('EMAIL_MX_RESOLVER', 'dns')
+
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -0,0 +1,30 @@
+"""Add html_body and version to email_template
+
+Revision ID: 0b4d7e9c2a15
+Revises: f2c8d5a0e7b1
+Create Date: 2026-10-19 16:12:05.348217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b4d7e9c2a15'
+down_revision: Union[str, Sequence[str], None] = 'f2c8d5a0e7b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('email_template', sa.Column('html_body', sa.Text(), nullable=True))
+    op.add_column('email_template', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('email_template', 'version')
+    op.drop_column('email_template', 'html_body')
@@ -0,0 +1,41 @@
+"""Add log_rollup table and timestamp indexes on the log tables
+
+Revision ID: 1c6e3f8a9d42
+Revises: 0b4d7e9c2a15
+Create Date: 2026-10-19 17:41:29.806114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c6e3f8a9d42'
+down_revision: Union[str, Sequence[str], None] = '0b4d7e9c2a15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('log_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('source', sa.String(length=16), nullable=False),
+    sa.Column('scope_id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=32), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('day', 'source', 'scope_id', 'key')
+    )
+    op.create_index(op.f('ix_send_log_timestamp'), 'send_log', ['timestamp'], unique=False)
+    op.create_index(op.f('ix_robot_log_timestamp'), 'robot_log', ['timestamp'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_robot_log_timestamp'), table_name='robot_log')
+    op.drop_index(op.f('ix_send_log_timestamp'), table_name='send_log')
+    op.drop_table('log_rollup')
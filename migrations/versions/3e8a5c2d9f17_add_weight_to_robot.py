@@ -0,0 +1,28 @@
+"""Add weight to robot
+
+Revision ID: 3e8a5c2d9f17
+Revises: 2d7f4a1b8c63
+Create Date: 2026-10-19 19:36:44.120583
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e8a5c2d9f17'
+down_revision: Union[str, Sequence[str], None] = '2d7f4a1b8c63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('robot', sa.Column('weight', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('robot', 'weight')
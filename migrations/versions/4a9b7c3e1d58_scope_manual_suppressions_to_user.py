@@ -0,0 +1,41 @@
+"""Scope manual suppressions to their user
+
+Revision ID: 4a9b7c3e1d58
+Revises: 3e8a5c2d9f17
+Create Date: 2026-10-19 21:14:32.508117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a9b7c3e1d58'
+down_revision: Union[str, Sequence[str], None] = '3e8a5c2d9f17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('suppression', sa.Column('user_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_suppression_user_id', 'suppression', 'user', ['user_id'], ['id'])
+    op.create_index(op.f('ix_suppression_user_id'), 'suppression', ['user_id'], unique=False)
+    op.drop_constraint('suppression_email_key', 'suppression', type_='unique')
+    op.create_unique_constraint('uq_suppression_email_user', 'suppression', ['email', 'user_id'])
+    op.create_index('uq_suppression_email_global', 'suppression', ['email'], unique=True,
+                    postgresql_where=sa.text('user_id IS NULL'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Bloqueios manuais por usuário não cabem no UNIQUE(email) antigo
+    op.execute("DELETE FROM suppression WHERE user_id IS NOT NULL")
+    op.drop_index('uq_suppression_email_global', table_name='suppression')
+    op.drop_constraint('uq_suppression_email_user', 'suppression', type_='unique')
+    op.create_unique_constraint('suppression_email_key', 'suppression', ['email'])
+    op.drop_index(op.f('ix_suppression_user_id'), table_name='suppression')
+    op.drop_constraint('fk_suppression_user_id', 'suppression', type_='foreignkey')
+    op.drop_column('suppression', 'user_id')
@@ -0,0 +1,34 @@
+"""Add compose campaigns
+
+Revision ID: 5b2e8f4a7c61
+Revises: 4a9b7c3e1d58
+Create Date: 2026-10-19 22:03:51.274906
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e8f4a7c61'
+down_revision: Union[str, Sequence[str], None] = '4a9b7c3e1d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('campaign', sa.Column('filter_rules', sa.JSON(), nullable=True))
+    op.add_column('campaign', sa.Column('rate_limit', sa.String(length=32), nullable=True))
+    op.alter_column('campaign', 'robot_id', existing_type=sa.Integer(), nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM campaign_shard WHERE campaign_id IN (SELECT id FROM campaign WHERE robot_id IS NULL)")
+    op.execute("DELETE FROM campaign WHERE robot_id IS NULL")
+    op.alter_column('campaign', 'robot_id', existing_type=sa.Integer(), nullable=False)
+    op.drop_column('campaign', 'rate_limit')
+    op.drop_column('campaign', 'filter_rules')
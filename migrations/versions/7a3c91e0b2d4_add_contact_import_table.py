@@ -0,0 +1,48 @@
+"""Add contact_import table
+
+Revision ID: 7a3c91e0b2d4
+Revises: dc4deb65a9a6
+Create Date: 2026-10-19 09:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3c91e0b2d4'
+down_revision: Union[str, Sequence[str], None] = 'dc4deb65a9a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('contact_import',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('list_id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('file_path', sa.String(length=512), nullable=False),
+    sa.Column('status', sa.String(length=32), nullable=True),
+    sa.Column('task_id', sa.String(length=155), nullable=True),
+    sa.Column('total_rows', sa.Integer(), nullable=True),
+    sa.Column('chunk_size', sa.Integer(), nullable=False, server_default='1000'),
+    sa.Column('rows_parsed', sa.Integer(), nullable=True),
+    sa.Column('rows_inserted', sa.Integer(), nullable=True),
+    sa.Column('rejects', sa.Integer(), nullable=True),
+    sa.Column('last_chunk', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['list_id'], ['contact_list.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('contact_import')
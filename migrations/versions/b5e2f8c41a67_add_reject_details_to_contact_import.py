@@ -0,0 +1,30 @@
+"""Add reject details to contact_import
+
+Revision ID: b5e2f8c41a67
+Revises: 7a3c91e0b2d4
+Create Date: 2026-10-19 10:04:57.218390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e2f8c41a67'
+down_revision: Union[str, Sequence[str], None] = '7a3c91e0b2d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('contact_import', sa.Column('reject_reasons', sa.JSON(), nullable=True))
+    op.add_column('contact_import', sa.Column('reject_samples', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('contact_import', 'reject_samples')
+    op.drop_column('contact_import', 'reject_reasons')
@@ -0,0 +1,45 @@
+"""Add dead_letter table
+
+Revision ID: c81d4e6f09a3
+Revises: b5e2f8c41a67
+Create Date: 2026-10-19 11:20:14.663052
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81d4e6f09a3'
+down_revision: Union[str, Sequence[str], None] = 'b5e2f8c41a67'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('dead_letter',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('task_name', sa.String(length=155), nullable=False),
+    sa.Column('args', sa.JSON(), nullable=True),
+    sa.Column('robot_id', sa.Integer(), nullable=True),
+    sa.Column('to_address', sa.String(length=255), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('kind', sa.String(length=16), nullable=False),
+    sa.Column('smtp_code', sa.Integer(), nullable=True),
+    sa.Column('retries', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('replayed_at', sa.DateTime(), nullable=True),
+    sa.Column('replay_task_id', sa.String(length=155), nullable=True),
+    sa.ForeignKeyConstraint(['robot_id'], ['robot.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_dead_letter_robot_id'), 'dead_letter', ['robot_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_dead_letter_robot_id'), table_name='dead_letter')
+    op.drop_table('dead_letter')
@@ -0,0 +1,59 @@
+"""Add campaign and campaign_shard tables
+
+Revision ID: d3a97b1c5e28
+Revises: c81d4e6f09a3
+Create Date: 2026-10-19 12:41:09.518224
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a97b1c5e28'
+down_revision: Union[str, Sequence[str], None] = 'c81d4e6f09a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('campaign',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('robot_id', sa.Integer(), nullable=False),
+    sa.Column('template_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=32), nullable=True),
+    sa.Column('strategy', sa.String(length=16), nullable=True),
+    sa.Column('shard_count', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['robot_id'], ['robot.id'], ),
+    sa.ForeignKeyConstraint(['template_id'], ['email_template.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_campaign_robot_id'), 'campaign', ['robot_id'], unique=False)
+    op.create_table('campaign_shard',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('campaign_id', sa.Integer(), nullable=False),
+    sa.Column('shard_index', sa.Integer(), nullable=False),
+    sa.Column('min_id', sa.Integer(), nullable=True),
+    sa.Column('max_id', sa.Integer(), nullable=True),
+    sa.Column('last_contact_id', sa.Integer(), nullable=True),
+    sa.Column('queued', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=32), nullable=True),
+    sa.Column('generation', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['campaign_id'], ['campaign.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_campaign_shard_campaign_id'), 'campaign_shard', ['campaign_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_campaign_shard_campaign_id'), table_name='campaign_shard')
+    op.drop_table('campaign_shard')
+    op.drop_index(op.f('ix_campaign_robot_id'), table_name='campaign')
+    op.drop_table('campaign')
@@ -0,0 +1,45 @@
+"""Add sender account pool and quotas
+
+Revision ID: e6f0a2b7d914
+Revises: d3a97b1c5e28
+Create Date: 2026-10-19 13:58:22.907431
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6f0a2b7d914'
+down_revision: Union[str, Sequence[str], None] = 'd3a97b1c5e28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('internal_email', sa.Column('hourly_quota', sa.Integer(), nullable=True))
+    op.add_column('internal_email', sa.Column('daily_quota', sa.Integer(), nullable=True))
+    op.add_column('internal_email', sa.Column('max_sessions', sa.Integer(), nullable=False, server_default='2'))
+    op.create_table('robot_sender',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('robot_id', sa.Integer(), nullable=False),
+    sa.Column('internal_email_id', sa.Integer(), nullable=False),
+    sa.Column('weight', sa.Integer(), nullable=False, server_default='1'),
+    sa.ForeignKeyConstraint(['internal_email_id'], ['internal_email.id'], ),
+    sa.ForeignKeyConstraint(['robot_id'], ['robot.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('robot_id', 'internal_email_id')
+    )
+    op.create_index(op.f('ix_robot_sender_robot_id'), 'robot_sender', ['robot_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_robot_sender_robot_id'), table_name='robot_sender')
+    op.drop_table('robot_sender')
+    op.drop_column('internal_email', 'max_sessions')
+    op.drop_column('internal_email', 'daily_quota')
+    op.drop_column('internal_email', 'hourly_quota')
@@ -0,0 +1,99 @@
+from datetime import time
+import pytest
+from config import DevelopmentConfig
+from app import bounces, create_app, db, idempotency, limits, state
+from app.models import EmailTemplate, InternalEmail, Robot, User
+from app.tasks import send_email_task
+
+
+class TestConfig(DevelopmentConfig):
+    TESTING = True
+    SECRET_KEY = 'test'
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    STATE_BACKEND = 'memory'
+    IDEMPOTENCY_BACKEND = 'memory'
+
+
+@pytest.fixture
+def app(monkeypatch):
+    # Stores por processo começam vazios em cada teste
+    monkeypatch.setattr(state, '_counter_store', None)
+    monkeypatch.setattr(idempotency, '_store', None)
+    monkeypatch.setattr(bounces, '_suppression_set', None)
+    monkeypatch.setattr(limits, '_limits_cache', {})
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+class FakeSMTP:
+    """
+    Stands in for smtplib.SMTP; ``on_send`` runs during DATA.
+    """
+    sent = []
+    on_send = None
+
+    def __init__(self, host, port, timeout=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        pass
+
+    def sendmail(self, sender, recipients, message):
+        if FakeSMTP.on_send:
+            FakeSMTP.on_send()
+        FakeSMTP.sent.append(recipients)
+
+
+@pytest.fixture
+def robot(app, monkeypatch):
+    """
+    A robot with one SMTP account behind FakeSMTP. ``robot.sent`` lists the
+    recipients of every DATA and ``robot.deferred`` every re-enqueue.
+    """
+    monkeypatch.setattr('app.tasks.smtplib.SMTP', FakeSMTP)
+    monkeypatch.setattr(FakeSMTP, 'sent', [])
+    monkeypatch.setattr(FakeSMTP, 'on_send', None)
+    deferred = []
+    monkeypatch.setattr(send_email_task, 'apply_async', lambda *args, **kwargs: deferred.append(kwargs))
+    user = User(username='ana', email='ana@exemplo.com.br', password='x')
+    db.session.add(user)
+    db.session.flush()
+    template = EmailTemplate(name='t', subject='Olá', body='Corpo', user_id=user.id)
+    account = InternalEmail(email='envio@exemplo.com.br', user_id=user.id, smtp_server='smtp.exemplo.com.br',
+                            smtp_username='envio', smtp_password='x', max_sessions=2)
+    db.session.add_all([template, account])
+    db.session.flush()
+    robot = Robot(name='r', email=account.email, template_id=template.id, user_id=user.id,
+                  start_time=time(0), end_time=time(23, 59), contact_title='t', internal_email=account.email)
+    db.session.add(robot)
+    db.session.commit()
+    robot.smtp, robot.sent, robot.deferred = FakeSMTP, FakeSMTP.sent, deferred
+    return robot
+
+
+@pytest.fixture
+def send(robot):
+    """
+    Run send_email_task in-process for ``robot`` as the Celery message
+    ``task_id`` (``redelivered`` as the broker would flag it).
+    """
+    def send(to='maria@exemplo.com.br', task_id='t1', redelivered=False, send_log_id=1, **kwargs):
+        send_email_task.push_request(id=task_id, retries=0, kwargs={}, delivery_info={'redelivered': redelivered})
+        try:
+            return send_email_task.run(robot.id, to, 'Olá', 'Corpo', send_log_id=send_log_id, **kwargs)
+        finally:
+            send_email_task.pop_request()
+    return send
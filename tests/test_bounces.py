@@ -0,0 +1,36 @@
+import os
+import shutil
+from app.bounces import COMPLAINT, HARD_BOUNCE, process_mailbox
+from app.models import Suppression
+from app.state import MemoryCounterStore
+
+FIXTURE = os.path.join(os.path.dirname(__file__), '..', 'fixtures', 'bounces.mbox')
+
+
+def test_fixture_yields_one_hard_bounce_and_one_complaint(app):
+    stats = process_mailbox(FIXTURE)
+
+    # O atraso (4.x) e a recusa por política (5.7.x) não viram supressão
+    assert stats == {'messages': 4, 'bounces': 1, 'complaints': 1, 'suppressed': 2}
+    rows = {row.email: row for row in Suppression.query.all()}
+    assert set(rows) == {'joao.inexistente@exemplo.com.br', 'pedro.lima@yahoo.com.br'}
+    assert rows['joao.inexistente@exemplo.com.br'].reason == HARD_BOUNCE
+    assert rows['joao.inexistente@exemplo.com.br'].status == '5.1.1'
+    assert rows['pedro.lima@yahoo.com.br'].reason == COMPLAINT
+    assert all(row.user_id is None for row in rows.values())
+
+
+def test_mbox_reads_only_what_was_appended(app, tmp_path):
+    path = tmp_path / 'bounces.mbox'
+    shutil.copy(FIXTURE, path)
+    store = MemoryCounterStore()
+
+    assert process_mailbox(str(path), store=store)['messages'] == 4
+    assert process_mailbox(str(path), store=store)['messages'] == 0
+
+    with open(FIXTURE, 'rb') as f:
+        first = f.read().split(b'\nFrom ', 1)[0] + b'\n'
+    with open(path, 'ab') as f:
+        f.write(first)
+    stats = process_mailbox(str(path), store=store)
+    assert stats['messages'] == 1 and stats['bounces'] == 1 and stats['suppressed'] == 0
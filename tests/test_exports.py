@@ -0,0 +1,25 @@
+import io
+import pytest
+from app.exports import xlsx_chunks
+
+openpyxl = pytest.importorskip('openpyxl')
+
+
+def _read(chunks):
+    workbook = openpyxl.load_workbook(io.BytesIO(b''.join(chunks)), read_only=True)
+    return {sheet.title: [list(row) for row in sheet.iter_rows(values_only=True)] for sheet in workbook}
+
+
+def test_xlsx_rolls_over_to_a_new_sheet_with_the_header():
+    rows = [[n, f'contato{n}@exemplo.com.br'] for n in range(7)]
+    sheets = _read(xlsx_chunks(['id', 'email'], rows, title='contacts', sheet_rows=3))
+    assert list(sheets) == ['contacts', 'contacts 2', 'contacts 3', 'contacts 4']
+    assert all(sheet[0] == ['id', 'email'] for sheet in sheets.values())
+    assert [row[0] for sheet in sheets.values() for row in sheet[1:]] == list(range(7))
+    assert max(len(sheet) for sheet in sheets.values()) == 3
+
+
+def test_empty_xlsx_keeps_the_header_and_long_titles_fit():
+    assert _read(xlsx_chunks(['id'], [], title='x' * 40)) == {'x' * 31: [['id']]}
+    sheets = _read(xlsx_chunks(['id'], [[1], [2]], title='x' * 40, sheet_rows=2))
+    assert list(sheets) == ['x' * 31, 'x' * 29 + ' 2']
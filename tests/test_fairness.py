@@ -0,0 +1,44 @@
+import pytest
+from app.fairness import DeficitRoundRobin
+from app.state import MemoryCounterStore
+
+UNLIMITED = 10 ** 9
+
+
+def run(drr, flows, capacity, ticks):
+    totals = {flow: 0 for flow in flows}
+    for _ in range(ticks):
+        for flow, grant in drr.allocate('user', flows, capacity).items():
+            totals[flow] += grant
+    return totals
+
+
+def test_weighted_shares_under_scarce_capacity():
+    store = MemoryCounterStore()
+    drr = DeficitRoundRobin(store, quantum=100)
+    flows = {1: (1, UNLIMITED), 2: (3, UNLIMITED), 3: (1, UNLIMITED)}
+
+    # Cada chamada cabe menos que uma rodada (100 + 300 + 100)
+    totals = run(drr, flows, capacity=150, ticks=300)
+
+    assert sum(totals.values()) == 150 * 300
+    share = sum(totals.values()) / 5
+    assert totals[1] == pytest.approx(share, abs=300)
+    assert totals[2] == pytest.approx(3 * share, abs=300)
+    assert totals[3] == pytest.approx(share, abs=300)
+    # Crédito guardado nunca passa de quantum * peso
+    for flow, (weight, _) in flows.items():
+        assert store.get_many([f'drr:user:{flow}'])[0] <= 100 * weight
+
+
+def test_unused_capacity_goes_to_flows_with_demand():
+    drr = DeficitRoundRobin(MemoryCounterStore(), quantum=10)
+
+    grants = drr.allocate('user', {1: (1, 5), 2: (1, 100), 3: (5, 0)}, 50)
+
+    assert grants == {1: 5, 2: 45, 3: 0}
+
+
+def test_quantum_must_be_positive():
+    with pytest.raises(ValueError):
+        DeficitRoundRobin(MemoryCounterStore(), quantum=0)
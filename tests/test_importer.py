@@ -0,0 +1,70 @@
+import pytest
+from app import db
+from app.importer import run_import
+from app.models import Contact, ContactImport, ContactList, User
+from app.validation import DomainCache, EmailAddressValidator, StubMxResolver
+
+pytest.importorskip('pandas')
+
+HEADER = 'Numero,Título,Emails,Nome do Congresso,Ano do Congresso\n'
+ROWS = [
+    '1,Dr.,ana@exemplo.com.br,CBC,2024',
+    '2,Dr.,"bia@exemplo.com.br, caio@semmx.com.br",CBC,2024',
+    '3,Dra.,sem-arroba,CBC,2024',
+    '4,Dr.,davi@exemplo.com.br,CBC,2024',
+    '5,Dra.,,CBC,2024',
+]
+
+
+class Crash(Exception):
+    pass
+
+
+@pytest.fixture
+def job(app, tmp_path):
+    user = User(username='ana', email='ana@exemplo.com.br', password='x')
+    db.session.add(user)
+    db.session.flush()
+    contact_list = ContactList(name='lista', user_id=user.id)
+    db.session.add(contact_list)
+    db.session.flush()
+    path = tmp_path / 'contatos.csv'
+    path.write_text(HEADER + '\n'.join(ROWS) + '\n', encoding='utf-8')
+    job = ContactImport(user_id=user.id, list_id=contact_list.id, filename='contatos.csv', file_path=str(path),
+                        chunk_size=2)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def validator():
+    return EmailAddressValidator(resolver=StubMxResolver({'semmx.com.br': False}), check_mx=True,
+                                 cache=DomainCache())
+
+
+def test_import_counts_rejects_per_reason(job):
+    run_import(job, validator=validator())
+
+    assert job.status == 'done' and job.last_chunk == 2
+    assert sorted(c.email for c in Contact.query.all()) == ['ana@exemplo.com.br', 'bia@exemplo.com.br',
+                                                            'davi@exemplo.com.br']
+    assert job.reject_reasons == {'no_mx': 1, 'syntax': 1, 'empty': 1}
+    assert {'email': 'caio@semmx.com.br', 'reason': 'no_mx'} in job.reject_samples
+
+
+def test_rerun_after_a_crash_resumes_from_last_chunk(job):
+    def crash_after_first_chunk(progress):
+        raise Crash()
+
+    with pytest.raises(Crash):
+        run_import(job, progress=crash_after_first_chunk, validator=validator())
+    db.session.rollback()
+    assert job.last_chunk == 0 and Contact.query.count() == 2
+
+    chunks = []
+    run_import(job, progress=chunks.append, validator=validator())
+
+    # Só os chunks seguintes são lidos de novo: nenhum contato duplicado
+    assert [chunk['rows_parsed'] for chunk in chunks] == [4, 5]
+    assert Contact.query.count() == 3
+    assert job.rows_parsed == 5 and job.rejects == 3
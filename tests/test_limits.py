@@ -0,0 +1,77 @@
+import smtplib
+from datetime import date
+from app import db
+from app.limits import DAY, QuotaService, SlidingWindowCounter, get_quota_service
+from app.models import DeadLetter, Limits
+from app.state import MemoryCounterStore
+
+TO = 'maria@exemplo.com.br'
+START = 100 * DAY  # início exato de uma janela diária
+
+
+def test_sliding_window_grants_only_what_fits():
+    counter = SlidingWindowCounter(MemoryCounterStore(), DAY, 'daily')
+    assert counter.reserve('u', 7, 10, now=START) == 7
+    assert counter.reserve('u', 7, 10, now=START + 10) == 3
+    assert counter.reserve('u', 1, 10, now=START + 20) == 0
+    assert counter.count('u', now=START + 20) == 10
+
+
+def test_sliding_window_frees_the_previous_bucket_gradually():
+    counter = SlidingWindowCounter(MemoryCounterStore(), DAY, 'daily')
+    counter.reserve('u', 10, 10, now=START)
+    # Um quarto da janela seguinte: 75% do bucket anterior ainda conta
+    assert counter.count('u', now=START + DAY + DAY // 4) == 7.5
+    assert counter.reserve('u', 5, 10, now=START + DAY + DAY // 4) == 2
+
+
+def test_quota_service_monthly_limit_hands_back_daily_units(app):
+    db.session.add(Limits(user_id=1, daily=10, monthly=4, blocked_dates=[]))
+    db.session.commit()
+    quota = QuotaService(MemoryCounterStore())
+    assert quota.reserve(1, 6, now=START) == 4
+    assert quota.daily.count(1, now=START) == 4
+    assert quota.reserve(2, 500, now=START) == 500  # sem Limits: ilimitado
+
+
+def test_blocked_date_grants_nothing(app):
+    db.session.add(Limits(user_id=1, daily=10, monthly=100, blocked_dates=[date.today().isoformat()]))
+    db.session.commit()
+    quota = QuotaService(MemoryCounterStore())
+    assert quota.is_blocked(1)
+    assert quota.reserve(1, 3) == 0
+
+
+def _limit(robot, daily):
+    db.session.add(Limits(user_id=robot.user_id, daily=daily, monthly=1000, blocked_dates=[]))
+    db.session.commit()
+
+
+def test_send_over_the_limit_is_deferred(send, robot, app):
+    _limit(robot, 1)
+    assert send()['status'] == 'success'
+    result = send(task_id='t2', send_log_id=2)
+    assert result['reason'] == 'limit'
+    assert len(robot.deferred) == 1
+    assert robot.sent == [[TO]]
+
+
+def test_duplicate_gives_back_its_reserved_quota(send, robot, app):
+    _limit(robot, 5)
+    quota = get_quota_service(app.config)
+    assert quota.reserve(robot.user_id, 2) == 2  # reserva em lote do enqueue_emails
+    send(reserved=True)
+    assert send(task_id='t2', reserved=True)['status'] == 'duplicate'
+    assert round(quota.daily.count(robot.user_id)) == 1
+
+
+def test_permanent_failure_gives_back_its_quota(send, robot, app):
+    _limit(robot, 5)
+
+    def refuse():
+        raise smtplib.SMTPRecipientsRefused({TO: (550, b'no such user')})
+
+    robot.smtp.on_send = refuse
+    assert send()['kind'] == 'permanent'
+    assert DeadLetter.query.count() == 1
+    assert round(get_quota_service(app.config).daily.count(robot.user_id)) == 0
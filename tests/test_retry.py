@@ -0,0 +1,47 @@
+import smtplib
+import socket
+from types import SimpleNamespace
+import app as app_module
+from app import db
+from app.models import DeadLetter
+from app.retry import PERMANENT, TEMPORARY, backoff_delay, classify_smtp_error, replay_dead_letter
+
+
+def test_classify_smtp_error():
+    assert classify_smtp_error(smtplib.SMTPResponseException(421, b'busy')) == (TEMPORARY, 421)
+    assert classify_smtp_error(smtplib.SMTPResponseException(550, b'no such user')) == (PERMANENT, 550)
+    assert classify_smtp_error(socket.timeout()) == (TEMPORARY, None)
+    assert classify_smtp_error(ConnectionResetError()) == (TEMPORARY, None)
+    assert classify_smtp_error(ValueError('bug')) == (PERMANENT, None)
+
+
+def test_refused_recipients_are_temporary_only_if_all_4xx():
+    soft = smtplib.SMTPRecipientsRefused({'a@x.com': (450, b'later'), 'b@x.com': (452, b'full')})
+    mixed = smtplib.SMTPRecipientsRefused({'a@x.com': (450, b'later'), 'b@x.com': (550, b'unknown')})
+    assert classify_smtp_error(soft) == (TEMPORARY, 450)
+    assert classify_smtp_error(mixed)[0] == PERMANENT
+
+
+def test_backoff_delay_is_capped(monkeypatch):
+    monkeypatch.setattr('app.retry.random.uniform', lambda low, high: high)
+    assert backoff_delay(0, 30, 3600) == 30
+    assert backoff_delay(3, 30, 3600) == 240
+    assert backoff_delay(20, 30, 3600) == 3600
+
+
+def test_replay_sends_a_dead_letter_once(app, monkeypatch):
+    sent = []
+    monkeypatch.setattr(app_module.celery, 'send_task',
+                        lambda name, args, **options: sent.append(args) or SimpleNamespace(id=f'task-{len(sent)}'))
+    letter = DeadLetter(task_name='app.tasks.send_email_task', args=[1, 2], kind=PERMANENT)
+    db.session.add(letter)
+    db.session.commit()
+
+    assert replay_dead_letter(letter).id == 'task-1'
+    db.session.commit()
+    assert letter.replayed_at is not None and letter.replay_task_id == 'task-1'
+
+    # Segundo POST (clique duplo, retry do cliente) não reenfileira
+    assert replay_dead_letter(letter) is None
+    assert sent == [[1, 2]]
+    assert letter.replay_task_id == 'task-1'
@@ -0,0 +1,57 @@
+import smtplib
+import time
+from types import SimpleNamespace
+from app.sender_pool import SenderPool
+from app.state import MemoryCounterStore
+
+CONFIG = {'SENDER_HEALTH_WINDOW': 300, 'SENDER_MAX_ERROR_RATE': 0.5, 'SENDER_MIN_ATTEMPTS': 2,
+          'SENDER_COOLDOWN': 600, 'SMTP_TIMEOUT': 30}
+
+
+def account(id=1, max_sessions=2, hourly_quota=None, daily_quota=None):
+    return SimpleNamespace(id=id, max_sessions=max_sessions, hourly_quota=hourly_quota, daily_quota=daily_quota)
+
+
+def test_sessions_are_capped_per_account():
+    pool = SenderPool(MemoryCounterStore(), CONFIG)
+    acc = account(max_sessions=2)
+    assert pool.acquire(acc, 'a') and pool.acquire(acc, 'b')
+    assert not pool.acquire(acc, 'c')
+    assert pool.snapshot(acc)['inflight'] == 2
+    assert pool.choose([(acc, 1)]) is None
+
+    pool.release(acc, 'a')
+    assert pool.snapshot(acc)['inflight'] == 1
+    assert pool.acquire(acc, 'c')
+
+
+def test_session_of_a_dead_worker_expires_on_its_own():
+    pool = SenderPool(MemoryCounterStore(), dict(CONFIG, SMTP_TIMEOUT=0.05))
+    acc = account(max_sessions=1)
+    assert pool.acquire(acc, 'morto')
+    time.sleep(0.25)
+    # Outras sessões vivas não renovam o prazo da sessão abandonada
+    assert pool.acquire(acc, 'vivo')
+    pool.release(acc, 'vivo')
+    # release de uma sessão já vencida não deixa o contador negativo
+    pool.release(acc, 'morto')
+    assert pool.snapshot(acc)['inflight'] == 0
+
+
+def test_quota_overshoot_gives_the_session_back():
+    pool = SenderPool(MemoryCounterStore(), CONFIG)
+    acc = account(hourly_quota=1)
+    assert pool.acquire(acc, 'a')
+    pool.release(acc, 'a')
+    assert not pool.acquire(acc, 'b')
+    snap = pool.snapshot(acc)
+    assert snap['hour'] == 1 and snap['inflight'] == 0
+
+
+def test_failed_login_puts_account_in_cooldown():
+    pool = SenderPool(MemoryCounterStore(), CONFIG)
+    bad, good = account(id=1), account(id=2)
+    assert pool.acquire(bad, 'a')
+    pool.release(bad, 'a', error=smtplib.SMTPAuthenticationError(535, b'auth'))
+    assert not pool.snapshot(bad)['healthy']
+    assert all(pool.choose([(bad, 10), (good, 1)]) is good for _ in range(20))
@@ -0,0 +1,61 @@
+import time
+from app.idempotency import DONE, PENDING, delivery_key, get_store
+from app.models import RobotLog
+
+TO = 'maria@exemplo.com.br'
+
+
+def test_second_copy_of_a_sent_delivery_is_a_duplicate(send, robot):
+    assert send()['status'] == 'success'
+    assert send(task_id='t2')['status'] == 'duplicate'
+    assert robot.sent == [[TO]]
+
+
+def test_claim_outlives_its_ttl_during_a_long_send(send, robot, app):
+    app.config['SEND_CLAIM_TTL'] = 0.3
+    store = get_store(app.config)
+    key = delivery_key(robot.id, TO, send_log_id=1)
+    copies = []
+
+    def slow_send():
+        # Envio mais longo que o TTL; a reentrega chega no meio dele
+        time.sleep(0.7)
+        assert store.status(key) == PENDING
+        copies.append(store.claim(key, 0.3, owner='copia'))
+
+    robot.smtp.on_send = slow_send
+    assert send()['status'] == 'success'
+    assert copies == [False]
+    assert store.status(key) == DONE
+    assert robot.sent == [[TO]]
+
+
+def test_redelivered_copy_waits_for_the_running_attempt(send, robot, app):
+    store = get_store(app.config)
+    key = delivery_key(robot.id, TO, send_log_id=1)
+    results = []
+    # Mesmo task id, como numa reentrega do broker durante o envio
+    robot.smtp.on_send = lambda: results.append(send(task_id='t1', redelivered=True))
+    assert send()['status'] == 'success'
+    assert results[0]['reason'] == 'pending_claim'
+    assert len(robot.deferred) == 1
+    assert store.status(key) == DONE
+    assert robot.sent == [[TO]]
+
+
+def test_attempt_that_lost_its_claim_does_not_send(send, robot, app, monkeypatch):
+    store = get_store(app.config)
+    key = delivery_key(robot.id, TO, send_log_id=1)
+
+    def taken_over(host, port, timeout=None):
+        # A chave expirou durante a conexão e outra tentativa a assumiu
+        store.release(key)
+        store.claim(key, 60, owner='outra')
+        return robot.smtp(host, port)
+
+    monkeypatch.setattr('app.tasks.smtplib.SMTP', taken_over)
+    result = send()
+    assert result['status'] == 'duplicate'
+    assert robot.sent == []
+    assert store.status(key) == PENDING  # a chave da outra tentativa continua lá
+    assert RobotLog.query.filter_by(action='duplicate').count() == 1
@@ -0,0 +1,65 @@
+from unittest import mock
+import dns.exception
+import dns.resolver
+from app.validation import (DnsMxResolver, DomainCache, EmailAddressValidator, StubMxResolver, get_validator,
+                            summarize_rejects)
+
+
+def test_normalizes_and_rejects_by_reason():
+    validator = EmailAddressValidator(cache=DomainCache())
+
+    assert validator.validate('  Maria.Silva@Exemplo.com.BR ') == ('maria.silva@exemplo.com.br', None)
+    assert validator.validate('') == (None, 'empty')
+    assert validator.validate('sem-arroba.com') == (None, 'syntax')
+    assert validator.validate('a..b@exemplo.com') == (None, 'syntax')
+    assert validator.validate('x@-invalido-.com') == (None, 'invalid_domain')
+
+
+def test_mx_lookup_runs_once_per_domain():
+    resolver = StubMxResolver({'semmx.com.br': False})
+    validator = EmailAddressValidator(resolver=resolver, check_mx=True, cache=DomainCache())
+
+    valid, rejects = validator.validate_many(['a@semmx.com.br', 'b@semmx.com.br', 'c@ok.org', 'd@ok.org'])
+
+    assert valid == ['c@ok.org', 'd@ok.org']
+    assert rejects == [('a@semmx.com.br', 'no_mx'), ('b@semmx.com.br', 'no_mx')]
+    assert resolver.lookups == 2
+
+
+def test_summarize_rejects_counts_reasons():
+    summary = summarize_rejects([('a', 'syntax'), ('b', 'no_mx'), ('c', 'syntax')], sample_size=2)
+
+    assert summary['total'] == 3
+    assert summary['reasons'] == {'syntax': 2, 'no_mx': 1}
+    assert len(summary['sample']) == 2
+
+
+def _resolve(mx_error, addresses=()):
+    def resolve(domain, rdtype):
+        if rdtype == 'MX':
+            raise mx_error
+        if rdtype in addresses:
+            return [object()]
+        raise dns.resolver.NoAnswer()
+    return resolve
+
+
+def test_dns_resolver_implicit_mx_and_fail_open():
+    resolver = DnsMxResolver()
+    cases = [
+        (dns.resolver.NoAnswer(), ('AAAA',), True),  # MX implícito (RFC 5321 5.1)
+        (dns.resolver.NoAnswer(), (), False),
+        (dns.resolver.NXDOMAIN(), (), False),
+        (dns.resolver.NoNameservers(), (), True),  # SERVFAIL não rejeita
+        (dns.exception.Timeout(), (), True),
+    ]
+    for error, addresses, expected in cases:
+        with mock.patch.object(resolver._resolver, 'resolve', _resolve(error, addresses)):
+            assert resolver.has_mx('exemplo.org') is expected
+
+
+def test_get_validator_is_reused_per_config():
+    config = {'EMAIL_VALIDATION_CHECK_MX': True, 'EMAIL_MX_RESOLVER': 'stub'}
+
+    assert get_validator(config) is get_validator(dict(config))
+    assert get_validator(config) is not get_validator({'EMAIL_VALIDATION_CHECK_MX': False})